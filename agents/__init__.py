@@ -1 +1,34 @@
-"""Pacote de agentes para classificação de galáxias"""
+"""
+Pacote de agentes para classificação de galáxias
+
+Os agentes importam os módulos da raiz do repositório (utils, model,
+metrics e, sob demanda, dedup e features), que não formam um pacote
+instalável: `agents` só é importável com a raiz do repositório no
+sys.path (executando a partir dela ou via PYTHONPATH).
+"""
+import importlib
+
+# Classes públicas e o módulo de cada uma: importadas só no primeiro acesso,
+# então `import agents` não carrega numpy/PIL
+_EXPORTS = {
+    'PreprocessorAgent': 'agents.agent_a',
+    'ClassifierAgent': 'agents.agent_b',
+    'RequestContext': 'agents.context',
+    'GalaxyClassificationOrchestrator': 'agents.orchestrator',
+    'AsyncGalaxyClassificationOrchestrator': 'agents.async_orchestrator',
+    'render_message': 'agents.orchestrator'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'agents' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value  # Próximos acessos não passam por aqui
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,69 +1,221 @@
 """Agente A: Pré-processador de Imagens"""
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from utils import analyze_image_quality, preprocess_image, load_image
+from utils import (
+    analyze_image_quality, preprocess_image, load_image, build_preprocess_lut,
+    ImageStats, UINT8_LEVELS
+)
+import numpy as np
 import json
 
 
 class PreprocessorAgent:
     """
     Agente responsável por analisar qualidade e pré-processar imagens de galáxias
+
+    Sem estado por imagem: cada chamada recebe o RequestContext da
+    requisição, então uma instância pode ser usada por várias threads.
     """
 
-    def __init__(self):
+    def __init__(self, dtype=np.float64):
         self.name = "PreprocessorAgent"
-        self.image_tensor = None
-        self.quality_report = None
+        self.dtype = dtype  # Tipo float usado nos cálculos (float32 = metade da memória)
+        self.enhance_contrast = True
+        self.adjust_brightness = True
 
-    def analyze_quality(self, image_path):
+    def analyze_quality(self, context):
         """
         Analisa qualidade da imagem
 
         Args:
-            image_path: Caminho da imagem
+            context: RequestContext com image_path (e image_tensor já
+                carregado, opcional, para evitar recarregar do disco)
 
         Returns:
             Dict com relatório de qualidade
         """
-        self.image_tensor = load_image(image_path)
-        self.quality_report = analyze_image_quality(self.image_tensor)
+        image_tensor = context.image_tensor
+        if image_tensor is None:
+            image_tensor = load_image(context.image_path, dtype=np.uint8)
+
+        if image_tensor.dtype == np.uint8:
+            # Histograma dos códigos calculado uma vez; reprocessamentos só trocam a LUT
+            context.image_codes = image_tensor
+            context.code_histogram = np.bincount(image_tensor.ravel(), minlength=256)
+            context.image_levels = UINT8_LEVELS
+            context.image_tensor = self._apply_levels(context, None)
+            context.owns_tensor = True
+            context.image_stats = ImageStats.from_histogram(context.code_histogram, context.image_levels)
+        else:
+            context.image_codes = None
+            context.image_tensor = image_tensor.astype(self.dtype, copy=False)
+            context.owns_tensor = context.image_tensor is not image_tensor
+            context.image_stats = ImageStats(context.image_tensor)
+
+        context.quality_report = analyze_image_quality(context.image_tensor, context.image_stats)
+        return self._quality_result(context)
 
+    def _quality_result(self, context):
+        """Relatório da ETAPA 1 a partir do quality_report do contexto"""
+        quality_report = context.quality_report
         return {
             'status': 'analyzed',
-            'image_path': image_path,
-            'quality': self.quality_report['quality'],
-            'brightness': self.quality_report['brightness'],
-            'contrast': self.quality_report['contrast'],
-            'issues': self.quality_report['issues'],
-            'recommendation': 'preprocess' if self.quality_report['needs_preprocessing'] else 'proceed'
+            'image_path': context.image_path,
+            'quality': quality_report['quality'],
+            'brightness': quality_report['brightness'],
+            'contrast': quality_report['contrast'],
+            'issues': quality_report['issues'],
+            'recommendation': 'preprocess' if quality_report['needs_preprocessing'] else 'proceed'
         }
 
-    def preprocess(self):
+    def analyze_histogram(self, context):
+        """
+        ETAPAS 1-2 só sobre o histograma dos códigos de 8 bits (cascata)
+
+        Qualidade, LUT de pré-processamento e estatísticas da imagem
+        pré-processada dependem apenas do histograma: os relatórios são os
+        mesmos de analyze_quality() e preprocess(), sem materializar a
+        imagem em ponto flutuante. Os campos do caminho por LUT do contexto
+        não mudam, então o pipeline completo pode seguir do zero.
+
+        Args:
+            context: RequestContext com image_tensor uint8
+
+        Returns:
+            (relatório de qualidade, relatório de pré-processamento ou None).
+            Preenche image_stats, quality_report e preprocessed do contexto.
+        """
+        histogram = np.bincount(context.image_tensor.ravel(), minlength=256)
+        context.image_stats = ImageStats.from_histogram(histogram)
+        context.quality_report = analyze_image_quality(None, context.image_stats)
+        quality_report = self._quality_result(context)
+
+        context.preprocessed = quality_report['recommendation'] == 'preprocess'
+        if not context.preprocessed:
+            return quality_report, None
+
+        levels = build_preprocess_lut(
+            histogram,
+            enhance_contrast=self.enhance_contrast,
+            adjust_brightness=self.adjust_brightness
+        )
+        context.image_stats = ImageStats.from_histogram(histogram, levels)
+        return quality_report, self._preprocess_report(context)
+
+    def preprocess(self, context):
         """
         Aplica pré-processamento na imagem
 
+        Args:
+            context: RequestContext já analisado por analyze_quality()
+
         Returns:
             Dict com status do processamento
         """
-        if self.image_tensor is None:
+        if context.image_tensor is None:
             return {'status': 'error', 'message': 'No image loaded'}
 
-        original_brightness = self.quality_report['brightness']
-        original_contrast = self.quality_report['contrast']
-
         # Aplicar pré-processamento
-        self.image_tensor = preprocess_image(self.image_tensor)
+        if context.image_codes is not None:
+            # Caminho rápido: compor LUT sobre o histograma (sem ordenar pixels)
+            context.image_levels = build_preprocess_lut(
+                context.code_histogram,
+                context.image_levels,
+                enhance_contrast=self.enhance_contrast,
+                adjust_brightness=self.adjust_brightness
+            )
+            context.image_tensor = self._apply_levels(context, context.image_tensor)
+            context.image_stats = ImageStats.from_histogram(context.code_histogram, context.image_levels)
+        else:
+            # Imagem recebida pertence ao chamador: só a primeira passada aloca
+            context.image_tensor = preprocess_image(
+                context.image_tensor,
+                enhance_contrast=self.enhance_contrast,
+                adjust_brightness=self.adjust_brightness,
+                stats=context.image_stats,
+                out=context.image_tensor if context.owns_tensor else None
+            )
+            context.owns_tensor = True
+
+            # Pixels mudaram: recalcular estatísticas uma vez
+            context.image_stats = ImageStats(context.image_tensor)
+
+        return self._preprocess_report(context)
 
-        # Reanalisar qualidade
-        new_quality = analyze_image_quality(self.image_tensor)
+    def preprocess_variants(self, context, n):
+        """
+        Gera de uma vez as n próximas variantes de pré-processamento
+
+        A variante k equivale a k+1 chamadas sucessivas de preprocess().
+        A imagem do contexto não muda até select_variant().
+
+        Args:
+            context: RequestContext já analisado por analyze_quality()
+            n: Número de variantes
+
+        Returns:
+            Array empilhado [n, H, W] no dtype de cálculo
+        """
+        if context.image_codes is not None:
+            # Só as LUTs são compostas em série (O(256) cada); um único gather monta o lote
+            luts = np.empty((n, 256))
+            levels = context.image_levels
+            for k in range(n):
+                levels = build_preprocess_lut(
+                    context.code_histogram,
+                    levels,
+                    enhance_contrast=self.enhance_contrast,
+                    adjust_brightness=self.adjust_brightness
+                )
+                luts[k] = levels
+
+            context.variants = luts
+            return np.take(luts.astype(self.dtype, copy=False), context.image_codes, axis=1)
+
+        stack = np.empty((n,) + context.image_tensor.shape, dtype=context.image_tensor.dtype)
+        current, stats = context.image_tensor, context.image_stats
+        for k in range(n):
+            preprocess_image(
+                current,
+                enhance_contrast=self.enhance_contrast,
+                adjust_brightness=self.adjust_brightness,
+                stats=stats,
+                out=stack[k]
+            )
+            current, stats = stack[k], ImageStats(stack[k])
+
+        context.variants = stack
+        return stack
+
+    def select_variant(self, context, k):
+        """
+        Adota a variante k gerada por preprocess_variants() como imagem atual
+
+        Returns:
+            Dict com status do processamento (mesmo formato de preprocess())
+        """
+        if context.image_codes is not None:
+            context.image_levels = context.variants[k]
+            context.image_tensor = self._apply_levels(context, context.image_tensor)
+            context.image_stats = ImageStats.from_histogram(context.code_histogram, context.image_levels)
+        else:
+            context.image_tensor = context.variants[k]
+            context.owns_tensor = True
+            context.image_stats = ImageStats(context.image_tensor)
+
+        context.variants = None
+
+        report = self._preprocess_report(context)
+        report['variant'] = k
+        return report
+
+    def _preprocess_report(self, context):
+        """Compara a qualidade original com a da imagem atual do contexto"""
+        new_quality = analyze_image_quality(context.image_tensor, context.image_stats)
 
         return {
             'status': 'preprocessed',
             'original': {
-                'brightness': original_brightness,
-                'contrast': original_contrast
+                'brightness': context.quality_report['brightness'],
+                'contrast': context.quality_report['contrast']
             },
             'new': {
                 'brightness': new_quality['brightness'],
@@ -72,31 +224,48 @@ class PreprocessorAgent:
             'improvement': new_quality['quality']
         }
 
-    def get_processed_image(self):
-        """Retorna imagem processada"""
-        return self.image_tensor
+    def _apply_levels(self, context, out):
+        """Materializa image_levels[image_codes] no dtype de cálculo (in-place se out)"""
+        if out is None:
+            out = np.empty(context.image_codes.shape, dtype=self.dtype)
+        levels = context.image_levels.astype(self.dtype, copy=False)
+        return np.take(levels, context.image_codes, out=out)
+
+    def get_processed_image(self, context):
+        """Retorna imagem processada (o buffer é reaproveitado nos reprocessamentos)"""
+        return context.image_tensor
 
-    def get_message_for_classifier(self, preprocessed=False):
+    def get_image_stats(self, context):
+        """Retorna estatísticas da imagem atual (válidas para get_processed_image)"""
+        return context.image_stats
+
+    def get_message_for_classifier(self, context, preprocessed=False):
         """
         Cria mensagem para enviar ao Classificador via Autogen
 
         Args:
+            context: RequestContext da imagem
             preprocessed: Se a imagem foi pré-processada
 
         Returns:
             String com mensagem formatada
         """
+        return self.format_message_for_classifier(context.quality_report, preprocessed)
+
+    @staticmethod
+    def format_message_for_classifier(quality_report, preprocessed=False):
+        """Texto da mensagem ao Classificador a partir do relatório de qualidade"""
         if preprocessed:
             return (
                 f"Imagem pré-processada e pronta para classificação.\n"
-                f"Qualidade: {self.quality_report['quality']}\n"
+                f"Qualidade: {quality_report['quality']}\n"
                 f"Brilho ajustado, contraste melhorado.\n"
                 f"Por favor, classifique esta galáxia."
             )
         else:
             return (
                 f"Imagem analisada - qualidade boa, sem necessidade de pré-processamento.\n"
-                f"Brilho: {self.quality_report['brightness']:.2f}, "
-                f"Contraste: {self.quality_report['contrast']:.2f}\n"
+                f"Brilho: {quality_report['brightness']:.2f}, "
+                f"Contraste: {quality_report['contrast']:.2f}\n"
                 f"Por favor, classifique esta galáxia."
             )
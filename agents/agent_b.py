@@ -1,8 +1,4 @@
 """Agente B: Classificador de Galáxias"""
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from model import MockClassifier
 
 
@@ -11,26 +7,28 @@ class ClassifierAgent:
     Agente responsável por classificar galáxias em spiral ou elliptical
     """
 
-    def __init__(self):
+    def __init__(self, classifier=None):
         self.name = "ClassifierAgent"
-        self.classifier = MockClassifier()
+        # Backend com predict/get_features/predict_batch (model.load_classifier)
+        self.classifier = classifier if classifier is not None else MockClassifier()
         self.confidence_threshold = 0.75
 
-    def classify(self, image_tensor):
+    def classify(self, image_tensor, stats=None):
         """
         Classifica a galáxia
 
         Args:
             image_tensor: Tensor da imagem processada
+            stats: ImageStats da imagem processada, repassado pelo Preprocessor (opcional)
 
         Returns:
             Dict com resultado da classificação
         """
         # Obter predição
-        pred_class, confidence = self.classifier.predict(image_tensor)
+        pred_class, confidence = self.classifier.predict(image_tensor, stats)
 
         # Extrair features para análise
-        features = self.classifier.get_features(image_tensor)
+        features = self.classifier.get_features(image_tensor, stats)
 
         # Determinar se precisa reprocessamento
         needs_reprocessing = confidence < self.confidence_threshold
@@ -43,7 +41,60 @@ class ClassifierAgent:
             'status': 'low_confidence' if needs_reprocessing else 'success'
         }
 
-    def get_message_for_preprocessor(self, result):
+    def classify_stats(self, stats):
+        """
+        Classifica só com as estatísticas da imagem processada (cascata)
+
+        Args:
+            stats: ImageStats da imagem processada (PreprocessorAgent.analyze_histogram)
+
+        Returns:
+            Dict no formato de classify(), ou None se o backend precisar
+            dos pixels
+        """
+        prediction = self.classifier.predict_from_stats(stats)
+        if prediction is None:
+            return None
+
+        pred_class, confidence = prediction
+        needs_reprocessing = confidence < self.confidence_threshold
+        return {
+            'class': pred_class,
+            'confidence': confidence,
+            'features': self.classifier.get_features(None, stats),
+            'needs_reprocessing': needs_reprocessing,
+            'status': 'low_confidence' if needs_reprocessing else 'success'
+        }
+
+    def classify_batch(self, image_batch):
+        """
+        Classifica um lote de galáxias em uma única chamada vetorizada
+
+        Args:
+            image_batch: Array empilhado de imagens processadas [N, H, W]
+
+        Returns:
+            Lista de dicts, um por imagem, no mesmo formato de classify()
+        """
+        classes, confidences, features = self.classifier.predict_batch(image_batch)
+
+        # Aplicar limiar de confiança ao lote inteiro
+        needs_reprocessing = confidences < self.confidence_threshold
+
+        results = []
+        for i in range(len(classes)):
+            results.append({
+                'class': str(classes[i]),
+                'confidence': confidences[i],
+                'features': {name: values[i] for name, values in features.items()},
+                'needs_reprocessing': bool(needs_reprocessing[i]),
+                'status': 'low_confidence' if needs_reprocessing[i] else 'success'
+            })
+
+        return results
+
+    @staticmethod
+    def get_message_for_preprocessor(result):
         """
         Cria mensagem para enviar ao Preprocessor se confiança for baixa
 
@@ -62,7 +113,8 @@ class ClassifierAgent:
         else:
             return None
 
-    def get_final_result(self, result):
+    @staticmethod
+    def get_final_result(result):
         """
         Formata resultado final da classificação
 
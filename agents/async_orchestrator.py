@@ -0,0 +1,232 @@
+"""Orchestrator assíncrono: agentes como consumidores de filas (asyncio)"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agents.agent_a import PreprocessorAgent
+from agents.agent_b import ClassifierAgent
+from agents.context import RequestContext
+from agents.orchestrator import prepare_classification
+from metrics import StageTimer
+
+
+class _Job(RequestContext):
+    """Contexto de uma imagem em trânsito entre as filas dos agentes"""
+
+    def __init__(self, image_path, image_tensor, future):
+        super().__init__(image_path, image_tensor)
+        self.future = future
+        self.iteration = 1
+        self.result = None
+
+
+class AsyncGalaxyClassificationOrchestrator:
+    """
+    Versão asyncio do GalaxyClassificationOrchestrator
+
+    O Agente A (Preprocessor) e o Agente B (Classifier) são consumidores de
+    filas próprias; a conversa A -> B -> A de cada imagem vira mensagens
+    entre essas filas. O trabalho numpy/PIL roda em um executor, então
+    várias imagens ficam em andamento ao mesmo tempo:
+
+    - preprocess_concurrency / classify_concurrency: consumidores por estágio
+    - max_in_flight: imagens aceitas ao mesmo tempo; classify_galaxy aguarda
+      (backpressure) quando o limite é atingido
+
+    Cada resultado tem o mesmo formato do orchestrator síncrono, com o
+    conversation_log daquela imagem apenas. Em 'timings', o tempo de espera
+    nas filas é a diferença entre 'total' e a soma dos estágios.
+    """
+
+    def __init__(self, preprocess_concurrency=4, classify_concurrency=2, max_in_flight=64,
+                 executor=None, dtype=np.float64, instrument=True, metrics=None, classifier=None):
+        self.preprocess_concurrency = preprocess_concurrency
+        self.classify_concurrency = classify_concurrency
+        self.max_in_flight = max_in_flight
+        self.max_iterations = 3
+        self.instrument = instrument
+        self.metrics = metrics  # metrics.Metrics opcional
+
+        # Agentes sem estado por imagem: uma instância atende todos os consumidores
+        self.agent_a = PreprocessorAgent(dtype=dtype)
+        self.agent_b = ClassifierAgent(classifier)
+        self._executor = executor
+        self._own_executor = executor is None
+        self._tasks = []
+
+    async def start(self):
+        """Cria as filas e os consumidores de cada agente"""
+        if self._own_executor:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.preprocess_concurrency + self.classify_concurrency
+            )
+
+        # Nunca há mais que max_in_flight jobs, então as filas nunca bloqueiam o put
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._preprocess_queue = asyncio.Queue(maxsize=self.max_in_flight)
+        self._classify_queue = asyncio.Queue(maxsize=self.max_in_flight)
+
+        self._tasks = (
+            [asyncio.create_task(self._preprocessor_loop()) for _ in range(self.preprocess_concurrency)] +
+            [asyncio.create_task(self._classifier_loop()) for _ in range(self.classify_concurrency)]
+        )
+
+    async def close(self):
+        """Encerra os consumidores e o executor próprio"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def classify_galaxy(self, image_path, image_tensor=None):
+        """
+        Classifica uma imagem (aguarda vaga se houver max_in_flight em andamento)
+
+        Returns:
+            Dict com resultado e log de conversação da imagem
+        """
+        await self._in_flight.acquire()
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(image_path, image_tensor, future)
+        if self.instrument:
+            job.timer = StageTimer()
+
+        try:
+            await self._preprocess_queue.put(job)
+            return await future
+        finally:
+            self._in_flight.release()
+
+    async def classify_many(self, image_paths):
+        """
+        Classifica várias imagens concorrentemente
+
+        Uma imagem que falha (arquivo ilegível, por exemplo) vira um
+        resultado com success=False, como em classify_stream, sem
+        interromper as demais.
+
+        Yields:
+            Dicts de resultado, na ordem de entrada
+        """
+        pending = []
+        try:
+            for image_path in image_paths:
+                pending.append(asyncio.ensure_future(self._classify_or_error(image_path)))
+
+                # Limita as tasks criadas e entrega resultados à medida que ficam prontos
+                while len(pending) > self.max_in_flight or (pending and pending[0].done()):
+                    yield await pending.pop(0)
+
+            while pending:
+                yield await pending.pop(0)
+        finally:
+            # Consumidor parou antes do fim (ou erro): nenhuma task fica sem ser aguardada
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _classify_or_error(self, image_path):
+        """classify_galaxy com a exceção convertida em resultado de erro"""
+        try:
+            return await self.classify_galaxy(image_path)
+        except Exception as exc:
+            return {'success': False, 'image_path': image_path, 'error': str(exc)}
+
+    async def _run(self, function, *args):
+        """Executa trabalho CPU (numpy/PIL) no executor"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _timed(self, job, stage, function, *args):
+        """_run medindo o tempo do estágio no cronômetro do job"""
+        job.timer.mark()
+        result = await self._run(function, *args)
+        job.timer.lap(stage)
+        return result
+
+    async def _preprocessor_loop(self):
+        """Consumidor do Agente A: análise inicial e reprocessamentos"""
+        while True:
+            job = await self._preprocess_queue.get()
+            try:
+                if job.result is None:
+                    await self._analyze(job)
+                else:
+                    await self._timed(job, f'reprocess_{job.iteration}', self.agent_a.preprocess, job)
+                await self._classify_queue.put(job)
+            except Exception as exc:
+                self._fail(job, exc)
+
+    async def _analyze(self, job):
+        """ETAPAS 1-3 (as mesmas do orchestrator síncrono), no executor; cada etapa é medida à parte"""
+        await self._run(prepare_classification, self.agent_a, job)
+
+    async def _classifier_loop(self):
+        """Consumidor do Agente B: classifica e decide entre responder ou pedir reprocessamento"""
+        while True:
+            job = await self._classify_queue.get()
+            try:
+                first = job.result is None
+                job.result = await self._timed(
+                    job,
+                    'classify' if first else f'reprocess_{job.iteration}',
+                    self.agent_b.classify,
+                    self.agent_a.get_processed_image(job),
+                    self.agent_a.get_image_stats(job)
+                )
+
+                if first:
+                    job.log_message("AgentB_Classifier", "System", 'classification', job.result)
+                else:
+                    job.iteration += 1
+
+                if job.result['needs_reprocessing'] and job.iteration < self.max_iterations:
+                    job.log_message("AgentB_Classifier", "AgentA_Preprocessor", 'reprocess_request', job.result)
+                    await self._preprocess_queue.put(job)
+                else:
+                    self._finish(job)
+            except Exception as exc:
+                self._fail(job, exc)
+
+    def _fail(self, job, exc):
+        """Propaga a exceção para quem aguarda o job"""
+        if self.metrics is not None:
+            self.metrics.observe({'success': False})
+        if not job.future.done():
+            job.future.set_exception(exc)
+
+    def _finish(self, job):
+        """ETAPA 6: resultado final da imagem"""
+        result = job.result
+        job.log_message("AgentB_Classifier", "User", 'final_result', result)
+
+        final = {
+            'success': True,
+            'classification': result['class'],
+            'confidence': result['confidence'],
+            'preprocessed': job.preprocessed,
+            'iterations': job.iteration,
+            'variant': None,
+            'conversation_log': job.conversation_log,
+            'image_path': job.image_path
+        }
+        timings = job.timer.result()
+        if timings is not None:
+            final['timings'] = timings
+        if self.metrics is not None:
+            self.metrics.observe(final)
+
+        if not job.future.done():
+            job.future.set_result(final)
@@ -0,0 +1,44 @@
+"""Contexto de requisição: estado de uma classificação em andamento"""
+from metrics import NULL_TIMER
+
+
+class RequestContext:
+    """
+    Estado por imagem compartilhado entre os agentes durante uma classificação
+
+    Os agentes guardam só configuração; tudo o que muda a cada imagem
+    (pixels, estatísticas, relatório de qualidade, log da conversa) vive
+    aqui. Assim um mesmo orchestrator pode atender várias threads, cada
+    requisição com seu próprio contexto.
+    """
+
+    def __init__(self, image_path, image_tensor=None):
+        self.image_path = image_path
+        self.image_tensor = image_tensor
+        self.image_stats = None
+        self.quality_report = None
+        self.conversation_log = []
+        self.preprocessed = False
+        self.timer = NULL_TIMER  # metrics.StageTimer quando a instrumentação está ligada
+
+        # Imagens de 8 bits: pixels = image_levels[image_codes] (caminho rápido por LUT)
+        self.image_codes = None
+        self.image_levels = None
+        self.code_histogram = None
+        self.owns_tensor = False  # Buffer do contexto, reaproveitado nos reprocessamentos
+        self.variants = None  # LUTs ou imagens de preprocess_variants()
+        self.image_hash = None  # dHash dos pixels, quando há índice de quase-duplicatas (dedup.py)
+
+    def log_message(self, sender, receiver, kind, data):
+        """
+        Registra mensagem na conversa desta imagem
+
+        Guarda só o tipo e os dados da mensagem; o texto é formatado sob
+        demanda por agents.orchestrator.render_message.
+        """
+        self.conversation_log.append({
+            'from': sender,
+            'to': receiver,
+            'kind': kind,
+            'data': data
+        })
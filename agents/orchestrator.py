@@ -1,146 +1,753 @@
 """Orchestrator: Coordena comunicação entre agentes usando Autogen"""
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import queue
+import threading
+import time
+
+import numpy as np
 
 from agents.agent_a import PreprocessorAgent
 from agents.agent_b import ClassifierAgent
+from agents.context import RequestContext
+from metrics import StageTimer, NULL_TIMER
+from utils import load_image
+
+
+def quality_log_message(quality_report):
+    """Mensagem de log da análise de qualidade do Agente A"""
+    return (
+        f"Análise de qualidade: {quality_report['quality']} "
+        f"(brilho={quality_report['brightness']:.2f}, "
+        f"contraste={quality_report['contrast']:.2f})"
+    )
+
+
+def preprocess_log_message(preprocess_result):
+    """Mensagem de log do pré-processamento do Agente A"""
+    return (
+        f"Imagem pré-processada. Melhoria aplicada: "
+        f"{preprocess_result['original']['brightness']:.2f} -> "
+        f"{preprocess_result['new']['brightness']:.2f}"
+    )
+
+
+def classification_log_message(result):
+    """Mensagem de log da classificação do Agente B"""
+    return f"Classificação: {result['class']} (confiança={result['confidence']:.2f})"
+
+
+def speculative_log_message(choice):
+    """Mensagem de log da variante escolhida no reprocessamento especulativo"""
+    return (
+        f"Reprocessamento especulativo: variante {choice['variant'] + 1}/{choice['n_variants']} "
+        f"escolhida (confianças={choice['confidences']})"
+    )
+
+
+def classification_request(quality_report, preprocessed):
+    """Dados do pedido de classificação do Agente A para o Agente B"""
+    return {
+        'quality': quality_report['quality'],
+        'brightness': quality_report['brightness'],
+        'contrast': quality_report['contrast'],
+        'preprocessed': preprocessed
+    }
+
+
+def prepare_classification(agent_a, context, verbose=False):
+    """
+    ETAPAS 1-3: decodificação, análise de qualidade, pré-processamento e pedido ao Agente B
+
+    Passos comuns a classify_galaxy, classify_batch e ao orchestrator
+    assíncrono; ao final, a imagem do contexto está pronta para a ETAPA 4.
+
+    Args:
+        agent_a: PreprocessorAgent
+        context: RequestContext da imagem (o tempo de cada etapa vai para context.timer)
+        verbose: Acompanhar as etapas no terminal
+    """
+    timer = context.timer
+
+    # Decodificação separada da análise para ser medida à parte
+    if context.image_tensor is None:
+        timer.mark()
+        context.image_tensor = load_image(context.image_path, dtype=np.uint8)
+        timer.lap('decode')
+
+    # ETAPA 1: Agente A analisa qualidade
+    if verbose:
+        print("\n[AGENTE A - PREPROCESSOR] Analisando qualidade da imagem...")
+    timer.mark()
+    quality_report = agent_a.analyze_quality(context)
+    timer.lap('quality')
+
+    context.log_message("AgentA_Preprocessor", "System", 'quality', quality_report)
+
+    if verbose:
+        print(f"   Qualidade: {quality_report['quality']}")
+        print(f"   Issues: {quality_report['issues'] if quality_report['issues'] else 'Nenhum'}")
+
+    # ETAPA 2: Pré-processar se necessário
+    context.preprocessed = quality_report['recommendation'] == 'preprocess'
+    if context.preprocessed:
+        if verbose:
+            print("\n[AGENTE A] Aplicando pré-processamento...")
+        timer.mark()
+        preprocess_result = agent_a.preprocess(context)
+        timer.lap('preprocess')
+
+        context.log_message("AgentA_Preprocessor", "AgentB_Classifier", 'preprocess', preprocess_result)
+
+        if verbose:
+            print(f"   Brilho: {preprocess_result['original']['brightness']:.2f} -> "
+                  f"{preprocess_result['new']['brightness']:.2f}")
+            print(f"   Contraste: {preprocess_result['original']['contrast']:.2f} -> "
+                  f"{preprocess_result['new']['contrast']:.2f}")
+
+    # ETAPA 3: Agente A comunica com Agente B
+    request = classification_request(context.quality_report, context.preprocessed)
+    context.log_message("AgentA_Preprocessor", "AgentB_Classifier", 'classification_request', request)
+
+    if verbose:
+        print(f"\n[AGENTE A -> AGENTE B]")
+        print(f"   {render_message(context.conversation_log[-1])}")
+
+
+# Formatação de cada tipo de entrada do conversation_log
+MESSAGE_RENDERERS = {
+    'quality': quality_log_message,
+    'preprocess': preprocess_log_message,
+    'classification_request': lambda request: PreprocessorAgent.format_message_for_classifier(
+        request, request['preprocessed']
+    ),
+    'classification': classification_log_message,
+    'reprocess_request': ClassifierAgent.get_message_for_preprocessor,
+    'speculative_choice': speculative_log_message,
+    'final_result': ClassifierAgent.get_final_result
+}
+
+
+def render_message(entry):
+    """
+    Texto de uma entrada do conversation_log
+
+    As entradas guardam só o tipo e os dados (registros estruturados); o
+    texto é formatado aqui, apenas quando alguém pede para vê-lo.
+    """
+    if 'message' in entry:
+        return entry['message']
+    return MESSAGE_RENDERERS[entry['kind']](entry['data'])
 
 
 class GalaxyClassificationOrchestrator:
     """
     Orquestra a comunicação entre Agente A (Preprocessor) e Agente B (Classifier)
     Implementa padrão de comunicação multi-agente
+
+    O estado de cada classificação fica em um RequestContext próprio, então
+    uma instância (com um único MockClassifier) pode ser usada por várias
+    threads ao mesmo tempo.
     """
 
-    def __init__(self):
-        self.agent_a = PreprocessorAgent()
-        self.agent_b = ClassifierAgent()
-        self.conversation_log = []
+    def __init__(self, cache=None, dtype=np.float64, speculative=False, instrument=True, metrics=None,
+                 verbose=True, dedup=None, classifier=None, cascade=False, collect_features=False):
+        self.agent_a = PreprocessorAgent(dtype=dtype)
+        self.agent_b = ClassifierAgent(classifier)
         self.max_iterations = 3
+        self._local = threading.local()  # Último log de conversa de cada thread
+        self.cache = cache  # ResultCache opcional (cache.py)
+        # Reprocessamento especulativo: todas as variantes avaliadas em um único lote
+        self.speculative = speculative
+        # Tempos por estágio nos resultados ('timings'); False = nenhuma leitura de relógio
+        self.instrument = instrument
+        self.metrics = metrics  # metrics.Metrics opcional, alimentado a cada resultado
+        # Acompanhamento da conversa no terminal; False = nada é formatado nem impresso
+        self.verbose = verbose
+        # DedupIndex opcional (dedup.py): quase-duplicatas reaproveitam o resultado já calculado
+        self.dedup = dedup
+        # Cascata: decisões finais já no histograma dispensam materializar a imagem
+        self.cascade = cascade
+        # Resultados de classify_galaxy com 'features' (features.py), calculadas da imagem já decodificada
+        self.collect_features = collect_features
 
-    def log_message(self, sender, receiver, message):
-        """Registra mensagem na conversa"""
-        self.conversation_log.append({
-            'from': sender,
-            'to': receiver,
-            'message': message
-        })
+    def get_config(self):
+        """Retorna a configuração que influencia o resultado da classificação"""
+        return {
+            'classifier': self.agent_b.classifier.get_config(),
+            'confidence_threshold': self.agent_b.confidence_threshold,
+            'max_iterations': self.max_iterations,
+            'speculative': self.speculative,
+            'cascade': self.cascade,
+            'preprocessing': {
+                'enhance_contrast': self.agent_a.enhance_contrast,
+                'adjust_brightness': self.agent_a.adjust_brightness,
+                'dtype': np.dtype(self.agent_a.dtype).name
+            }
+        }
 
-    def classify_galaxy(self, image_path):
+    def classify_galaxy(self, image_path, image_tensor=None):
         """
         Pipeline completo de classificação com comunicação entre agentes
 
         Args:
             image_path: Caminho da imagem
+            image_tensor: Imagem já carregada (opcional, evita recarregar do disco)
 
         Returns:
-            Dict com resultado e log de conversação
+            Dict com resultado e log de conversação (desta imagem apenas),
+            com instrument ligado, 'timings' em milissegundos por estágio e,
+            com collect_features ligado, 'features' (se a imagem foi decodificada)
         """
-        print(f"\n🚀 Iniciando classificação: {image_path}")
-        print("="*60)
+        context = RequestContext(image_path, image_tensor)
+        context.timer = StageTimer() if self.instrument else NULL_TIMER
+        self._local.last_log = context.conversation_log
 
-        # ETAPA 1: Agente A analisa qualidade
-        print("\n[AGENTE A - PREPROCESSOR] Analisando qualidade da imagem...")
-        quality_report = self.agent_a.analyze_quality(image_path)
-
-        self.log_message(
-            "AgentA_Preprocessor",
-            "System",
-            f"Análise de qualidade: {quality_report['quality']} "
-            f"(brilho={quality_report['brightness']:.2f}, "
-            f"contraste={quality_report['contrast']:.2f})"
-        )
+        result = self._classify(context)
 
-        print(f"   Qualidade: {quality_report['quality']}")
-        print(f"   Issues: {quality_report['issues'] if quality_report['issues'] else 'Nenhum'}")
+        if self.collect_features:
+            features = self._image_features(context)
+            if features is not None:
+                result['features'] = features
 
-        # ETAPA 2: Pré-processar se necessário
-        preprocessed = False
-        if quality_report['recommendation'] == 'preprocess':
-            print("\n[AGENTE A] Aplicando pré-processamento...")
-            preprocess_result = self.agent_a.preprocess()
-            preprocessed = True
+        timings = context.timer.result()
+        if timings is not None:
+            result['timings'] = timings
+        if self.metrics is not None:
+            self.metrics.observe(result)
 
-            self.log_message(
-                "AgentA_Preprocessor",
-                "AgentB_Classifier",
-                f"Imagem pré-processada. Melhoria aplicada: "
-                f"{preprocess_result['original']['brightness']:.2f} -> "
-                f"{preprocess_result['new']['brightness']:.2f}"
-            )
+        return result
 
-            print(f"   Brilho: {preprocess_result['original']['brightness']:.2f} -> "
-                  f"{preprocess_result['new']['brightness']:.2f}")
-            print(f"   Contraste: {preprocess_result['original']['contrast']:.2f} -> "
-                  f"{preprocess_result['new']['contrast']:.2f}")
+    def _image_features(self, context):
+        """
+        Linha do store colunar (features.histogram_features) desta imagem
 
-        # ETAPA 3: Agente A comunica com Agente B
-        message_to_b = self.agent_a.get_message_for_classifier(preprocessed)
-        self.log_message("AgentA_Preprocessor", "AgentB_Classifier", message_to_b)
+        Reaproveita o histograma da análise de qualidade; saídas da cascata
+        e quase-duplicatas só têm os códigos decodificados (um bincount).
 
-        print(f"\n[AGENTE A -> AGENTE B]")
-        print(f"   {message_to_b}")
+        Returns:
+            Dict de features ou None (resultado do cache, sem decodificação,
+            ou imagem recebida já em float)
+        """
+        histogram = context.code_histogram
+        if histogram is None:
+            codes = context.image_tensor
+            if codes is None or codes.dtype != np.uint8:
+                return None
+            histogram = np.bincount(codes.ravel(), minlength=256)
+
+        from features import histogram_features
+        return histogram_features(histogram, self.agent_a.enhance_contrast, self.agent_a.adjust_brightness)
+
+    def _classify(self, context):
+        """Consulta o cache (se houver) e executa o pipeline"""
+        if self.cache is None:
+            return self._deduplicate(context)
+
+        # Consultar cache: custo de um hash do arquivo (ou dos pixels já carregados) por imagem
+        source = context.image_path if context.image_tensor is None else context.image_tensor
+        key, fingerprint = self.cache.key_for(source, self.get_config())
+        cached = self.cache.get(key)
+        context.timer.lap('cache_lookup')
+
+        if cached is not None:
+            if self.verbose:
+                print(f"\n♻️  Resultado em cache: {context.image_path} -> "
+                      f"{cached['classification']} ({cached['confidence']:.2f})")
+            context.conversation_log.extend(cached['conversation_log'])
+            cached['conversation_log'] = context.conversation_log
+            cached['cached'] = True
+            cached.pop('timings', None)  # Tempos da execução que gerou a entrada
+            return cached
+
+        result = self._deduplicate(context)
+        if 'duplicate_of' in result:
+            return result  # O cache guarda só resultados calculados para estes pixels
+
+        self.cache.put(key, fingerprint, result)
+        context.timer.lap('cache_store')
+
+        result['cached'] = False
+        return result
+
+    def _deduplicate(self, context):
+        """Reaproveita o resultado de uma quase-duplicata (se houver índice) ou executa o pipeline"""
+        if self.dedup is None:
+            return self._run_pipeline(context)
+
+        duplicate = self._find_duplicate(context)
+        if duplicate is not None:
+            if self.verbose:
+                print(f"\n🔁 Quase-duplicata de {duplicate['duplicate_of']} "
+                      f"(distância {duplicate['hash_distance']}): {context.image_path} -> "
+                      f"{duplicate['classification']} ({duplicate['confidence']:.2f})")
+            return duplicate
+
+        result = self._run_pipeline(context)
+        self.dedup.add(context.image_hash, context.image_path, result)
+        context.timer.lap('dedup_store')
+        return result
+
+    def _find_duplicate(self, context):
+        """
+        Decodifica a imagem, calcula o dHash e procura no índice de quase-duplicatas
+
+        Returns:
+            Resultado da imagem encontrada (com 'duplicate_of' e
+            'hash_distance') ou None
+        """
+        timer = context.timer
+        if context.image_tensor is None:
+            timer.mark()
+            context.image_tensor = load_image(context.image_path, dtype=np.uint8)
+            timer.lap('decode')
+
+        from dedup import dhash
+
+        timer.mark()
+        context.image_hash = dhash(context.image_tensor)
+        match = self.dedup.lookup(context.image_hash)
+        timer.lap('dedup_lookup')
+        if match is None:
+            return None
+
+        result = match['result']
+        context.conversation_log.extend(result['conversation_log'])
+        result['conversation_log'] = context.conversation_log
+        result.pop('timings', None)
+        result['duplicate_of'] = match['image_path']
+        result['hash_distance'] = match['distance']
+        return result
+
+    def _run_pipeline(self, context):
+        """Executa o pipeline de agentes (sem cache)"""
+        timer = context.timer
+        verbose = self.verbose
+        if verbose:
+            print(f"\n🚀 Iniciando classificação: {context.image_path}")
+            print("="*60)
+
+        result = self._prepare(context, verbose)
+        if result is not None:
+            return result  # Saída antecipada da cascata
 
         # ETAPA 4: Agente B classifica
-        print(f"\n[AGENTE B - CLASSIFIER] Classificando galáxia...")
-        processed_image = self.agent_a.get_processed_image()
-        result = self.agent_b.classify(processed_image)
-
-        self.log_message(
-            "AgentB_Classifier",
-            "System",
-            f"Classificação: {result['class']} (confiança={result['confidence']:.2f})"
-        )
+        if verbose:
+            print(f"\n[AGENTE B - CLASSIFIER] Classificando galáxia...")
+        timer.mark()
+        processed_image = self.agent_a.get_processed_image(context)
+        result = self.agent_b.classify(processed_image, self.agent_a.get_image_stats(context))
+        timer.lap('classify')
+
+        context.log_message("AgentB_Classifier", "System", 'classification', result)
 
-        print(f"   Predição: {result['class']}")
-        print(f"   Confiança: {result['confidence']:.2f}")
+        if verbose:
+            print(f"   Predição: {result['class']}")
+            print(f"   Confiança: {result['confidence']:.2f}")
 
         # ETAPA 5: Se baixa confiança, Agente B pode pedir reprocessamento
         iteration = 1
-        while result['needs_reprocessing'] and iteration < self.max_iterations:
-            print(f"\n[AGENTE B -> AGENTE A] Solicitando reprocessamento (iteração {iteration})...")
+        variant = None
+        if self.speculative and result['needs_reprocessing'] and iteration < self.max_iterations:
+            timer.mark()
+            result, variant = self._reprocess_speculative(context, result, verbose)
+            timer.lap('reprocess_speculative')
+            iteration += variant + 1
 
-            message_to_a = self.agent_b.get_message_for_preprocessor(result)
-            self.log_message("AgentB_Classifier", "AgentA_Preprocessor", message_to_a)
+        while result['needs_reprocessing'] and iteration < self.max_iterations:
+            context.log_message("AgentB_Classifier", "AgentA_Preprocessor", 'reprocess_request', result)
 
-            print(f"   {message_to_a}")
+            if verbose:
+                print(f"\n[AGENTE B -> AGENTE A] Solicitando reprocessamento (iteração {iteration})...")
+                print(f"   {render_message(context.conversation_log[-1])}")
+                # Agente A reprocessa com ajustes mais agressivos
+                print("\n[AGENTE A] Reprocessando com ajustes mais agressivos...")
 
-            # Agente A reprocessa com ajustes mais agressivos
-            print("\n[AGENTE A] Reprocessando com ajustes mais agressivos...")
-            self.agent_a.preprocess()
-            processed_image = self.agent_a.get_processed_image()
+            timer.mark()
+            self.agent_a.preprocess(context)
+            processed_image = self.agent_a.get_processed_image(context)
 
             # Agente B tenta novamente
-            print(f"\n[AGENTE B] Reclassificando...")
-            result = self.agent_b.classify(processed_image)
-            print(f"   Nova confiança: {result['confidence']:.2f}")
+            if verbose:
+                print(f"\n[AGENTE B] Reclassificando...")
+            result = self.agent_b.classify(processed_image, self.agent_a.get_image_stats(context))
+            timer.lap(f'reprocess_{iteration}')
+            if verbose:
+                print(f"   Nova confiança: {result['confidence']:.2f}")
 
             iteration += 1
 
         # ETAPA 6: Resultado final
-        final_message = self.agent_b.get_final_result(result)
-        self.log_message("AgentB_Classifier", "User", final_message)
+        context.log_message("AgentB_Classifier", "User", 'final_result', result)
 
-        print(final_message)
+        if verbose:
+            print(render_message(context.conversation_log[-1]))
 
         return {
             'success': True,
             'classification': result['class'],
             'confidence': result['confidence'],
-            'preprocessed': preprocessed,
+            'preprocessed': context.preprocessed,
             'iterations': iteration,
-            'conversation_log': self.conversation_log
+            'variant': variant,
+            'conversation_log': context.conversation_log
+        }
+
+    def _prepare(self, context, verbose=False):
+        """
+        Cascata (se ligada) e, se ela não decidir, ETAPAS 1-3 (prepare_classification)
+
+        Returns:
+            Resultado final da saída antecipada da cascata, ou None (imagem
+            pronta para a ETAPA 4)
+        """
+        if self.cascade:
+            result = self._early_exit(context)
+            if result is not None:
+                if verbose:
+                    print("\n⚡ [CASCATA] Decisão final tomada sobre o histograma da imagem")
+                    print(render_message(context.conversation_log[-1]))
+                return result
+
+        prepare_classification(self.agent_a, context, verbose)
+        return None
+
+    def _early_exit(self, context):
+        """
+        Cascata: ETAPAS 1-4 sobre o histograma dos códigos de 8 bits
+
+        Com o backend mock, qualidade, pré-processamento e classificação
+        dependem só do histograma, então as decisões são exatamente as do
+        pipeline completo. Se a primeira classificação dispensar
+        reprocessamento, o resultado (e o log da conversa) sai daqui sem
+        materializar a imagem; senão a imagem segue para o pipeline.
+
+        Returns:
+            Dict de resultado final (com 'early_exit') ou None
+        """
+        timer = context.timer
+        if context.image_tensor is None:
+            timer.mark()
+            context.image_tensor = load_image(context.image_path, dtype=np.uint8)
+            timer.lap('decode')
+
+        if context.image_tensor.dtype != np.uint8:
+            return None  # Histograma de códigos só para imagens de 8 bits
+
+        timer.mark()
+        quality_report, preprocess_result = self.agent_a.analyze_histogram(context)
+        result = self.agent_b.classify_stats(context.image_stats)
+        timer.lap('cascade')
+
+        if result is None or result['needs_reprocessing']:
+            return None
+
+        context.log_message("AgentA_Preprocessor", "System", 'quality', quality_report)
+        if preprocess_result is not None:
+            context.log_message("AgentA_Preprocessor", "AgentB_Classifier", 'preprocess', preprocess_result)
+        context.log_message("AgentA_Preprocessor", "AgentB_Classifier", 'classification_request',
+                            classification_request(context.quality_report, context.preprocessed))
+        context.log_message("AgentB_Classifier", "System", 'classification', result)
+        context.log_message("AgentB_Classifier", "User", 'final_result', result)
+
+        return {
+            'success': True,
+            'classification': result['class'],
+            'confidence': result['confidence'],
+            'preprocessed': context.preprocessed,
+            'iterations': 1,
+            'variant': None,
+            'early_exit': True,
+            'conversation_log': context.conversation_log
         }
 
-    def get_conversation_summary(self):
-        """Retorna sumário da conversação entre agentes"""
+    def _reprocess_speculative(self, context, result, verbose=False):
+        """
+        Avalia todas as variantes de reprocessamento em um único lote
+
+        Gera as max_iterations - 1 variantes que o loop serial produziria,
+        classifica todas com uma chamada vetorizada e aplica a mesma regra
+        de aceitação: vence a primeira variante com confiança suficiente
+        (ou a última, se nenhuma atingir o limiar). Com verbose, acompanha
+        a escolha no terminal.
+
+        Returns:
+            (resultado da variante vencedora, índice da variante)
+        """
+        n_variants = self.max_iterations - 1
+
+        context.log_message("AgentB_Classifier", "AgentA_Preprocessor", 'reprocess_request', result)
+        if verbose:
+            print(f"\n[AGENTE B -> AGENTE A] Solicitando reprocessamento especulativo ({n_variants} variantes)...")
+            print(f"   {render_message(context.conversation_log[-1])}")
+
+        variants = self.agent_a.preprocess_variants(context, n_variants)
+        candidates = self.agent_b.classify_batch(variants)
+
+        variant = next(
+            (k for k, candidate in enumerate(candidates) if not candidate['needs_reprocessing']),
+            n_variants - 1
+        )
+        self.agent_a.select_variant(context, variant)
+        result = candidates[variant]
+
+        context.log_message("AgentB_Classifier", "System", 'speculative_choice', {
+            'variant': variant,
+            'n_variants': n_variants,
+            'confidences': [float(c['confidence']) for c in candidates]
+        })
+        if verbose:
+            print(f"   Variante escolhida: {variant + 1}/{n_variants}")
+            print(f"   Nova confiança: {result['confidence']:.2f}")
+
+        return result, variant
+
+    def classify_batch(self, items):
+        """
+        Classifica várias imagens juntas, com o Agente B avaliando cada
+        rodada de classificação em uma única chamada vetorizada
+
+        Mesmo fluxo de conversa e mesmos resultados de classify_galaxy, sem
+        o acompanhamento no terminal (usado pelo modo serve, onde as requisições
+        concorrentes são agrupadas em micro-lotes). Falhas de uma imagem
+        viram um resultado com success=False, sem afetar o resto do lote.
+
+        Args:
+            items: Lista de (image_path, image_tensor ou None)
+
+        Returns:
+            Lista de dicts de resultado, na ordem de items
+        """
+        results = [None] * len(items)
+        contexts = []
+        keys = {}
+        early = []  # Índices decididos pela cascata
+
+        for i, (image_path, image_tensor) in enumerate(items):
+            context = RequestContext(image_path, image_tensor)
+            context.timer = StageTimer() if self.instrument else NULL_TIMER
+
+            if self.cache is not None:
+                source = image_path if image_tensor is None else image_tensor
+                keys[i] = self.cache.key_for(source, self.get_config())
+                cached = self.cache.get(keys[i][0])
+                context.timer.lap('cache_lookup')
+                if cached is not None:
+                    context.conversation_log.extend(cached['conversation_log'])
+                    cached['conversation_log'] = context.conversation_log
+                    cached['cached'] = True
+                    cached.pop('timings', None)
+                    results[i] = cached
+                    contexts.append(context)
+                    continue
+
+            contexts.append(context)
+            try:
+                if self.dedup is not None:
+                    # Só contra o índice: quase-duplicatas dentro do mesmo lote são todas classificadas
+                    results[i] = self._find_duplicate(context)
+                    if results[i] is not None:
+                        continue
+                results[i] = self._prepare(context)
+                if results[i] is not None:
+                    early.append(i)
+            except Exception as exc:
+                results[i] = {'success': False, 'image_path': image_path, 'error': str(exc)}
+
+        # ETAPAS 4-5 em rodadas: cada rodada classifica em lote as imagens pendentes
+        pending = [i for i in range(len(items)) if results[i] is None]
+        classified = {}
+        iterations = dict.fromkeys(pending, 1)
+        variants = dict.fromkeys(pending)
+        first_round = True
+
+        while pending:
+            stage = 'classify' if first_round else f'reprocess_{iterations[pending[0]]}'
+            for i, result in zip(pending, self._classify_contexts([contexts[i] for i in pending], stage)):
+                classified[i] = result
+                if first_round:
+                    contexts[i].log_message("AgentB_Classifier", "System", 'classification', result)
+                else:
+                    iterations[i] += 1
+
+            retry = []
+            for i in pending:
+                context, result = contexts[i], classified[i]
+                if not result['needs_reprocessing'] or iterations[i] >= self.max_iterations:
+                    continue
+
+                if self.speculative:
+                    context.timer.mark()
+                    classified[i], variants[i] = self._reprocess_speculative(context, classified[i])
+                    context.timer.lap('reprocess_speculative')
+                    iterations[i] += variants[i] + 1
+                    continue
+
+                context.log_message("AgentB_Classifier", "AgentA_Preprocessor", 'reprocess_request', result)
+                context.timer.mark()
+                self.agent_a.preprocess(context)
+                context.timer.lap(f'reprocess_{iterations[i]}')
+                retry.append(i)
+
+            pending = retry
+            first_round = False
+
+        # ETAPA 6: resultados finais
+        for i, result in classified.items():
+            context = contexts[i]
+            context.log_message("AgentB_Classifier", "User", 'final_result', result)
+            results[i] = {
+                'success': True,
+                'classification': result['class'],
+                'confidence': result['confidence'],
+                'preprocessed': context.preprocessed,
+                'iterations': iterations[i],
+                'variant': variants[i],
+                'conversation_log': context.conversation_log
+            }
+
+        for i in early + list(classified):
+            if self.dedup is not None:
+                self.dedup.add(contexts[i].image_hash, contexts[i].image_path, results[i])
+            if self.cache is not None:
+                self.cache.put(*keys[i], results[i])
+                results[i]['cached'] = False
+
+        for context, result in zip(contexts, results):
+            result['image_path'] = context.image_path
+            timings = context.timer.result()
+            if timings is not None and result['success']:
+                result['timings'] = timings
+            if self.metrics is not None:
+                self.metrics.observe(result)
+
+        return results
+
+    def _classify_contexts(self, contexts, stage):
+        """
+        Classifica as imagens atuais dos contextos com classify_batch do Agente B
+
+        Imagens de formatos diferentes formam sub-lotes separados; o tempo
+        de cada sub-lote é atribuído ao estágio de todas as suas imagens.
+        """
+        groups = {}
+        for position, context in enumerate(contexts):
+            image = self.agent_a.get_processed_image(context)
+            groups.setdefault((image.shape, image.dtype.str), []).append(position)
+
+        results = [None] * len(contexts)
+        for positions in groups.values():
+            start = time.perf_counter()
+            batch = np.stack([self.agent_a.get_processed_image(contexts[p]) for p in positions])
+            for position, result in zip(positions, self.agent_b.classify_batch(batch)):
+                results[position] = result
+            elapsed = time.perf_counter() - start
+            for position in positions:
+                contexts[position].timer.add(stage, elapsed)
+
+        return results
+
+    def classify_stream(self, image_paths, readahead=8):
+        """
+        Classifica imagens de forma preguiçosa (generator), em estágios
+
+        Uma thread de leitura carrega e decodifica até `readahead` imagens
+        à frente enquanto a análise de qualidade, o pré-processamento e a
+        classificação rodam no consumidor. Os caminhos são consumidos sob
+        demanda, então a memória fica limitada mesmo para listas enormes.
+
+        Args:
+            image_paths: Iterável de caminhos (pode ser um generator)
+            readahead: Máximo de imagens carregadas aguardando classificação
+
+        Yields:
+            Dict de resultado por imagem, na ordem de entrada
+        """
+        buffer = queue.Queue(maxsize=max(1, readahead))
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Bloqueia enquanto o buffer estiver cheio, mas desiste se o consumidor parar
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def load_ahead():
+            try:
+                for image_path in image_paths:
+                    try:
+                        item = (image_path, load_image(image_path, dtype=np.uint8), None)
+                    except Exception as exc:
+                        item = (image_path, None, exc)
+                    if not put(item):
+                        return
+            finally:
+                put(done)
+
+        loader = threading.Thread(target=load_ahead, daemon=True)
+        loader.start()
+
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    break
+
+                image_path, image_tensor, error = item
+                if error is not None:
+                    failure = {'success': False, 'image_path': image_path, 'error': str(error)}
+                    if self.metrics is not None:
+                        self.metrics.observe(failure)
+                    yield failure
+                    continue
+
+                result = self.classify_galaxy(image_path, image_tensor)
+                result['image_path'] = image_path
+                yield result
+        finally:
+            stop.set()
+
+    def classify_shard(self, reader, start=0, stop=None):
+        """
+        Classifica as imagens de um shard empacotado (shards.ShardReader)
+
+        As imagens são views uint8 do memmap: nenhum pixel é copiado para
+        fora do arquivo além do buffer de trabalho do Agente A.
+
+        Args:
+            reader: ShardReader aberto
+            start: Primeira posição do shard
+            stop: Posição final (exclusiva; None = até o fim)
+
+        Yields:
+            Dict de resultado por imagem, com 'image_path' = nome no índice
+        """
+        for names, _, images in reader.iter_batches(start=start, stop=stop):
+            for name, image in zip(names, images):
+                result = self.classify_galaxy(name, image)
+                result['image_path'] = name
+                yield result
+
+    def get_conversation_summary(self, conversation_log=None):
+        """
+        Retorna sumário da conversação entre agentes
+
+        Args:
+            conversation_log: Log de um resultado (padrão: última
+                classificação feita nesta thread)
+        """
+        if conversation_log is None:
+            conversation_log = getattr(self._local, 'last_log', [])
+
         summary = "\n" + "="*60 + "\n"
         summary += "LOG DE CONVERSAÇÃO ENTRE AGENTES\n"
         summary += "="*60 + "\n"
 
-        for i, msg in enumerate(self.conversation_log, 1):
+        for i, msg in enumerate(conversation_log, 1):
             summary += f"\n[{i}] {msg['from']} -> {msg['to']}\n"
-            summary += f"    {msg['message']}\n"
+            summary += f"    {render_message(msg)}\n"
 
         return summary
@@ -0,0 +1,494 @@
+"""Benchmark do pipeline de classificação (saída JSON comparável entre commits)"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import PIL
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from generate_dataset import generate_dataset
+from model import MockClassifier
+from utils import ImageStats, UINT8_LEVELS, load_image, analyze_image_quality, preprocess_image
+
+
+BENCH_FORMAT = 2  # 2: estágios sem sufixo medem o caminho uint8/LUT
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Módulos que --help não deve carregar (ver imports preguiçosos do main.py)
+HEAVY_MODULES = ('numpy', 'PIL')
+
+
+def summarize(durations_ns):
+    """
+    Resume tempos de execução
+
+    Args:
+        durations_ns: Lista de durações em nanossegundos
+
+    Returns:
+        Dict com n, média/p50/p95/mínimo em microssegundos e vazão (itens/s)
+    """
+    durations = np.asarray(durations_ns, dtype=np.float64) / 1000.0
+    total_s = durations.sum() / 1e6
+    return {
+        'n': len(durations),
+        'mean_us': round(float(durations.mean()), 2),
+        'p50_us': round(float(np.percentile(durations, 50)), 2),
+        'p95_us': round(float(np.percentile(durations, 95)), 2),
+        'min_us': round(float(durations.min()), 2),
+        'throughput_per_s': round(len(durations) / total_s, 1) if total_s else 0.0
+    }
+
+
+def time_each(function, items):
+    """Chama function(item) para cada item, medindo cada chamada"""
+    durations = []
+    for item in items:
+        start = time.perf_counter_ns()
+        function(item)
+        durations.append(time.perf_counter_ns() - start)
+    return durations
+
+
+def bench_stages(image_paths):
+    """
+    Mede cada estágio do pipeline separadamente, imagem a imagem
+
+    Os estágios sem sufixo seguem o caminho padrão do pipeline: decodificação
+    em uint8, estatísticas pelo histograma dos códigos e pré-processamento
+    por LUT. Os com sufixo _float64 medem o caminho de referência (imagem
+    float64 e percentis sobre os pixels), lado a lado.
+
+    Returns:
+        Dict {estágio: resumo de summarize()}
+    """
+    classifier = MockClassifier()
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+
+    def uint8_stats(codes):
+        return ImageStats.from_histogram(np.bincount(codes.ravel(), minlength=256))
+
+    codes = [load_image(path, dtype=np.uint8) for path in image_paths]  # Aquecimento do cache de disco
+    stats = [uint8_stats(image) for image in codes]
+    images = [UINT8_LEVELS[image] for image in codes]  # Imagens float64 materializadas pelo Agente A
+    results = {
+        'load_image': summarize(time_each(lambda path: load_image(path, dtype=np.uint8), image_paths)),
+        'analyze_image_quality': summarize(time_each(
+            lambda i: analyze_image_quality(images[i], uint8_stats(codes[i])), range(len(codes))
+        )),
+        'preprocess_image': summarize(time_each(
+            lambda i: preprocess_image(codes[i], stats=stats[i], dtype=np.float64), range(len(codes))
+        )),
+        'predict': summarize(time_each(lambda i: classifier.predict(images[i], stats[i]), range(len(codes))))
+    }
+
+    results['load_image_float64'] = summarize(time_each(load_image, image_paths))
+    results['analyze_image_quality_float64'] = summarize(time_each(analyze_image_quality, images))
+    results['preprocess_image_float64'] = summarize(time_each(preprocess_image, images))
+    results['predict_float64'] = summarize(time_each(classifier.predict, images))
+
+    results['classify_galaxy'] = summarize(time_each(orchestrator.classify_galaxy, image_paths))
+
+    return results
+
+
+def bench_batch_sizes(image_paths, batch_sizes, classifier=None):
+    """
+    Vazão de predict_batch por tamanho de lote
+
+    Args:
+        classifier: Backend a medir (padrão: MockClassifier)
+
+    Returns:
+        Dict {tamanho do lote: imagens/s}
+    """
+    classifier = classifier or MockClassifier()
+    images = np.stack([load_image(path) for path in image_paths])
+    results = {}
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(images), batch_size):
+            classifier.predict_batch(images[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = round(len(images) / elapsed, 1)
+
+    return results
+
+
+def bench_cnn(image_paths, batch_sizes, weights=None):
+    """
+    Vazão do backend cnn (NumPy im2col/GEMM) por tamanho de lote
+
+    Args:
+        weights: Pesos .npz (padrão: pesos aleatórios de init_weights; a
+            vazão não depende dos valores)
+
+    Returns:
+        Dict {tamanho do lote: imagens/s}
+    """
+    from cnn import NumpyCNN, init_weights
+
+    if weights is not None:
+        return bench_batch_sizes(image_paths, batch_sizes, NumpyCNN(weights))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'weights.npz')
+        np.savez(path, **init_weights())
+        return bench_batch_sizes(image_paths, batch_sizes, NumpyCNN(path))
+
+
+def bench_cascade(image_paths):
+    """
+    Cascata (--cascade) contra o pipeline completo, sobre as mesmas imagens já decodificadas
+
+    Returns:
+        Dict com taxa de saída antecipada, concordância com o pipeline
+        completo (classe, confiança, pré-processamento e iterações iguais)
+        e resumo de summarize() por imagem de cada modo
+    """
+    items = [(path, load_image(path, dtype=np.uint8)) for path in image_paths]
+    modes = {
+        'full': GalaxyClassificationOrchestrator(verbose=False, instrument=False),
+        'cascade': GalaxyClassificationOrchestrator(verbose=False, instrument=False, cascade=True)
+    }
+
+    results, timings = {}, {}
+    for mode, orchestrator in modes.items():
+        results[mode] = []
+        timings[mode] = summarize(time_each(
+            lambda item: results[mode].append(orchestrator.classify_galaxy(*item)), items
+        ))
+
+    fields = ('classification', 'confidence', 'preprocessed', 'iterations')
+    pairs = list(zip(results['full'], results['cascade']))
+    agree = [all(full[field] == cascade[field] for field in fields) for full, cascade in pairs]
+    exits = [cascade.get('early_exit', False) for _, cascade in pairs]
+    n_exits = sum(exits)
+
+    return {
+        'early_exit_rate': round(n_exits / len(items), 4),
+        'agreement': round(sum(agree) / len(items), 4),
+        'full': timings['full'],
+        'cascade': timings['cascade'],
+        'speedup_p50': round(timings['full']['p50_us'] / timings['cascade']['p50_us'], 2)
+    }
+
+
+def bench_workers(image_paths, worker_counts):
+    """
+    Vazão do modo --dir (pool de processos) por número de workers
+
+    Returns:
+        Dict {workers: {'images_per_s', 'speedup'}}
+    """
+    from main import classify_paths
+
+    results = {}
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        for _ in classify_paths(image_paths, workers):
+            pass
+        rate = len(image_paths) / (time.perf_counter() - start)
+
+        baseline = baseline or rate
+        results[str(workers)] = {
+            'images_per_s': round(rate, 1),
+            'speedup': round(rate / baseline, 2)
+        }
+
+    return results
+
+
+def parse_importtime(stderr):
+    """
+    Lê a saída de `python -X importtime`
+
+    Returns:
+        Dict {módulo de primeiro nível: tempo cumulativo em ms}
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # Só imports de primeiro nível (sem indentação extra)
+            modules[name.strip()] = int(cumulative) / 1000.0
+    return modules
+
+
+def bench_startup(image_path, repeats=5):
+    """
+    Tempo de inicialização do CLI em processos novos
+
+    Para cada comando mede o menor tempo de parede em `repeats` execuções
+    e, em uma execução extra com -X importtime, o tempo total de import e
+    os módulos mais caros.
+
+    Returns:
+        Dict {comando: {'wall_ms', 'import_ms', 'top_imports', 'heavy_imports'}}
+    """
+    commands = {
+        'help': ['--help'],
+        'image': ['--image', image_path, '--quiet', '--no-timings']
+    }
+    main_path = os.path.join(ROOT, 'main.py')
+
+    results = {}
+    for name, arguments in commands.items():
+        walls = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, main_path] + arguments, cwd=ROOT,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            walls.append(time.perf_counter() - start)
+
+        traced = subprocess.run([sys.executable, '-X', 'importtime', main_path] + arguments, cwd=ROOT,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        modules = parse_importtime(traced.stderr)
+        top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:5]
+
+        results[name] = {
+            'wall_ms': round(min(walls) * 1000, 1),
+            'import_ms': round(sum(modules.values()), 1),
+            'top_imports': {module: round(ms, 1) for module, ms in top},
+            'heavy_imports': [module for module in HEAVY_MODULES if module in modules]
+        }
+
+    return results
+
+
+def check_startup(startup, budgets):
+    """
+    Confere o tempo de inicialização contra o orçamento
+
+    Args:
+        startup: Resultado de bench_startup()
+        budgets: Dict {comando: ms máximos de parede}
+
+    Returns:
+        Lista de mensagens de violação (vazia = dentro do orçamento)
+    """
+    violations = []
+    for name, budget in budgets.items():
+        wall = startup[name]['wall_ms']
+        if wall > budget:
+            violations.append(f"{name}: {wall:.1f} ms > orçamento de {budget:.1f} ms")
+
+    if startup['help']['heavy_imports']:
+        violations.append(f"help: importa {', '.join(startup['help']['heavy_imports'])}")
+
+    return violations
+
+
+def git_commit():
+    """Commit atual (None fora de um repositório git)"""
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(count=200, dark_fraction=0.3, batch_sizes=(1, 16, 64, 256), worker_counts=None,
+                  seed=0, corpus_dir=None, startup_repeats=5, cnn_weights=None):
+    """
+    Executa o benchmark completo
+
+    Args:
+        count: Tamanho do corpus sintético
+        dark_fraction: Fração de imagens escuras (exercitam o pré-processamento)
+        batch_sizes: Tamanhos de lote para predict_batch
+        worker_counts: Números de workers do pool (padrão: 1, 2, 4... até os núcleos)
+        seed: Semente do corpus
+        corpus_dir: Diretório do corpus (reaproveitado se já existir; padrão: temporário)
+        startup_repeats: Execuções por comando na medição de inicialização (0 = não medir)
+        cnn_weights: Pesos .npz do backend cnn (padrão: aleatórios)
+
+    Returns:
+        Dict serializável em JSON com metadados e resultados
+    """
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, cpus} | {2 ** k for k in range(1, 6) if 2 ** k < cpus})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = corpus_dir or tmp_dir
+        image_paths = sorted(glob.glob(os.path.join(directory, '*.png')))
+        if len(image_paths) != count:
+            generate_dataset(directory, count, seed=seed, dark_fraction=dark_fraction,
+                             workers=min(4, os.cpu_count() or 1))
+            image_paths = sorted(glob.glob(os.path.join(directory, '*.png')))
+
+        return {
+            'format': BENCH_FORMAT,
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'pillow': PIL.__version__,
+                'platform': platform.platform(),
+                'cpus': os.cpu_count()
+            },
+            'corpus': {'count': count, 'dark_fraction': dark_fraction, 'seed': seed},
+            'stages': bench_stages(image_paths),
+            'batch_throughput': bench_batch_sizes(image_paths, batch_sizes),
+            'cnn_batch_throughput': bench_cnn(image_paths, batch_sizes, cnn_weights),
+            'cascade': bench_cascade(image_paths),
+            'worker_scaling': bench_workers(image_paths, worker_counts),
+            'startup': bench_startup(image_paths[0], startup_repeats) if startup_repeats else None
+        }
+
+
+def compare(current, baseline, tolerance=0.10):
+    """
+    Compara dois resultados de benchmark
+
+    Args:
+        current: Resultado atual (run_benchmark)
+        baseline: Resultado de referência (ex.: JSON de outro commit)
+        tolerance: Piora relativa aceita antes de acusar regressão
+
+    Returns:
+        Lista de (métrica, valor de referência, valor atual, variação relativa)
+        das métricas que pioraram além da tolerância
+    """
+    regressions = []
+
+    # Latência: maior é pior (formatos diferentes medem caminhos diferentes com o mesmo nome)
+    same_format = baseline.get('format') == current.get('format')
+    for stage, summary in current['stages'].items() if same_format else ():
+        reference = baseline.get('stages', {}).get(stage)
+        if reference and reference['p50_us'] > 0:
+            change = summary['p50_us'] / reference['p50_us'] - 1
+            if change > tolerance:
+                regressions.append((f"stages.{stage}.p50_us", reference['p50_us'], summary['p50_us'], change))
+
+    # Inicialização: maior é pior
+    for command, summary in (current.get('startup') or {}).items():
+        reference = (baseline.get('startup') or {}).get(command)
+        if reference and reference['wall_ms'] > 0:
+            change = summary['wall_ms'] / reference['wall_ms'] - 1
+            if change > tolerance:
+                regressions.append((f"startup.{command}.wall_ms", reference['wall_ms'], summary['wall_ms'], change))
+
+    # Vazão: menor é pior
+    for section in ('batch_throughput', 'cnn_batch_throughput'):
+        for batch_size, rate in current.get(section, {}).items():
+            reference = baseline.get(section, {}).get(batch_size)
+            if reference:
+                change = 1 - rate / reference
+                if change > tolerance:
+                    regressions.append((f"{section}.{batch_size}", reference, rate, -change))
+
+    return regressions
+
+
+def print_report(report):
+    """Imprime resumo legível do benchmark"""
+    print("\n" + "="*60)
+    print(f"BENCHMARK ({report['corpus']['count']} imagens, "
+          f"{report['corpus']['dark_fraction']:.0%} escuras, commit {report['commit']})")
+    print("="*60)
+
+    for stage, summary in report['stages'].items():
+        print(f"   {stage:<30} p50={summary['p50_us']:>9.1f}us  p95={summary['p95_us']:>9.1f}us  "
+              f"{summary['throughput_per_s']:>9.1f}/s")
+
+    print("\n   predict_batch (imagens/s por lote):      mock        cnn")
+    cnn = report.get('cnn_batch_throughput', {})
+    for batch_size, rate in report['batch_throughput'].items():
+        print(f"      {batch_size:>5}: {rate:>30.1f} {cnn.get(batch_size, float('nan')):>10.1f}")
+
+    cascade = report.get('cascade')
+    if cascade:
+        print(f"\n   Cascata: {cascade['early_exit_rate']:.1%} saídas antecipadas, "
+              f"concordância {cascade['agreement']:.1%}, p50 {cascade['full']['p50_us']:.0f}us -> "
+              f"{cascade['cascade']['p50_us']:.0f}us (x{cascade['speedup_p50']})")
+
+    print("\n   Pool de processos (imagens/s):")
+    for workers, scaling in report['worker_scaling'].items():
+        print(f"      {workers:>3} workers: {scaling['images_per_s']:.1f} (x{scaling['speedup']})")
+
+    if report.get('startup'):
+        print("\n   Inicialização do CLI (processo novo):")
+        for command, startup in report['startup'].items():
+            top = ', '.join(f"{module} {ms:.0f}ms" for module, ms in startup['top_imports'].items())
+            print(f"      {command:<6} {startup['wall_ms']:>7.1f} ms (imports {startup['import_ms']:.1f} ms: {top})")
+
+
+def main(argv=None):
+    """Executa o benchmark pela linha de comando"""
+    parser = argparse.ArgumentParser(description='Benchmark do classificador de galáxias')
+    parser.add_argument('--count', type=int, default=200, help='Tamanho do corpus sintético')
+    parser.add_argument('--dark-fraction', type=float, default=0.3, help='Fração de imagens escuras')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do corpus')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64, 256],
+                        help='Tamanhos de lote para predict_batch')
+    parser.add_argument('--bench-workers', type=int, nargs='+', default=None,
+                        help='Números de workers a medir (padrão: potências de 2 até os núcleos)')
+    parser.add_argument('--corpus-dir', type=str, default=None,
+                        help='Diretório do corpus (reaproveitado entre execuções)')
+    parser.add_argument('--output', type=str, default='bench_results.json', help='Arquivo JSON de saída')
+    parser.add_argument('--startup-repeats', type=int, default=5,
+                        help='Execuções por comando na medição de inicialização (0 = não medir)')
+    parser.add_argument('--budget-help-ms', type=float, default=150.0,
+                        help='Orçamento de tempo para `main.py --help` (ms)')
+    parser.add_argument('--budget-image-ms', type=float, default=600.0,
+                        help='Orçamento de tempo para `main.py --image` de uma imagem (ms)')
+    parser.add_argument('--cnn-weights', type=str, default=None,
+                        help='Pesos .npz do backend cnn (padrão: aleatórios, mesma vazão)')
+    parser.add_argument('--compare', type=str, default=None, help='JSON de referência para detectar regressões')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Piora relativa aceita (padrão: 10%%)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.count, args.dark_fraction, args.batch_sizes, args.bench_workers,
+                           args.seed, args.corpus_dir, args.startup_repeats, args.cnn_weights)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    print(f"\n✓ Resultados salvos em {args.output}")
+
+    status = 0
+    if report['startup']:
+        violations = check_startup(report['startup'], {'help': args.budget_help_ms,
+                                                       'image': args.budget_image_ms})
+        if violations:
+            print("\n❌ Inicialização fora do orçamento:")
+            for violation in violations:
+                print(f"   {violation}")
+            status = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) em relação a {args.compare}:")
+            for metric, reference, value, change in regressions:
+                print(f"   {metric}: {reference} -> {value} ({change:+.1%})")
+            return 1
+        print(f"\n✓ Sem regressões em relação a {args.compare}")
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Cache persistente de resultados de classificação (endereçado por conteúdo)"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+# Incrementar quando a lógica do pipeline mudar: invalida todas as entradas antigas
+CACHE_VERSION = 1
+
+
+def _to_builtin(value):
+    """Converte escalares numpy para tipos nativos (serialização JSON)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+class ResultCache:
+    """
+    Cache em disco (SQLite) de resultados do classify_galaxy
+
+    A chave é o hash dos bytes da imagem combinado com a configuração do
+    pipeline, então qualquer mudança de configuração (ou de CACHE_VERSION)
+    gera chaves novas e as entradas antigas deixam de ser usadas, sendo
+    removidas pela política LRU quando o cache passa de max_entries.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, config TEXT, result TEXT, last_used REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    @staticmethod
+    def config_fingerprint(config):
+        """Hash estável da configuração relevante do pipeline"""
+        payload = json.dumps({'version': CACHE_VERSION, 'config': config}, sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def key_for(self, source, config):
+        """
+        Calcula a chave do cache para uma imagem
+
+        Args:
+            source: Caminho da imagem (hash dos bytes do arquivo) ou array
+                já carregado (hash dos pixels)
+            config: Dict com a configuração do pipeline
+
+        Returns:
+            (chave, fingerprint da configuração)
+        """
+        fingerprint = self.config_fingerprint(config)
+        digest = hashlib.blake2b(fingerprint.encode(), digest_size=20)
+
+        if isinstance(source, np.ndarray):
+            digest.update(str((source.dtype.str, source.shape)).encode())
+            digest.update(np.ascontiguousarray(source).data)
+            return digest.hexdigest(), fingerprint
+
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest(), fingerprint
+
+    def get(self, key):
+        """Retorna o resultado armazenado ou None (atualiza a ordem LRU)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+
+        return json.loads(row[0])
+
+    def put(self, key, fingerprint, result):
+        """Armazena um resultado e aplica a política de remoção LRU"""
+        payload = json.dumps(result, default=_to_builtin)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, config, result, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, fingerprint, payload, time.time())
+            )
+            self._count += cursor.rowcount
+
+            if self._count > self.max_entries:
+                self._evict()
+
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove as entradas menos usadas recentemente (deixa 10% de folga)"""
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+
+        self._conn.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._count -= excess
+
+    def invalidate(self, fingerprint=None):
+        """
+        Remove entradas do cache
+
+        Args:
+            fingerprint: Remove só as entradas de outras configurações
+                (None = limpa tudo)
+        """
+        with self._lock:
+            if fingerprint is None:
+                self._conn.execute("DELETE FROM results")
+            else:
+                self._conn.execute("DELETE FROM results WHERE config != ?", (fingerprint,))
+            self._conn.commit()
+            self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self):
+        """Retorna contadores de acerto/falha do cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'entries': self._count
+        }
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
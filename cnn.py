@@ -0,0 +1,293 @@
+"""CNN pequena em NumPy puro (im2col + GEMM), com a mesma interface do MockClassifier"""
+import argparse
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from model import MockClassifier
+
+
+def init_weights(channels=(8, 16, 32), kernel_size=3, classes=('spiral', 'elliptical'), seed=0):
+    """
+    Pesos iniciais (He) de uma CNN conv-ReLU-pool x len(channels) + média global + densa
+
+    Returns:
+        Dict de arrays no formato de NumpyCNN (conv{i}_w [C_out, C_in, k, k],
+        conv{i}_b, fc_w [C, classes], fc_b, classes)
+    """
+    rng = np.random.default_rng(seed)
+    weights = {'classes': np.array(classes)}
+
+    c_in = 1
+    for i, c_out in enumerate(channels):
+        fan_in = c_in * kernel_size * kernel_size
+        weights[f'conv{i}_w'] = rng.normal(0, np.sqrt(2 / fan_in),
+                                           (c_out, c_in, kernel_size, kernel_size)).astype(np.float32)
+        weights[f'conv{i}_b'] = np.zeros(c_out, dtype=np.float32)
+        c_in = c_out
+
+    weights['fc_w'] = np.zeros((c_in, len(classes)), dtype=np.float32)
+    weights['fc_b'] = np.zeros(len(classes), dtype=np.float32)
+    return weights
+
+
+class NumpyCNN(MockClassifier):
+    """
+    Classificador convolucional em NumPy puro, para CPUs sem framework de DL
+
+    Cada camada é uma convolução 'same' (im2col + uma GEMM float32 para o
+    lote inteiro), ReLU e max-pool 2x2. ReLU e o bias comutam com o máximo,
+    então o pool é aplicado direto na saída da GEMM e bias + ReLU rodam
+    sobre 4x menos valores, escrevendo no buffer de entrada da camada
+    seguinte. Todos os buffers (entrada com borda, colunas do im2col,
+    saída da GEMM) são alocados uma vez por thread e reaproveitados; lotes
+    maiores que max_batch_size são processados em fatias.
+
+    get_features continua devolvendo as features descritivas do
+    MockClassifier (usadas nas mensagens entre os agentes).
+
+    Args:
+        weights_path: Arquivo .npz (ver init_weights)
+        max_batch_size: Imagens por passada (tamanho dos buffers)
+    """
+
+    def __init__(self, weights_path, max_batch_size=32):
+        with np.load(weights_path) as data:
+            weights = {name: data[name] for name in data.files}
+        with open(weights_path, 'rb') as f:
+            self.weights_hash = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+        self.weights_path = weights_path
+        self.max_batch_size = max_batch_size
+        self.classes = [str(name) for name in weights.get('classes', ('spiral', 'elliptical'))]
+
+        # (pesos [C_in*k*k, C_out] na ordem das colunas do im2col, bias [C_out], k)
+        self.layers = []
+        i = 0
+        while f'conv{i}_w' in weights:
+            kernel = weights[f'conv{i}_w'].astype(np.float32)
+            c_out, _, k, _ = kernel.shape
+            self.layers.append((np.ascontiguousarray(kernel.reshape(c_out, -1).T),
+                                weights[f'conv{i}_b'].astype(np.float32), k))
+            i += 1
+
+        self.fc_w = weights['fc_w'].astype(np.float32)
+        self.fc_b = weights['fc_b'].astype(np.float32)
+        self._local = threading.local()  # Buffers de cada thread
+
+    def __getstate__(self):
+        # Buffers não vão para os workers (cada processo aloca os seus)
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def get_config(self):
+        return {'backend': 'cnn', 'weights': self.weights_hash}
+
+    def predict_from_stats(self, stats):
+        """A rede precisa dos pixels: nenhuma imagem sai antecipada da cascata"""
+        return None
+
+    def _workspace(self, height, width):
+        """Buffers de ativação desta thread para imagens height x width"""
+        workspace = getattr(self._local, 'workspace', None)
+        if workspace is not None and workspace['shape'] == (height, width):
+            return workspace
+
+        batch = self.max_batch_size
+        buffers = []
+        h, w, c = height, width, 1
+        for kernel, _, k in self.layers:
+            pad = k // 2
+            # Borda de zeros alocada uma vez; só o interior é reescrito a cada lote
+            padded = np.zeros((batch, h + 2 * pad, w + 2 * pad, c), dtype=np.float32)
+            columns = np.empty((batch * h * w, c * k * k), dtype=np.float32)
+            output = np.empty((batch * h * w, kernel.shape[1]), dtype=np.float32)
+            buffers.append((padded, columns, output))
+            h, w, c = h // 2, w // 2, kernel.shape[1]
+
+        workspace = {
+            'shape': (height, width),
+            'layers': buffers,
+            'pooled': np.empty((batch, h, w, c), dtype=np.float32)
+        }
+        self._local.workspace = workspace
+        return workspace
+
+    def embed(self, images):
+        """
+        Saída da última camada convolucional com média global
+
+        Args:
+            images: Array [N, H, W] (float em [0, 1] ou uint8)
+
+        Returns:
+            Array float32 [N, C]
+        """
+        images = np.asarray(images)
+        features = np.empty((len(images), self.fc_w.shape[0]), dtype=np.float32)
+        for start in range(0, len(images), self.max_batch_size):
+            chunk = images[start:start + self.max_batch_size]
+            features[start:start + len(chunk)] = self._forward(chunk)
+        return features
+
+    def _forward(self, images):
+        """Passada convolucional de até max_batch_size imagens"""
+        n, height, width = images.shape
+        workspace = self._workspace(height, width)
+        buffers = workspace['layers']
+
+        pad = self.layers[0][2] // 2
+        np.multiply(images, np.float32(self._pixel_scale(images)),
+                    out=buffers[0][0][:n, pad:pad + height, pad:pad + width, 0], casting='unsafe')
+
+        h, w = height, width
+        for index, (kernel, bias, k) in enumerate(self.layers):
+            padded, columns, output = buffers[index]
+            c_in = padded.shape[3]
+            rows = n * h * w
+
+            # im2col: colunas na ordem (C_in, ky, kx) dos pesos
+            windows = np.lib.stride_tricks.sliding_window_view(padded[:n], (k, k), axis=(1, 2))
+            np.copyto(columns[:rows].reshape(n, h, w, c_in, k, k), windows)
+            np.matmul(columns[:rows], kernel, out=output[:rows])
+            conv = output[:rows].reshape(n, h, w, kernel.shape[1])
+
+            # Pool 2x2 direto da GEMM para a entrada da próxima camada; depois bias + ReLU
+            h, w = h // 2, w // 2
+            if index + 1 < len(self.layers):
+                next_pad = self.layers[index + 1][2] // 2
+                target = buffers[index + 1][0][:n, next_pad:next_pad + h, next_pad:next_pad + w]
+            else:
+                target = workspace['pooled'][:n]
+
+            np.maximum(conv[:, 0:2 * h:2, 0:2 * w:2], conv[:, 0:2 * h:2, 1:2 * w:2], out=target)
+            np.maximum(target, conv[:, 1:2 * h:2, 0:2 * w:2], out=target)
+            np.maximum(target, conv[:, 1:2 * h:2, 1:2 * w:2], out=target)
+            target += bias
+            np.maximum(target, 0, out=target)
+
+        return workspace['pooled'][:n].mean(axis=(1, 2))
+
+    def predict_proba(self, images):
+        """Probabilidades [N, classes] (softmax da camada densa)"""
+        logits = self.embed(images) @ self.fc_w + self.fc_b
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+    def predict(self, image_array, stats=None):
+        """
+        Prediz a classe de uma imagem
+
+        Args:
+            image_array: Array numpy de imagem [H, W] (float em [0, 1] ou uint8)
+            stats: Ignorado (mantido pela interface do MockClassifier)
+
+        Returns:
+            (classe, confiança)
+        """
+        probabilities = self.predict_proba(np.asarray(image_array)[None])[0]
+        class_idx = int(probabilities.argmax())
+        return self.classes[class_idx], np.round(np.float64(probabilities[class_idx]), 2)
+
+    def predict_batch(self, images):
+        """
+        Prediz classes de um lote de imagens
+
+        Args:
+            images: Array numpy empilhado [N, H, W] (float em [0, 1] ou uint8)
+
+        Returns:
+            (classes [N], confianças [N], dict de features com arrays [N])
+        """
+        probabilities = self.predict_proba(images)
+        class_idx = probabilities.argmax(axis=1)
+        confidences = np.round(probabilities.max(axis=1).astype(np.float64), 2)
+
+        features = self._feature_dict(*self.batch_features(images))
+        return np.array(self.classes)[class_idx], confidences, features
+
+
+def fit_head(weights, images, labels, epochs=500, learning_rate=0.5, l2=1e-3):
+    """
+    Ajusta a camada densa (regressão logística) sobre as features das convoluções
+
+    As convoluções ficam fixas; as features são padronizadas durante o
+    ajuste e a padronização é incorporada a fc_w/fc_b.
+
+    Args:
+        weights: Dict de init_weights (alterado no lugar)
+        images: Array [N, H, W] de imagens de treino
+        labels: Índices das classes [N]
+
+    Returns:
+        Acurácia de treino
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'weights.npz')
+        np.savez(path, **weights)
+        features = NumpyCNN(path).embed(images).astype(np.float64)
+
+    mean = features.mean(axis=0)
+    std = features.std(axis=0) + 1e-6
+    x = (features - mean) / std
+    targets = np.eye(weights['fc_w'].shape[1])[labels]
+
+    w = np.zeros((x.shape[1], targets.shape[1]))
+    b = np.zeros(targets.shape[1])
+    for _ in range(epochs):
+        logits = x @ w + b
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        error = (probabilities - targets) / len(x)
+        w -= learning_rate * (x.T @ error + l2 * w)
+        b -= learning_rate * error.sum(axis=0)
+
+    weights['fc_w'] = (w / std[:, None]).astype(np.float32)
+    weights['fc_b'] = (b - (mean / std) @ w).astype(np.float32)
+    return float(((x @ w + b).argmax(axis=1) == labels).mean())
+
+
+def main():
+    """Cria um arquivo de pesos a partir de um diretório de imagens rotuladas pelo nome"""
+    from shards import label_from_name
+    from utils import load_images
+
+    parser = argparse.ArgumentParser(description='Gera pesos .npz para o backend cnn')
+    parser.add_argument('directory', type=str, help='Imagens de treino (rótulo pelo prefixo: spiral_00.png)')
+    parser.add_argument('output', type=str, help='Arquivo .npz de saída')
+    parser.add_argument('--glob', type=str, default='*.png', help='Padrão das imagens')
+    parser.add_argument('--channels', type=int, nargs='+', default=[8, 16, 32], help='Canais de cada camada')
+    parser.add_argument('--seed', type=int, default=0, help='Semente dos filtros convolucionais')
+    args = parser.parse_args()
+
+    image_paths = sorted(glob.glob(os.path.join(args.directory, args.glob)))
+    names = [label_from_name(path) for path in image_paths]
+    classes = ('spiral', 'elliptical')
+    known = [i for i, name in enumerate(names) if name in classes]
+    if not known:
+        parser.error(f"Nenhuma imagem rotulada ({', '.join(classes)}) em {args.directory}")
+
+    images, _ = load_images([image_paths[i] for i in known])
+    labels = np.array([classes.index(names[i]) for i in known])
+
+    weights = init_weights(tuple(args.channels), classes=classes, seed=args.seed)
+    accuracy = fit_head(weights, images, labels)
+    np.savez(args.output, **weights)
+    print(f"✓ Pesos salvos em {args.output} ({len(known)} imagens, acurácia de treino {accuracy:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Índice de hashes perceptuais para reaproveitar resultados de quase-duplicatas"""
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from cache import ResultCache, _to_builtin
+
+
+def dhash(image, hash_size=8):
+    """
+    Hash perceptual por diferença (dHash) de uma imagem em tons de cinza
+
+    A imagem é reduzida por média de blocos a hash_size x (hash_size + 1)
+    e cada bit diz se um bloco é mais claro que o vizinho da direita:
+    ruído, recortes deslocados de poucos pixels e mudanças globais de
+    brilho alteram poucos bits.
+
+    Args:
+        image: Array 2D (uint8 ou float)
+        hash_size: Lado da grade de comparação (64 bits com o padrão)
+
+    Returns:
+        Hash como int não negativo de hash_size**2 bits
+    """
+    height, width = image.shape
+    rows = np.linspace(0, height, hash_size + 1).astype(np.intp)[:-1]
+    cols = np.linspace(0, width, hash_size + 2).astype(np.intp)[:-1]
+
+    # Médias por bloco (blocos podem diferir em um pixel quando o lado não é múltiplo da grade)
+    blocks = np.add.reduceat(np.add.reduceat(image, rows, axis=0, dtype=np.float64), cols, axis=1)
+    blocks /= np.outer(np.diff(np.append(rows, height)), np.diff(np.append(cols, width)))
+
+    bits = (blocks[:, 1:] > blocks[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class MultiIndexHash:
+    """
+    Busca por distância de Hamming com índice multi-hash
+
+    Os bits do hash são divididos em max_distance + 1 pedaços, cada um
+    indexado em um dict. Dois hashes a até max_distance bits de distância
+    têm pelo menos um pedaço idêntico (princípio da casa dos pombos), então
+    uma busca só compara os hashes que coincidem em algum pedaço com a
+    consulta: poucas consultas a dict em vez de percorrer o índice.
+
+    Args:
+        max_distance: Raio máximo das buscas (em bits)
+        bits: Tamanho dos hashes
+    """
+
+    def __init__(self, max_distance, bits=64):
+        self.max_distance = max_distance
+        chunks = min(max_distance + 1, bits)
+        bounds = np.linspace(0, bits, chunks + 1).astype(int)
+        # (deslocamento, máscara) de cada pedaço
+        self._chunks = [(int(start), (1 << int(stop - start)) - 1) for start, stop in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._chunks]
+        self._values = {}  # hash -> valor
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, item, value):
+        """Insere um hash (um hash repetido só atualiza o valor)"""
+        if item not in self._values:
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                table.setdefault((item >> shift) & mask, []).append(item)
+        self._values[item] = value
+
+    def nearest(self, item):
+        """
+        Hash mais próximo a até max_distance bits
+
+        Returns:
+            (distância, hash, valor) ou None
+        """
+        value = self._values.get(item)
+        if value is not None:
+            return 0, item, value
+
+        best = None
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for candidate in table.get((item >> shift) & mask, ()):
+                distance = (candidate ^ item).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate, self._values[candidate])
+        return best
+
+
+class DedupIndex:
+    """
+    Índice persistente (SQLite + MultiIndexHash em memória) de imagens já
+    classificadas, pelo dHash dos pixels
+
+    Uma imagem a até max_distance bits de uma já classificada (com a mesma
+    configuração do pipeline) reaproveita o resultado dela. Hashes gravados
+    por outros processos (ex.: workers do --dir) entram no índice na
+    consulta seguinte.
+    """
+
+    def __init__(self, path, config, max_distance=4):
+        self.path = path
+        self.max_distance = max_distance
+        self.fingerprint = ResultCache.config_fingerprint(config)
+        self.hits = 0
+        self.misses = 0
+        self._index = MultiIndexHash(max_distance)
+        self._last_rowid = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Hash em hexadecimal: inteiros do SQLite têm sinal e só 64 bits
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "hash TEXT, config TEXT, image_path TEXT, result TEXT, updated REAL, "
+            "PRIMARY KEY (hash, config))"
+        )
+        self._conn.commit()
+        self._refresh()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _refresh(self):
+        """Carrega no índice os hashes gravados desde a última leitura (com o lock adquirido)"""
+        rows = self._conn.execute(
+            "SELECT rowid, hash FROM hashes WHERE rowid > ? AND config = ?",
+            (self._last_rowid, self.fingerprint)
+        ).fetchall()
+        for rowid, digest in rows:
+            self._index.add(int(digest, 16), rowid)
+            self._last_rowid = max(self._last_rowid, rowid)
+
+    def lookup(self, image_hash):
+        """
+        Procura uma imagem já classificada a até max_distance bits
+
+        Returns:
+            Dict com 'result', 'image_path' e 'distance' da imagem
+            encontrada, ou None
+        """
+        with self._lock:
+            self._refresh()
+            match = self._index.nearest(image_hash)
+            if match is None:
+                self.misses += 1
+                return None
+
+            distance, _, rowid = match
+            image_path, payload = self._conn.execute(
+                "SELECT image_path, result FROM hashes WHERE rowid = ?", (rowid,)
+            ).fetchone()
+            self.hits += 1
+
+        return {'result': json.loads(payload), 'image_path': image_path, 'distance': distance}
+
+    def add(self, image_hash, image_path, result):
+        """
+        Registra o resultado de uma imagem classificada
+
+        O primeiro resultado de cada hash é mantido: outros processos podem
+        ter o rowid dele no índice.
+        """
+        payload = json.dumps(result, default=_to_builtin)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO hashes (hash, config, image_path, result, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (format(image_hash, 'x'), self.fingerprint, image_path, payload, time.time())
+            )
+            self._conn.commit()
+            if cursor.rowcount:
+                self._index.add(image_hash, cursor.lastrowid)
+
+    def stats(self):
+        """Contadores de quase-duplicatas encontradas"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'entries': len(self._index),
+            'max_distance': self.max_distance
+        }
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,421 @@
+"""Armazenamento colunar de features por imagem: re-avaliar limiares sem decodificar de novo"""
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from model import MockClassifier
+from utils import (
+    ImageStats, UINT8_LEVELS, build_preprocess_lut, load_images,
+    MIN_BRIGHTNESS, MAX_BRIGHTNESS, MIN_CONTRAST
+)
+
+
+STORE_FORMAT = 1
+
+# Imagem original + 3 pré-processamentos encadeados: cobre o pré-processamento
+# inicial e os reprocessamentos de até 3 iterações
+STAGES = 4
+
+# Estatísticas em [0, 1] de cada etapa (mean_0 = imagem original, mean_1 = após
+# um pré-processamento, ...); float64 para decisões idênticas às do pipeline
+COLUMNS = tuple(f'{name}_{stage}' for stage in range(STAGES) for name in ('mean', 'var', 'max'))
+
+# Bits de quality_flags (problemas apontados por analyze_image_quality)
+QUALITY_DARK = 1
+QUALITY_BRIGHT = 2
+QUALITY_LOW_CONTRAST = 4
+
+
+def image_features(codes, enhance_contrast=True, adjust_brightness=True):
+    """
+    Estatísticas de todas as etapas de pré-processamento de uma imagem uint8
+
+    Args:
+        codes: Imagem uint8 [H, W]
+        enhance_contrast, adjust_brightness: Configuração do pré-processamento
+
+    Returns:
+        Dict {coluna: valor} com as colunas de COLUMNS
+    """
+    return histogram_features(np.bincount(codes.ravel(), minlength=256), enhance_contrast, adjust_brightness)
+
+
+def histogram_features(histogram, enhance_contrast=True, adjust_brightness=True):
+    """
+    Estatísticas de todas as etapas a partir do histograma dos códigos uint8
+
+    Usa o mesmo caminho do Agente A (histograma dos códigos + LUTs
+    compostas): cada etapa custa O(256), sem tocar nos pixels de novo.
+    O orchestrator reaproveita aqui o histograma da análise de qualidade.
+
+    Args:
+        histogram: Contagem de cada código 0-255 da imagem original
+        enhance_contrast, adjust_brightness: Configuração do pré-processamento
+
+    Returns:
+        Dict {coluna: valor} com as colunas de COLUMNS
+    """
+    levels = UINT8_LEVELS
+    row = {}
+
+    for stage in range(STAGES):
+        if stage:
+            levels = build_preprocess_lut(histogram, levels, enhance_contrast, adjust_brightness)
+        stats = ImageStats.from_histogram(histogram, levels)
+        row[f'mean_{stage}'] = stats.mean
+        row[f'var_{stage}'] = stats.var
+        row[f'max_{stage}'] = stats.max
+
+    return row
+
+
+def _truncate_npy(path, dtype, count, offset):
+    """Reescreve o cabeçalho .npy 1D com count linhas e corta o excesso do arquivo"""
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False,
+              'shape': (count,)}
+    with open(path, 'r+b') as f:
+        np.lib.format.write_array_header_1_0(f, header)
+        if f.tell() != offset:
+            raise RuntimeError(f"Cabeçalho .npy mudou de tamanho ao truncar {path}")
+        f.truncate(offset + count * np.dtype(dtype).itemsize)
+
+
+class FeatureStoreWriter:
+    """
+    Grava as features de cada imagem em colunas .npy pré-alocadas (memmap)
+
+    O diretório do store tem um .npy por coluna, paths.txt (um caminho por
+    linha, na ordem das linhas) e index.json. Como no ShardWriter, se
+    menos de `capacity` linhas forem gravadas os arquivos são truncados no
+    close().
+
+    Args:
+        path: Diretório do store
+        capacity: Máximo de linhas
+        config: Configuração do pipeline que gerou as features (get_config)
+    """
+
+    def __init__(self, path, capacity, config=None):
+        self.path = path
+        self.config = config or {}
+        self.count = 0
+        self.paths = []
+
+        os.makedirs(path, exist_ok=True)
+        self.columns = {
+            name: np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode='w+',
+                                            dtype=np.float64, shape=(max(capacity, 1),))
+            for name in COLUMNS
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def add(self, image_path, row):
+        """Grava a linha de uma imagem (dict de image_features)"""
+        if self.count >= len(self.columns[COLUMNS[0]]):
+            raise ValueError(f"Store cheio: capacidade {len(self.columns[COLUMNS[0]])}")
+        for name, column in self.columns.items():
+            column[self.count] = row[name]
+        self.paths.append(image_path)
+        self.count += 1
+
+    def close(self):
+        """Grava as colunas, ajusta o tamanho dos arquivos e escreve o índice"""
+        if self.columns is None:
+            return
+
+        for name, column in self.columns.items():
+            column.flush()
+            capacity, offset = len(column), column.offset
+            if self.count < capacity:
+                _truncate_npy(os.path.join(self.path, name + '.npy'), np.float64, self.count, offset)
+        self.columns = None
+
+        with open(os.path.join(self.path, 'paths.txt'), 'w') as f:
+            f.writelines(path + '\n' for path in self.paths)
+
+        index = {'format': STORE_FORMAT, 'count': self.count, 'stages': STAGES,
+                 'columns': list(COLUMNS), 'config': self.config}
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump(index, f)
+
+
+class FeatureStore:
+    """
+    Leitura do store: colunas memory-mapped e índice caminho -> linha
+
+    rescore() refaz as decisões do pipeline (qualidade, pré-processamento,
+    classificação do MockClassifier e reprocessamentos) para novos limiares
+    em uma passada vetorizada por bloco de linhas, sem abrir nenhuma imagem.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            self.index = json.load(f)
+
+        self.columns = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+                        for name in self.index['columns']}
+        with open(os.path.join(path, 'paths.txt')) as f:
+            self.paths = f.read().splitlines()
+        self._rows = None
+
+        if len(self.paths) != self.index['count']:
+            raise ValueError(f"Índice inconsistente com os dados: {path}")
+
+    def config_warnings(self):
+        """
+        Diferenças entre a configuração gravada no índice e o que rescore() reproduz
+
+        Returns:
+            Lista de avisos (vazia se o rescore refizer o pipeline exatamente)
+        """
+        config = self.index.get('config') or {}
+        warnings = []
+        dtype = config.get('preprocessing', {}).get('dtype', 'float64')
+        if dtype != 'float64':
+            warnings.append(f"store gravado com dtype {dtype}: o rescore calcula em float64 "
+                            "(confianças no limiar podem mudar)")
+        return warnings
+
+    def __len__(self):
+        return len(self.paths)
+
+    def row(self, image_path):
+        """Número da linha de uma imagem (KeyError se não estiver no store)"""
+        if self._rows is None:
+            self._rows = {path: i for i, path in enumerate(self.paths)}
+        return self._rows[image_path]
+
+    def get(self, image_path):
+        """Features gravadas para uma imagem"""
+        i = self.row(image_path)
+        return {name: float(column[i]) for name, column in self.columns.items()}
+
+    def rescore(self, confidence_threshold=0.75, variance_cutoff=0.015, dim_brightness=0.3,
+                min_brightness=MIN_BRIGHTNESS, max_brightness=MAX_BRIGHTNESS, min_contrast=MIN_CONTRAST,
+                max_iterations=3, chunk_size=1 << 20):
+        """
+        Refaz classificações e decisões de reprocessamento para novos limiares
+
+        Os valores padrão reproduzem o pipeline atual com o backend mock.
+        Stores gravados com outro backend são recusados: as features não
+        bastam para refazer a classificação (ver também config_warnings).
+
+        Args:
+            confidence_threshold: Limiar de confiança do Agente B
+            variance_cutoff, dim_brightness: Limiares do MockClassifier
+            min_brightness, max_brightness, min_contrast: Limiares de analyze_image_quality
+            max_iterations: Máximo de classificações por imagem (até STAGES - 1)
+            chunk_size: Linhas por passada vetorizada
+
+        Returns:
+            Dict de arrays [N]: 'class_idx' (índice em classes), 'confidence',
+            'preprocessed', 'iterations' e 'quality_flags'
+        """
+        if not 1 <= max_iterations <= STAGES - 1:
+            raise ValueError(f"max_iterations deve estar entre 1 e {STAGES - 1}")
+        backend = (self.index.get('config') or {}).get('classifier', {}).get('backend', 'mock')
+        if backend != 'mock':
+            raise ValueError(f"Store gravado com o backend '{backend}': rescore só reproduz o backend mock")
+
+        classifier = MockClassifier(variance_cutoff, dim_brightness)
+        n = len(self)
+        scores = {
+            'class_idx': np.empty(n, dtype=np.uint8),
+            'confidence': np.empty(n, dtype=np.float64),
+            'preprocessed': np.empty(n, dtype=bool),
+            'iterations': np.empty(n, dtype=np.uint8),
+            'quality_flags': np.empty(n, dtype=np.uint8)
+        }
+
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            block = slice(start, stop)
+            means = np.stack([self.columns[f'mean_{k}'][block] for k in range(STAGES)], axis=1)
+            variances = np.stack([self.columns[f'var_{k}'][block] for k in range(STAGES)], axis=1)
+            rows = np.arange(stop - start)
+
+            # Qualidade da imagem original (mesma lógica de analyze_image_quality)
+            brightness, contrast = means[:, 0], np.sqrt(variances[:, 0])
+            dark = brightness < min_brightness
+            bright = ~dark & (brightness > max_brightness)
+            flags = (dark * QUALITY_DARK | bright * QUALITY_BRIGHT
+                     | (contrast < min_contrast) * QUALITY_LOW_CONTRAST).astype(np.uint8)
+            preprocessed = flags != 0
+
+            # Primeira classificação na etapa 0 ou 1; cada reprocessamento avança uma etapa
+            stage = preprocessed.astype(np.intp)
+            class_idx, confidence = classifier.score(variances[rows, stage], means[rows, stage])
+            iterations = np.ones(stop - start, dtype=np.uint8)
+
+            for _ in range(max_iterations - 1):
+                retry = confidence < confidence_threshold
+                if not retry.any():
+                    break
+                stage += retry
+                iterations += retry
+                new_class, new_confidence = classifier.score(variances[rows, stage], means[rows, stage])
+                class_idx = np.where(retry, new_class, class_idx)
+                confidence = np.where(retry, new_confidence, confidence)
+
+            scores['class_idx'][block] = class_idx
+            scores['confidence'][block] = confidence
+            scores['preprocessed'][block] = preprocessed
+            scores['iterations'][block] = iterations
+            scores['quality_flags'][block] = flags
+
+        return scores
+
+    @staticmethod
+    def summarize(scores, classes=('spiral', 'elliptical')):
+        """Contagens por classe e taxas de pré-processamento/reprocessamento"""
+        n = len(scores['class_idx'])
+        counts = np.bincount(scores['class_idx'], minlength=len(classes))
+        return {
+            'images': n,
+            'classes': {name: int(count) for name, count in zip(classes, counts)},
+            'preprocessed_rate': round(float(scores['preprocessed'].mean()), 4) if n else 0.0,
+            'reprocessed_rate': round(float((scores['iterations'] > 1).mean()), 4) if n else 0.0,
+            'mean_confidence': round(float(scores['confidence'].mean()), 4) if n else 0.0
+        }
+
+
+def build_store(image_paths, path, config=None, batch_size=256, workers=None):
+    """
+    Extrai as features de várias imagens para um store novo
+
+    Args:
+        image_paths: Imagens a incluir
+        path: Diretório do store
+        config: Configuração do pipeline (get_config), gravada no índice
+        batch_size: Imagens decodificadas por vez
+        workers: Threads de decodificação
+
+    Returns:
+        (linhas gravadas, dict {caminho: erro} das imagens ignoradas)
+    """
+    with FeatureStoreWriter(path, len(image_paths), config) as writer:
+        skipped = extract_features(writer, image_paths, batch_size, workers)
+        count = writer.count
+
+    return count, skipped
+
+
+def extract_features(writer, image_paths, batch_size=256, workers=None):
+    """
+    Decodifica imagens e grava suas features em um FeatureStoreWriter aberto
+
+    Args:
+        writer: FeatureStoreWriter (a configuração de pré-processamento vem de writer.config)
+        image_paths: Imagens a incluir
+        batch_size: Imagens decodificadas por vez
+        workers: Threads de decodificação
+
+    Returns:
+        Dict {caminho: erro} das imagens ignoradas
+    """
+    preprocessing = writer.config.get('preprocessing', {})
+    options = {'enhance_contrast': preprocessing.get('enhance_contrast', True),
+               'adjust_brightness': preprocessing.get('adjust_brightness', True)}
+    skipped = {}
+
+    buffer = np.empty((min(batch_size, max(len(image_paths), 1)), 128, 128), dtype=np.uint8)
+    for i in range(0, len(image_paths), batch_size):
+        batch = image_paths[i:i + batch_size]
+        # Mesmo resize de load_image (fast=False): features idênticas às do pipeline
+        images, errors = load_images(batch, workers=workers, fast=False, out=buffer[:len(batch)])
+        for j, image_path in enumerate(batch):
+            if j in errors:
+                skipped[image_path] = errors[j]
+                continue
+            writer.add(image_path, image_features(images[j], **options))
+
+    return skipped
+
+
+def main():
+    """Extrai um store de um diretório ou re-avalia um store com novos limiares"""
+    parser = argparse.ArgumentParser(description='Store colunar de features por imagem')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    extract = commands.add_parser('extract', help='Extrair features das imagens de um diretório')
+    extract.add_argument('directory', type=str, help='Diretório com as imagens')
+    extract.add_argument('store', type=str, help='Diretório do store')
+    extract.add_argument('--glob', type=str, default='*.png', help='Padrão das imagens')
+    extract.add_argument('--workers', type=int, default=None, help='Threads de decodificação')
+
+    rescore = commands.add_parser('rescore', help='Re-avaliar um store com novos limiares')
+    rescore.add_argument('store', type=str, help='Diretório do store')
+    rescore.add_argument('--confidence-threshold', type=float, default=0.75)
+    rescore.add_argument('--variance-cutoff', type=float, default=0.015)
+    rescore.add_argument('--dim-brightness', type=float, default=0.3)
+    rescore.add_argument('--min-brightness', type=float, default=MIN_BRIGHTNESS)
+    rescore.add_argument('--max-brightness', type=float, default=MAX_BRIGHTNESS)
+    rescore.add_argument('--min-contrast', type=float, default=MIN_CONTRAST)
+    rescore.add_argument('--max-iterations', type=int, default=3)
+    rescore.add_argument('--output', type=str, help='CSV com o resultado de cada imagem')
+    args = parser.parse_args()
+
+    if args.command == 'extract':
+        image_paths = sorted(glob.glob(os.path.join(args.directory, args.glob)))
+        count, skipped = build_store(image_paths, args.store, workers=args.workers)
+        for image_path, error in skipped.items():
+            print(f"⚠️  Ignorada: {image_path} ({error})")
+        print(f"✓ Store criado: {count} imagens em {args.store}")
+        return
+
+    import time
+
+    store = FeatureStore(args.store)
+    for warning in store.config_warnings():
+        print(f"⚠️  {warning}")
+    thresholds = {name: getattr(args, name) for name in (
+        'confidence_threshold', 'variance_cutoff', 'dim_brightness', 'min_brightness',
+        'max_brightness', 'min_contrast', 'max_iterations')}
+
+    started = time.perf_counter()
+    try:
+        scores = store.rescore(**thresholds)
+    except ValueError as exc:
+        print(f"❌ Erro: {exc}")
+        return
+    elapsed = time.perf_counter() - started
+    baseline = store.rescore()
+    changed = int(np.count_nonzero(scores['class_idx'] != baseline['class_idx']))
+
+    summary = store.summarize(scores)
+    print(f"\n📊 {summary['images']} imagens re-avaliadas em {elapsed * 1000:.1f} ms")
+    for name, count in summary['classes'].items():
+        print(f"   {name}: {count}")
+    print(f"   Pré-processadas: {summary['preprocessed_rate']:.1%}  "
+          f"Reprocessadas: {summary['reprocessed_rate']:.1%}  "
+          f"Confiança média: {summary['mean_confidence']:.3f}")
+    print(f"   Classificações diferentes dos limiares padrão: {changed}")
+
+    if args.output:
+        import csv
+
+        classes = MockClassifier().classes
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('image_path', 'classification', 'confidence', 'preprocessed', 'iterations',
+                             'quality_flags'))
+            writer.writerows(
+                (image_path, classes[class_idx], f"{confidence:.2f}", bool(preprocessed), iterations, flags)
+                for image_path, class_idx, confidence, preprocessed, iterations, flags in zip(
+                    store.paths, scores['class_idx'], scores['confidence'], scores['preprocessed'],
+                    scores['iterations'], scores['quality_flags'])
+            )
+        print(f"\n✓ Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
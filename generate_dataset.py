@@ -1,87 +1,244 @@
 """Script para gerar dataset sintético de galáxias"""
 import numpy as np
 from PIL import Image
+from functools import lru_cache
+from multiprocessing import Pool
+import argparse
 import os
 
-def generate_spiral_galaxy(size=128, seed=None):
-    """Gera imagem sintética de galáxia espiral"""
-    if seed is not None:
-        np.random.seed(seed)
+from shards import ShardWriter
 
-    img = np.zeros((size, size))
+
+GALAXY_TYPES = ('spiral', 'elliptical')
+
+
+def make_rng(seed, galaxy_type, index):
+    """
+    Gerador independente por imagem
+
+    A semente depende só de (seed, tipo, índice), então cada imagem é
+    determinística qualquer que seja a divisão do trabalho entre processos.
+    """
+    return np.random.default_rng([seed, GALAXY_TYPES.index(galaxy_type), index])
+
+
+@lru_cache(maxsize=8)
+def _spiral_template(size):
+    """Coordenadas dos braços e núcleo brilhante (iguais para todas as espirais)"""
     center = size // 2
 
     # Criar braços espirais
     theta = np.linspace(0, 4 * np.pi, 1000)
+    r = theta * 5
+    xs, ys = [], []
     for arm in range(2):
         offset = arm * np.pi
-        r = theta * 5
         x = center + (r * np.cos(theta + offset)).astype(int)
         y = center + (r * np.sin(theta + offset)).astype(int)
 
         valid = (x >= 0) & (x < size) & (y >= 0) & (y < size)
-        x, y = x[valid], y[valid]
-
-        for i in range(len(x)):
-            if 0 <= x[i] < size and 0 <= y[i] < size:
-                img[y[i], x[i]] = 200 + np.random.randint(-50, 50)
+        xs.append(x[valid])
+        ys.append(y[valid])
 
     # Adicionar núcleo brilhante
     y, x = np.ogrid[:size, :size]
     dist = np.sqrt((x - center)**2 + (y - center)**2)
-    img += 100 * np.exp(-dist**2 / 200)
+    core = 100 * np.exp(-dist**2 / 200)
+
+    return np.concatenate(ys), np.concatenate(xs), core
+
+
+@lru_cache(maxsize=8)
+def _elliptical_grid(size):
+    """Distâncias ao centro ao quadrado em x e y"""
+    center = size // 2
+    y, x = np.ogrid[:size, :size]
+    return (x - center)**2, (y - center)**2
+
+
+def generate_spiral_galaxy(size=128, seed=None, rng=None):
+    """Gera imagem sintética de galáxia espiral"""
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
+    arm_y, arm_x, core = _spiral_template(size)
+
+    img = np.zeros((size, size))
+    img[arm_y, arm_x] = 200 + rng.integers(-50, 50, size=len(arm_x))
+    img += core
 
     # Adicionar ruído
-    img += np.random.normal(0, 10, (size, size))
+    img += rng.normal(0, 10, (size, size))
 
     return np.clip(img, 0, 255).astype(np.uint8)
 
 
-def generate_elliptical_galaxy(size=128, seed=None):
+def generate_elliptical_galaxy(size=128, seed=None, rng=None):
     """Gera imagem sintética de galáxia elíptica"""
-    if seed is not None:
-        np.random.seed(seed)
+    if rng is None:
+        rng = np.random.default_rng(seed)
 
-    img = np.zeros((size, size))
-    center = size // 2
+    dx2, dy2 = _elliptical_grid(size)
 
     # Criar forma elíptica suave
-    y, x = np.ogrid[:size, :size]
-    ellipse_a = 30 + np.random.randint(-5, 5)
-    ellipse_b = 20 + np.random.randint(-5, 5)
+    ellipse_a = 30 + rng.integers(-5, 5)
+    ellipse_b = 20 + rng.integers(-5, 5)
 
-    dist_ellipse = ((x - center)**2 / ellipse_a**2 + (y - center)**2 / ellipse_b**2)
+    dist_ellipse = dx2 / ellipse_a**2 + dy2 / ellipse_b**2
     img = 200 * np.exp(-dist_ellipse * 2)
 
     # Adicionar gradiente suave
     img += 50 * np.exp(-dist_ellipse * 0.5)
 
     # Adicionar ruído
-    img += np.random.normal(0, 10, (size, size))
+    img += rng.normal(0, 10, (size, size))
 
     return np.clip(img, 0, 255).astype(np.uint8)
 
 
+GENERATORS = {
+    'spiral': generate_spiral_galaxy,
+    'elliptical': generate_elliptical_galaxy
+}
+
+
+def plan_item(position, count):
+    """
+    (tipo, índice) da imagem na posição dada: metade espirais, metade elípticas
+
+    Returns:
+        Tupla na ordem em que as imagens são gravadas
+    """
+    n_spiral = count - count // 2
+    if position < n_spiral:
+        return 'spiral', position
+    return 'elliptical', position - n_spiral
+
+
+def image_name(galaxy_type, index, count):
+    """Nome da imagem com índice preenchido (spiral_00, spiral_000123...)"""
+    digits = max(2, len(str(count)))
+    return f"{galaxy_type}_{index:0{digits}d}"
+
+
+# Fator de brilho das imagens "escuras" (ficam abaixo do limiar de qualidade de brilho)
+DARK_FACTOR = 0.35
+
+
+def is_dark(position, seed, dark_fraction):
+    """Sorteio determinístico (por posição) de quais imagens serão escuras"""
+    if dark_fraction <= 0:
+        return False
+    return np.random.default_rng([seed, len(GALAXY_TYPES), position]).random() < dark_fraction
+
+
+def generate_galaxy(galaxy_type, index, size=128, seed=0, dark=False):
+    """Gera a imagem `index` do tipo dado de forma determinística"""
+    img = GENERATORS[galaxy_type](size, rng=make_rng(seed, galaxy_type, index))
+    if dark:
+        img = (img * DARK_FACTOR).astype(np.uint8)
+    return img
+
+
+def _generate_chunk(task):
+    """Gera e grava as imagens [start, stop) do plano (executa nos workers)"""
+    start, stop, count, size, seed, output_format, output, dark_fraction = task
+    plan = [plan_item(position, count) + (is_dark(position, seed, dark_fraction),)
+            for position in range(start, stop)]
+
+    if output_format == 'shard':
+        # Cada worker escreve sua fatia direto no memmap compartilhado
+        images = np.load(output, mmap_mode='r+')
+        for offset, (galaxy_type, index, dark) in enumerate(plan):
+            images[start + offset] = generate_galaxy(galaxy_type, index, size, seed, dark)
+        images.flush()
+    else:
+        for galaxy_type, index, dark in plan:
+            img = Image.fromarray(generate_galaxy(galaxy_type, index, size, seed, dark), mode='L')
+            img.save(os.path.join(output, image_name(galaxy_type, index, count) + '.png'))
+
+    return stop - start
+
+
+def generate_dataset(output, count=20, size=128, seed=0, output_format='png', workers=1,
+                     dark_fraction=0.0):
+    """
+    Gera o dataset sintético, opcionalmente em vários processos
+
+    Args:
+        output: Diretório (png) ou caminho base do shard (shard)
+        count: Número total de imagens (metade espirais, metade elípticas)
+        size: Lado das imagens em pixels
+        seed: Semente base (mesma semente = mesmo dataset, com qualquer workers)
+        output_format: 'png' (um arquivo por galáxia) ou 'shard' (shards.py)
+        workers: Número de processos
+        dark_fraction: Fração (sorteada por posição) de imagens escurecidas
+            por DARK_FACTOR, que exercitam pré-processamento e reprocessamento
+
+    Returns:
+        Número de imagens geradas
+    """
+    writer = None
+    target = output
+
+    if output_format == 'shard':
+        writer = ShardWriter(output, count, size)
+        writer.reserve(count)
+        for position in range(count):
+            galaxy_type, index = plan_item(position, count)
+            writer.names.append(image_name(galaxy_type, index, count))
+            writer.labels.append(galaxy_type)
+        target = writer.npy_path
+    else:
+        os.makedirs(output, exist_ok=True)
+
+    # Lotes pequenos o bastante para balancear, grandes o bastante para amortizar o IPC
+    chunk = max(1, min(10000, count // (max(1, workers) * 8)))
+    tasks = [(start, min(start + chunk, count), count, size, seed, output_format, target, dark_fraction)
+             for start in range(0, count, chunk)]
+
+    try:
+        if workers <= 1:
+            for task in tasks:
+                _generate_chunk(task)
+        else:
+            with Pool(workers) as pool:
+                for _ in pool.imap_unordered(_generate_chunk, tasks):
+                    pass
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return count
+
+
 def main():
-    """Gera dataset de 20 imagens (10 spiral, 10 elliptical)"""
-    output_dir = "data/samples"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Gerar galáxias espirais
-    print("Gerando galáxias espirais...")
-    for i in range(10):
-        img_array = generate_spiral_galaxy(seed=i)
-        img = Image.fromarray(img_array, mode='L')
-        img.save(f"{output_dir}/spiral_{i:02d}.png")
-
-    # Gerar galáxias elípticas
-    print("Gerando galáxias elípticas...")
-    for i in range(10):
-        img_array = generate_elliptical_galaxy(seed=i+100)
-        img = Image.fromarray(img_array, mode='L')
-        img.save(f"{output_dir}/elliptical_{i:02d}.png")
-
-    print(f"✓ Dataset criado: 20 imagens em {output_dir}/")
+    """Gera dataset sintético (padrão: 20 imagens, 10 spiral e 10 elliptical)"""
+    parser = argparse.ArgumentParser(description='Gera dataset sintético de galáxias')
+    parser.add_argument('--count', type=int, default=20,
+                        help='Número total de imagens (metade spiral, metade elliptical)')
+    parser.add_argument('--size', type=int, default=128, help='Lado das imagens em pixels')
+    parser.add_argument('--seed', type=int, default=0, help='Semente base do dataset')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Número de processos (o resultado não depende deste valor)')
+    parser.add_argument('--dark-fraction', type=float, default=0.0,
+                        help='Fração de imagens escurecidas (exercita o pré-processamento)')
+    parser.add_argument('--format', choices=['png', 'shard'], default='png',
+                        help='png: um arquivo por galáxia; shard: memmap .npy + índice')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Diretório (png) ou caminho base do shard (padrão: data/generated ou data/shards/generated)')
+    args = parser.parse_args()
+
+    # data/samples guarda as imagens de referência versionadas, geradas com o gerador
+    # antigo: o padrão nunca as sobrescreve (mesmos nomes, pixels diferentes)
+    if args.output is None:
+        args.output = "data/shards/generated" if args.format == 'shard' else "data/generated"
+
+    print(f"Gerando {args.count} galáxias ({args.workers} processo(s))...")
+    count = generate_dataset(args.output, args.count, args.size, args.seed, args.format, args.workers,
+                             args.dark_fraction)
+
+    print(f"✓ Dataset criado: {count} imagens em {args.output}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,380 @@
+"""Fila de trabalho em SQLite para dividir uma classificação entre várias máquinas"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import ResultCache, _to_builtin
+
+
+# Estados de um job
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """
+    Fila de jobs (imagens ou faixas de um shard) em um arquivo SQLite
+
+    Não há serviço central: o coordenador registra os jobs e cada worker
+    (em qualquer máquina que enxergue o arquivo) pega lotes com um lease.
+    Cada lease vale lease_seconds e é renovado enquanto o worker trabalha;
+    jobs de um worker que morreu voltam a ser distribuídos quando o lease
+    vence. Resultados são gravados em uma transação por lote, e só valem
+    se o lease ainda for de quem grava.
+
+    O banco usa o journal padrão (rollback) em vez de WAL: o WAL precisa de
+    memória compartilhada entre os processos e não funciona em sistemas de
+    arquivos de rede. As transações de escrita usam BEGIN IMMEDIATE, então
+    dois workers nunca pegam o mesmo job.
+
+    Args:
+        path: Arquivo SQLite (em armazenamento compartilhado para várias máquinas)
+        max_attempts: Leases vencidos aceitos por job antes de marcá-lo como
+            falho (protege contra imagens que derrubam o worker)
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+
+        # isolation_level=None: transações explícitas (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, key TEXT UNIQUE, path TEXT, start INTEGER, stop INTEGER, "
+            "state TEXT, owner TEXT, lease_expires REAL, attempts INTEGER DEFAULT 0, "
+            "config TEXT, result TEXT, updated REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+
+    def _transaction(self):
+        """Transação de escrita (trava o banco para outros escritores até o commit)"""
+        return _Transaction(self._conn)
+
+    def add_paths(self, paths):
+        """
+        Registra imagens (caminhos já registrados são ignorados)
+
+        Returns:
+            Número de jobs novos
+        """
+        return self._add((path, path, None, None) for path in paths)
+
+    def add_shard(self, shard_path, range_size=1024):
+        """
+        Registra um shard empacotado (shards.py) em faixas de range_size imagens
+
+        Returns:
+            Número de jobs novos
+        """
+        from shards import _shard_files
+
+        _, index_path = _shard_files(shard_path)
+        with open(index_path) as f:
+            count = len(json.load(f)['names'])
+
+        shard_path = os.path.abspath(shard_path)
+        return self._add(
+            (f"{shard_path}[{start}:{min(start + range_size, count)}]", shard_path,
+             start, min(start + range_size, count))
+            for start in range(0, count, range_size)
+        )
+
+    def _add(self, jobs):
+        """Insere (chave, caminho, início, fim) em uma única transação"""
+        now = time.time()
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, path, start, stop, state, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((key, path, start, stop, PENDING, now) for key, path, start, stop in jobs)
+            )
+            return self._conn.total_changes - before
+
+    def claim(self, owner, limit, lease_seconds=300):
+        """
+        Pega até `limit` jobs pendentes ou com lease vencido
+
+        Args:
+            owner: Identificador único do worker (ex.: host:pid)
+            limit: Máximo de jobs
+            lease_seconds: Validade do lease
+
+        Returns:
+            Lista de (id, caminho, início, fim); início/fim são None para imagens
+        """
+        now = time.time()
+        with self._transaction():
+            # Lease vencido pela max_attempts-ésima vez: o job derrubou todos os workers que o pegaram
+            expired = self._conn.execute(
+                "SELECT id, key FROM jobs WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (LEASED, now, self.max_attempts)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, result = ?, updated = ? WHERE id = ?",
+                ((FAILED, json.dumps({'success': False, 'image_path': key,
+                                      'error': f"Lease vencido {self.max_attempts} vezes"}), now, job_id)
+                 for job_id, key in expired)
+            )
+
+            jobs = self._conn.execute(
+                "SELECT id, path, start, stop FROM jobs WHERE state = ? ORDER BY id LIMIT ?",
+                (PENDING, limit)
+            ).fetchall()
+            if len(jobs) < limit:
+                jobs += self._conn.execute(
+                    "SELECT id, path, start, stop FROM jobs WHERE state = ? AND lease_expires < ? "
+                    "ORDER BY id LIMIT ?",
+                    (LEASED, now, limit - len(jobs))
+                ).fetchall()
+
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated = ? WHERE id = ?",
+                ((LEASED, owner, now + lease_seconds, now, job[0]) for job in jobs)
+            )
+
+        return jobs
+
+    def renew(self, owner, job_ids, lease_seconds=300):
+        """
+        Estende os leases ainda válidos do worker
+
+        Returns:
+            Número de leases renovados (os perdidos para outro worker ficam de fora)
+        """
+        now = time.time()
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND owner = ? AND state = ?",
+                ((now + lease_seconds, now, job_id, owner, LEASED) for job_id in job_ids)
+            )
+            return self._conn.total_changes - before
+
+    def complete(self, owner, outcomes, config=None):
+        """
+        Grava os resultados de um lote em uma única transação
+
+        Args:
+            owner: Worker que pegou os jobs
+            outcomes: Lista de (id, resultados); imagens têm um resultado,
+                faixas de shard um por imagem. O job falha se algum falhar.
+            config: Configuração do pipeline do worker (get_config)
+
+        Returns:
+            Ids dos jobs gravados (os que perderam o lease são descartados:
+            outro worker já está refazendo)
+        """
+        now = time.time()
+        fingerprint = ResultCache.config_fingerprint(config) if config is not None else None
+        rows = []
+        for job_id, results in outcomes:
+            state = DONE if all(result.get('success', False) for result in results) else FAILED
+            payload = json.dumps(results, default=_to_builtin)
+            rows.append((state, payload, fingerprint, now, job_id, owner, LEASED))
+
+        written = []
+        with self._transaction():
+            for row in rows:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET state = ?, result = ?, config = ?, lease_expires = NULL, updated = ? "
+                    "WHERE id = ? AND owner = ? AND state = ?",
+                    row
+                )
+                if cursor.rowcount:
+                    written.append(row[4])
+        return written
+
+    def reset_failed(self):
+        """Devolve os jobs falhos para a fila (com tentativas zeradas)"""
+        with self._transaction():
+            before = self._conn.total_changes
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, result = NULL, updated = ? WHERE state = ?",
+                (PENDING, time.time(), FAILED)
+            )
+            return self._conn.total_changes - before
+
+    def results(self):
+        """
+        Resultados gravados, na ordem de registro
+
+        Yields:
+            Dict de resultado por imagem (faixas de shard são expandidas)
+        """
+        rows = self._conn.execute(
+            "SELECT result FROM jobs WHERE result IS NOT NULL ORDER BY id"
+        )
+        for (payload,) in rows:
+            results = json.loads(payload)
+            yield from results if isinstance(results, list) else [results]
+
+    def stats(self):
+        """Contagem de jobs por estado e de configurações distintas entre os resultados"""
+        counts = dict.fromkeys((PENDING, LEASED, DONE, FAILED), 0)
+        counts.update(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+        now = time.time()
+        counts['expired'] = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = ? AND lease_expires < ?", (LEASED, now)
+        ).fetchone()[0]
+        counts['workers'] = self._conn.execute(
+            "SELECT COUNT(DISTINCT owner) FROM jobs WHERE state = ? AND lease_expires >= ?", (LEASED, now)
+        ).fetchone()[0]
+        counts['configs'] = self._conn.execute(
+            "SELECT COUNT(DISTINCT config) FROM jobs WHERE config IS NOT NULL"
+        ).fetchone()[0]
+        counts['total'] = sum(counts[state] for state in (PENDING, LEASED, DONE, FAILED))
+        return counts
+
+    def close(self):
+        self._conn.close()
+
+
+class LeaseRenewer:
+    """
+    Renova em segundo plano os leases dos jobs de um worker ainda não gravados
+
+    Roda em uma thread com conexão própria, então os leases continuam
+    valendo enquanto o worker está preso em um job longo (uma faixa de
+    shard, por exemplo) ou esperando o resto do lote.
+
+    Args:
+        path: Arquivo SQLite da fila
+        owner: Worker dono dos leases
+        lease_seconds: Validade de cada renovação (renova a cada 1/3 dela)
+    """
+
+    def __init__(self, path, owner, lease_seconds):
+        self.path = path
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._job_ids = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def track(self, job_ids):
+        """Passa a renovar os leases destes jobs"""
+        with self._lock:
+            self._job_ids.update(job_ids)
+
+    def release(self, job_ids):
+        """Para de renovar (jobs gravados ou descartados)"""
+        with self._lock:
+            self._job_ids.difference_update(job_ids)
+
+    def _run(self):
+        queue = JobQueue(self.path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                with self._lock:
+                    job_ids = list(self._job_ids)
+                if job_ids:
+                    queue.renew(self.owner, job_ids, self.lease_seconds)
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK em caso de exceção)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def main():
+    """Coordenador: registra jobs, acompanha a fila e exporta resultados"""
+    parser = argparse.ArgumentParser(
+        description='Fila de trabalho compartilhada (workers: python main.py --queue FILA.db)'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Registrar imagens ou shards na fila')
+    add.add_argument('queue', type=str, help='Arquivo SQLite da fila')
+    add.add_argument('--dir', type=str, help='Diretório com imagens')
+    add.add_argument('--glob', type=str, help="Padrão glob das imagens (relativo a --dir; padrão '*.png')")
+    add.add_argument('--shard', type=str, nargs='+', default=[], help='Shards empacotados (shards.py)')
+    add.add_argument('--range-size', type=int, default=1024, help='Imagens por job de shard')
+
+    status = commands.add_parser('status', help='Contagem de jobs por estado')
+    status.add_argument('queue', type=str, help='Arquivo SQLite da fila')
+
+    export = commands.add_parser('export', help='Exportar resultados (JSONL ou CSV)')
+    export.add_argument('queue', type=str, help='Arquivo SQLite da fila')
+    export.add_argument('--output', type=str, default='-', help="Arquivo de saída ('-' = stdout)")
+    export.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                        help='Formato (padrão: pela extensão)')
+
+    reset = commands.add_parser('reset', help='Devolver jobs falhos para a fila')
+    reset.add_argument('queue', type=str, help='Arquivo SQLite da fila')
+
+    args = parser.parse_args()
+    queue = JobQueue(args.queue)
+
+    if args.command == 'add':
+        from main import collect_image_paths
+
+        if not (args.dir or args.glob or args.shard):
+            parser.error("Informe --dir, --glob ou --shard")
+
+        added = 0
+        if args.dir or args.glob:
+            paths = collect_image_paths(args.dir, args.glob)
+            added += queue.add_paths(os.path.abspath(path) for path in paths)
+        for shard_path in args.shard:
+            added += queue.add_shard(shard_path, args.range_size)
+        print(f"✓ {added} job(s) novo(s); {queue.stats()['total']} na fila {args.queue}")
+
+    elif args.command == 'status':
+        stats = queue.stats()
+        print(f"Fila {args.queue}: {stats['total']} job(s)")
+        for state in (PENDING, LEASED, DONE, FAILED):
+            print(f"   {state}: {stats[state]}")
+        print(f"   Leases vencidos (serão redistribuídos): {stats['expired']}")
+        print(f"   Workers ativos: {stats['workers']}")
+        if stats['configs'] > 1:
+            print(f"   ⚠️  Resultados gerados com {stats['configs']} configurações diferentes do pipeline")
+
+    elif args.command == 'export':
+        from writers import ResultWriter
+
+        writer = ResultWriter(args.output, args.format)
+        for result in queue.results():
+            writer.write(result)
+        writer.close()
+        if args.output != '-':
+            print(f"✓ {writer.count} resultado(s) exportado(s) para {args.output}")
+
+    elif args.command == 'reset':
+        print(f"✓ {queue.reset_failed()} job(s) devolvido(s) para a fila")
+
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
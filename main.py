@@ -1,26 +1,584 @@
 """Sistema de Classificação de Galáxias com Agentes Multi-Agent"""
 import os
+import glob
+import sys
 import argparse
-from agents.orchestrator import GalaxyClassificationOrchestrator
+
+# numpy, PIL e os agentes são importados dentro de cada modo, só quando
+# necessários: --help e erros de argumento não pagam esses imports
+
+
+# Orchestrator próprio de cada processo worker (criado no initializer do pool)
+_worker_orchestrator = None
+_worker_keep_log = False
+_worker_shards = {}  # Shards abertos pelo worker (modo --queue), por caminho
+
+
+def _init_worker(keep_log, cache_path=None, cache_size=100000, orchestrator_options=None,
+                 dedup_path=None, dedup_distance=4):
+    """Inicializa o orchestrator do processo worker (sempre silencioso)"""
+    global _worker_orchestrator, _worker_keep_log
+    from agents import GalaxyClassificationOrchestrator
+
+    cache = None
+    if cache_path:
+        from cache import ResultCache
+        cache = ResultCache(cache_path, cache_size)
+    options = dict(orchestrator_options or {}, verbose=False)
+    _worker_orchestrator = GalaxyClassificationOrchestrator(cache=cache, **options)
+    if dedup_path:
+        from dedup import DedupIndex
+        _worker_orchestrator.dedup = DedupIndex(dedup_path, _worker_orchestrator.get_config(), dedup_distance)
+    _worker_keep_log = keep_log
+
+
+def _classify_in_worker(image_path):
+    """Classifica uma imagem no orchestrator do worker, sem saída no terminal"""
+    try:
+        result = _worker_orchestrator.classify_galaxy(image_path)
+    except Exception as exc:
+        # Arquivo ilegível não derruba o pool: vira um resultado de erro
+        return {'success': False, 'image_path': image_path, 'error': str(exc)}
+
+    if not _worker_keep_log:
+        result.pop('conversation_log')
+
+    result['image_path'] = image_path
+    return result
+
+
+def _run_job_in_worker(job):
+    """
+    Executa um job da fila (jobqueue.py) no orchestrator do worker
+
+    Args:
+        job: (id, caminho, início, fim); início/fim só para faixas de shard
+
+    Returns:
+        Lista de dicts de resultado (um por imagem)
+    """
+    _, path, start, stop = job
+    if start is None:
+        return [_classify_in_worker(path)]
+
+    try:
+        reader = _worker_shards.get(path)
+        if reader is None:
+            from shards import ShardReader
+            reader = _worker_shards[path] = ShardReader(path)
+
+        results = []
+        for result in _worker_orchestrator.classify_shard(reader, start, stop):
+            if not _worker_keep_log:
+                result.pop('conversation_log')
+            results.append(result)
+        return results
+    except Exception as exc:
+        return [{'success': False, 'image_path': f"{path}[{start}:{stop}]", 'error': str(exc)}]
+
+
+def collect_image_paths(directory=None, pattern=None):
+    """
+    Lista imagens a classificar a partir de um diretório e/ou padrão glob
+
+    Args:
+        directory: Diretório com as imagens
+        pattern: Padrão glob (relativo ao diretório, se informado)
+
+    Returns:
+        Lista ordenada de caminhos
+    """
+    if pattern is None:
+        pattern = '*.png'
+    if directory is not None:
+        pattern = os.path.join(directory, pattern)
+
+    return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+
+def classify_paths(image_paths, workers=1, keep_log=False, cache_path=None, cache_size=100000,
+                   orchestrator_options=None, dedup_path=None, dedup_distance=4):
+    """
+    Classifica várias imagens distribuindo o trabalho em um pool de processos
+
+    Args:
+        image_paths: Lista de caminhos das imagens
+        workers: Número de processos (1 = executa no processo atual)
+        keep_log: Manter o log de conversação em cada resultado
+        cache_path: Arquivo do cache de resultados (opcional, compartilhado entre workers)
+        cache_size: Máximo de entradas no cache
+        orchestrator_options: kwargs do GalaxyClassificationOrchestrator (dtype, speculative)
+        dedup_path: Índice SQLite de quase-duplicatas (opcional, compartilhado entre workers)
+        dedup_distance: Distância de Hamming máxima para reaproveitar um resultado
+
+    Yields:
+        Dicts de resultado, na mesma ordem de image_paths
+    """
+    init_args = (keep_log, cache_path, cache_size, orchestrator_options, dedup_path, dedup_distance)
+
+    if workers <= 1:
+        _init_worker(*init_args)
+        for image_path in image_paths:
+            yield _classify_in_worker(image_path)
+        return
+
+    from multiprocessing import Pool
+
+    # Lotes grandes reduzem o overhead de IPC; 4 lotes por worker balanceiam a carga
+    chunksize = max(1, len(image_paths) // (workers * 4))
+
+    with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        yield from pool.imap(_classify_in_worker, image_paths, chunksize=chunksize)
+
+
+def emit_result(result, args, metrics=None, writer=None):
+    """Registra um resultado dos modos em lote: métricas, arquivo de saída e linha no terminal"""
+    if metrics is not None:
+        metrics.observe(result)
+    if writer is not None:
+        writer.write(result)
+    if args.quiet:
+        return
+
+    if not result['success']:
+        print(f"{result['image_path']}: ❌ {result['error']}")
+        return
+
+    print(f"{result['image_path']}: {result['classification']} "
+          f"(confiança={result['confidence']:.2f}, iterações={result['iterations']})")
+
+    if args.show_log:
+        from agents import render_message
+
+        for i, msg in enumerate(result['conversation_log'], 1):
+            print(f"\n[{i}] {msg['from']} -> {msg['to']}")
+            print(f"    {render_message(msg)}")
+        print("\n" + "-"*60 + "\n")
+
+
+def run_queue(args, orchestrator_options, metrics=None, writer=None):
+    """
+    Modo worker da fila compartilhada (jobqueue.py)
+
+    Pega lotes de jobs com lease, classifica no pool de processos e grava
+    os resultados do lote em uma transação, até a fila esvaziar. Qualquer
+    número de processos, em qualquer máquina que enxergue o arquivo da
+    fila, pode rodar este modo ao mesmo tempo; sem jobs livres, o worker
+    espera enquanto houver leases de outros workers (que podem vencer).
+    Só são emitidos os resultados gravados: um job cujo lease se perdeu
+    já está com outro worker.
+    """
+    import socket
+    import time
+    from agents import GalaxyClassificationOrchestrator
+    from jobqueue import JobQueue, LeaseRenewer
+
+    queue = JobQueue(args.queue)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    config = GalaxyClassificationOrchestrator(**dict(orchestrator_options, verbose=False)).get_config()
+    init_args = (args.show_log, args.cache, args.cache_size, orchestrator_options, args.dedup, args.dedup_distance)
+
+    pool = None
+    if args.workers > 1:
+        from multiprocessing import Pool
+        pool = Pool(args.workers, initializer=_init_worker, initargs=init_args)
+    else:
+        _init_worker(*init_args)
+
+    written = lost = 0
+    try:
+        # Leases renovados em segundo plano até o lote ser gravado, mesmo durante um job longo
+        with LeaseRenewer(args.queue, owner, args.lease) as renewer:
+            while True:
+                jobs = queue.claim(owner, args.queue_batch, args.lease)
+                if not jobs:
+                    stats = queue.stats()
+                    if not stats['pending'] and not stats['leased']:
+                        break
+                    time.sleep(min(1.0, args.lease / 10))
+                    continue
+
+                job_ids = [job[0] for job in jobs]
+                renewer.track(job_ids)
+                if pool is not None:
+                    chunksize = max(1, len(jobs) // (args.workers * 4))
+                    results_iter = pool.imap(_run_job_in_worker, jobs, chunksize=chunksize)
+                else:
+                    results_iter = map(_run_job_in_worker, jobs)
+
+                outcomes = list(zip(job_ids, results_iter))
+                committed = set(queue.complete(owner, outcomes, config))
+                renewer.release(job_ids)
+
+                for job_id, results in outcomes:
+                    if job_id in committed:
+                        for result in results:
+                            emit_result(result, args, metrics, writer)
+                written += len(committed)
+                lost += len(outcomes) - len(committed)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if not args.quiet:
+        stats = queue.stats()
+        print("\n" + "="*60)
+        print(f"Worker {owner}: {written} job(s) gravado(s)")
+        if lost:
+            print(f"   {lost} job(s) descartado(s): lease perdido para outro worker")
+        print(f"Fila {args.queue}: {stats['done']} concluído(s), {stats['failed']} falho(s) de {stats['total']}")
+        print("="*60)
+    queue.close()
+
+
+def watch_directory(args, orchestrator_options, metrics=None, writer=None):
+    """
+    Modo incremental: classifica só arquivos novos ou alterados do diretório
+
+    O manifesto (manifest.py) guarda o que já foi processado, então
+    reiniciar depois de uma interrupção retoma do ponto em que parou.
+    Sem --once, varre o diretório a cada --interval segundos; orchestrator,
+    cache e índice de quase-duplicatas são abertos uma vez para todas as
+    varreduras.
+    """
+    import time
+    from manifest import Manifest
+
+    if not os.path.isdir(args.watch):
+        print(f"❌ Erro: Diretório não encontrado: {args.watch}")
+        return
+
+    init_args = (args.show_log, args.cache, args.cache_size, orchestrator_options, args.dedup, args.dedup_distance)
+    _init_worker(*init_args)
+    config = _worker_orchestrator.get_config()
+    manifest = Manifest(args.manifest or os.path.join(args.watch, '.galaxy_manifest.db'), config)
+    if not args.quiet:
+        print(f"\n👀 Observando {args.watch} ({len(manifest)} arquivo(s) já no manifesto)...")
+
+    pool = None
+    try:
+        while True:
+            # Em uma passada única não há próxima varredura para esperar arquivos em escrita
+            pending = manifest.scan(collect_image_paths(args.watch, args.glob),
+                                    settle_seconds=0.0 if args.once else 1.0)
+
+            if pending:
+                entries = {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in pending}
+                # Pool só na primeira varredura grande: para poucos arquivos o custo de subi-lo não compensa
+                if pool is None and args.workers > 1 and len(pending) >= 32:
+                    from multiprocessing import Pool
+                    pool = Pool(args.workers, initializer=_init_worker, initargs=init_args)
+                if pool is not None:
+                    chunksize = max(1, len(pending) // (args.workers * 4))
+                    results = pool.imap(_classify_in_worker, list(entries), chunksize=chunksize)
+                else:
+                    results = map(_classify_in_worker, entries)
+                for result in results:
+                    manifest.record(result['image_path'], *entries[result['image_path']], result)
+                    emit_result(result, args, metrics, writer)
+
+                if not args.quiet:
+                    print(f"✓ {len(pending)} arquivo(s) novo(s) ou alterado(s) classificado(s); "
+                          f"{len(manifest)} no manifesto")
+
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        if not args.quiet:
+            print("\n👋 Encerrando observação...")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        manifest.close()
 
 
 def main():
     """Função principal"""
+    if '--bench' in sys.argv[1:]:
+        # Demais argumentos pertencem ao benchmark (ver bench.py --help)
+        import bench
+        argv = [arg for arg in sys.argv[1:] if arg != '--bench']
+        return bench.main(argv)
+
     parser = argparse.ArgumentParser(description='Classificador de Galáxias Multi-Agente')
     parser.add_argument('--image', type=str, help='Caminho da imagem a classificar')
     parser.add_argument('--demo', action='store_true', help='Executar demonstração com imagens de exemplo')
     parser.add_argument('--show-log', action='store_true', help='Mostrar log completo de conversação')
+    parser.add_argument('--dir', type=str, help='Classificar todas as imagens PNG de um diretório')
+    parser.add_argument('--glob', type=str, help='Padrão glob das imagens a classificar (relativo a --dir, se informado)')
+    parser.add_argument('--watch', type=str,
+                        help='Classificar só arquivos novos/alterados do diretório e continuar observando')
+    parser.add_argument('--manifest', type=str,
+                        help='Manifesto SQLite do modo --watch (padrão: DIR/.galaxy_manifest.db)')
+    parser.add_argument('--interval', type=float, default=5.0, help='Intervalo entre varreduras do --watch (s)')
+    parser.add_argument('--once', action='store_true', help='Com --watch: uma única passada incremental')
+    parser.add_argument('--shard', type=str, help='Classificar as imagens de um shard empacotado (shards.py)')
+    parser.add_argument('--queue', type=str, metavar='FILA.db',
+                        help='Worker da fila compartilhada (jobs registrados com jobqueue.py add)')
+    parser.add_argument('--queue-batch', type=int, default=64, help='Jobs pegos por lease no modo --queue')
+    parser.add_argument('--lease', type=float, default=300.0,
+                        help='Validade (s) dos leases do --queue; jobs de workers mortos voltam à fila depois disso')
+    parser.add_argument('--mosaic', type=str,
+                        help='Classificar um mosaico grande em janelas 128x128 (.npy, binário cru ou imagem)')
+    parser.add_argument('--stride', type=int, default=64, help='Passo entre janelas do --mosaic (pixels)')
+    parser.add_argument('--mosaic-shape', type=int, nargs=2, metavar=('ALTURA', 'LARGURA'),
+                        help='Dimensões de um --mosaic em binário cru uint8')
+    parser.add_argument('--mosaic-max-pixels', type=int,
+                        help='Máximo de pixels de um --mosaic PNG/TIFF/JPEG, decodificado inteiro '
+                             '(padrão: limite do PIL; .npy e binário cru são lidos em faixas)')
+    parser.add_argument('--empty-threshold', type=float, default=0.05,
+                        help='Janelas com média + 3 desvios abaixo disso (0-1) são céu vazio e são puladas')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Número de processos para --dir/--glob/--queue (padrão: núcleos disponíveis)')
+    parser.add_argument('--cache', type=str, help='Arquivo SQLite do cache persistente de resultados')
+    parser.add_argument('--cache-size', type=int, default=100000, help='Máximo de entradas no cache (LRU)')
+    parser.add_argument('--dedup', type=str,
+                        help='Índice SQLite de hashes perceptuais: quase-duplicatas reaproveitam o resultado')
+    parser.add_argument('--dedup-distance', type=int, default=4,
+                        help='Distância de Hamming máxima (bits do dHash de 64) para --dedup')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Decidir pelo histograma, sem materializar a imagem, quando não houver '
+                             'reprocessamento (saída antecipada)')
+    parser.add_argument('--save-features', type=str, metavar='STORE',
+                        help='Gravar as features de --dir/--glob em um store colunar (re-score em features.py)')
+    parser.add_argument('--backend', choices=['mock', 'cnn'], default='mock',
+                        help='Classificador: heurística mockada ou CNN em NumPy puro (precisa de --weights)')
+    parser.add_argument('--weights', type=str, help='Pesos .npz do backend cnn (gerados por cnn.py)')
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help='Tipo float dos cálculos (imagens são sempre armazenadas em uint8)')
+    parser.add_argument('--speculative', action='store_true',
+                        help='Avaliar todas as variantes de reprocessamento em um único lote')
+    parser.add_argument('--bench', action='store_true',
+                        help='Executar o benchmark do pipeline (argumentos em bench.py --help)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Manter o orchestrator residente e atender requisições HTTP em micro-lotes')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço do modo --serve')
+    parser.add_argument('--port', type=int, default=8765, help='Porta do modo --serve')
+    parser.add_argument('--socket', type=str, help='Socket Unix do modo --serve (em vez de host/porta)')
+    parser.add_argument('--max-batch-size', type=int, default=32, help='Máximo de imagens por micro-lote')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Espera máxima para completar um micro-lote (ms)')
+    parser.add_argument('--metrics', type=str,
+                        help='Gravar métricas ao final (.prom/.txt = Prometheus, outros = JSON)')
+    parser.add_argument('--no-timings', action='store_true',
+                        help='Desligar a medição de tempos por estágio (sem custo de instrumentação)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Não imprimir nada no terminal (use com --output)')
+    parser.add_argument('--output', type=str,
+                        help='Gravar um resultado por linha neste arquivo (- = stdout, implica --quiet)')
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'], default=None,
+                        help='Formato de --output (padrão: pela extensão, JSONL se não for .csv)')
 
     args = parser.parse_args()
+    args.quiet = args.quiet or args.output == '-'
+    if args.backend == 'cnn' and not args.weights:
+        parser.error("--backend cnn precisa de --weights (gere com: python cnn.py DIRETÓRIO pesos.npz)")
+
+    metrics = writer = None
+    if args.metrics:
+        from metrics import Metrics
+        metrics = Metrics()
+    if args.output:
+        from writers import ResultWriter
+        writer = ResultWriter(args.output, args.output_format, keep_log=args.show_log)
+    try:
+        run(args, metrics, writer)
+    finally:
+        if writer is not None:
+            writer.close()
+        if metrics is not None:
+            metrics.write(args.metrics)
+            if not args.quiet:
+                print(f"\n📊 Métricas salvas em {args.metrics}")
+
+
+def run(args, metrics=None, writer=None):
+    """Executa o modo escolhido na linha de comando"""
+    import numpy as np
+    from model import load_classifier
+
+    quiet = args.quiet
+    orchestrator_options = {
+        'classifier': load_classifier(args.backend, args.weights),
+        'dtype': np.dtype(args.dtype),
+        'speculative': args.speculative,
+        'cascade': args.cascade,
+        'instrument': not args.no_timings,
+        'verbose': not quiet
+    }
+
+    if args.watch:
+        watch_directory(args, orchestrator_options, metrics, writer)
+        return
+
+    if args.queue:
+        run_queue(args, orchestrator_options, metrics, writer)
+        return
+
+    if args.dir or args.glob:
+        # Classificar diretório em paralelo (cada worker tem seu orchestrator)
+        if args.dir and not os.path.isdir(args.dir):
+            print(f"❌ Erro: Diretório não encontrado: {args.dir}")
+            return
+
+        image_paths = collect_image_paths(args.dir, args.glob)
+        if not image_paths:
+            print("❌ Erro: Nenhuma imagem encontrada")
+            return
+
+        if not quiet:
+            print(f"\n🚀 Classificando {len(image_paths)} imagens com {args.workers} worker(s)...")
+
+        store = None
+        unseen = []  # Imagens sem features no resultado (vindas do cache, sem decodificação)
+        if args.save_features:
+            from agents import GalaxyClassificationOrchestrator
+            from features import FeatureStoreWriter
+
+            # Features calculadas pelos workers junto com a classificação, do histograma já feito
+            orchestrator_options = dict(orchestrator_options, collect_features=True)
+            config = GalaxyClassificationOrchestrator(**dict(orchestrator_options, verbose=False)).get_config()
+            store = FeatureStoreWriter(args.save_features, len(image_paths), config)
+
+        counts = {}
+        cache_hits = 0
+        duplicates = 0
+        early_exits = 0
+        results = classify_paths(image_paths, args.workers, keep_log=args.show_log,
+                                 cache_path=args.cache, cache_size=args.cache_size,
+                                 orchestrator_options=orchestrator_options,
+                                 dedup_path=args.dedup, dedup_distance=args.dedup_distance)
+        for result in results:
+            features = result.pop('features', None)
+            if features is not None:
+                store.add(result['image_path'], features)
+            elif store is not None and result['success']:
+                unseen.append(result['image_path'])
+            emit_result(result, args, metrics, writer)
+            label = result['classification'] if result['success'] else 'erros'
+            counts[label] = counts.get(label, 0) + 1
+            cache_hits += result.get('cached', False)
+            duplicates += 'duplicate_of' in result
+            early_exits += result.get('early_exit', False)
+
+        if store is not None:
+            from features import extract_features
+
+            extract_features(store, unseen, workers=args.workers)
+            store.close()
+            if not quiet:
+                print(f"\n💾 Features de {store.count} imagens gravadas em {args.save_features}"
+                      + (f" ({len(unseen)} do cache, extraída(s) à parte)" if unseen else ""))
+
+        if quiet:
+            return
+
+        print("\n" + "="*60)
+        print(f"Total: {len(image_paths)} imagens")
+        for class_name, count in sorted(counts.items()):
+            print(f"   {class_name}: {count}")
+        if args.cache:
+            # Quase-duplicatas reaproveitadas (--dedup) têm linha própria, não contam como misses
+            print(f"Cache: {cache_hits} hits, {len(image_paths) - cache_hits - duplicates} misses")
+        if args.dedup:
+            print(f"Quase-duplicatas: {duplicates} resultado(s) reaproveitado(s)")
+        if args.cascade:
+            print(f"Cascata: {early_exits} saída(s) antecipada(s) ({early_exits / len(image_paths):.1%})")
+        print("="*60)
+        return
 
     # Criar orchestrator
-    orchestrator = GalaxyClassificationOrchestrator()
+    from agents import GalaxyClassificationOrchestrator
+
+    cache = None
+    if args.cache:
+        from cache import ResultCache
+        cache = ResultCache(args.cache, args.cache_size)
+    orchestrator = GalaxyClassificationOrchestrator(cache=cache, metrics=metrics, **orchestrator_options)
+    if args.dedup:
+        from dedup import DedupIndex
+        orchestrator.dedup = DedupIndex(args.dedup, orchestrator.get_config(), args.dedup_distance)
+
+    if args.serve:
+        orchestrator.verbose = False  # Respostas vão pelo HTTP, não pelo terminal
+        from server import serve
+        serve(orchestrator, args.host, args.port, args.socket, args.max_batch_size, args.max_wait_ms)
+        return
+
+    if args.shard:
+        # Classificar shard direto do memmap (sem copiar pixels)
+        from shards import ShardReader
+
+        reader = ShardReader(args.shard)
+        if not quiet:
+            print(f"\n🚀 Classificando {len(reader)} imagens do shard {reader.npy_path}...")
+
+        correct = 0
+        # Só o resumo de cada imagem vai para o terminal
+        orchestrator.verbose = False
+        for i, result in enumerate(orchestrator.classify_shard(reader)):
+            label = reader.labels[i]
+            correct += result['classification'] == label
+            if writer is not None:
+                writer.write(result)
+            if not quiet:
+                print(f"{result['image_path']}: {result['classification']} "
+                      f"(confiança={result['confidence']:.2f}, rótulo={label or '-'})")
+
+        if any(reader.labels) and not quiet:
+            print(f"\nAcurácia: {correct}/{len(reader)}")
+        return
+
+    if args.mosaic:
+        # Mosaico em faixas: janelas não vazias classificadas em lotes, memória limitada
+        from mosaic import open_mosaic, classify_mosaic, count_windows, mosaic_name
+
+        if not os.path.exists(args.mosaic):
+            print(f"❌ Erro: Mosaico não encontrado: {args.mosaic}")
+            return
+
+        try:
+            mosaic = open_mosaic(args.mosaic, args.mosaic_shape, args.mosaic_max_pixels)
+        except ValueError as exc:
+            print(f"❌ Erro: {exc}")
+            return
+        total = count_windows(mosaic, stride=args.stride)
+        if not quiet:
+            print(f"\n🚀 Classificando mosaico {mosaic.shape[1]}x{mosaic.shape[0]} "
+                  f"({total} janelas, passo {args.stride})...")
+
+        orchestrator.verbose = False
+        counts = {}
+        classified = 0
+        results = classify_mosaic(orchestrator, mosaic, stride=args.stride,
+                                  empty_threshold=args.empty_threshold,
+                                  name=mosaic_name(args.mosaic), keep_log=args.show_log)
+        for result in results:
+            # Métricas já registradas pelo classify_batch do orchestrator
+            emit_result(result, args, writer=writer)
+            label = result['classification'] if result['success'] else 'erros'
+            counts[label] = counts.get(label, 0) + 1
+            classified += 1
+
+        if quiet:
+            return
 
-    if args.demo:
-        # Demonstração com imagens do dataset
         print("\n" + "="*60)
-        print("DEMO: Classificação de Galáxias Multi-Agente")
+        print(f"Janelas: {total} ({classified} classificadas, {total - classified} de céu vazio)")
+        for class_name, count in sorted(counts.items()):
+            print(f"   {class_name}: {count}")
         print("="*60)
+        return
+
+    if args.demo:
+        # Demonstração com imagens do dataset
+        if not quiet:
+            print("\n" + "="*60)
+            print("DEMO: Classificação de Galáxias Multi-Agente")
+            print("="*60)
 
         demo_images = [
             'data/samples/spiral_00.png',
@@ -31,13 +589,15 @@ def main():
         for img_path in demo_images:
             if os.path.exists(img_path):
                 result = orchestrator.classify_galaxy(img_path)
+                if writer is not None:
+                    result['image_path'] = img_path
+                    writer.write(result)
 
-                if args.show_log:
-                    print(orchestrator.get_conversation_summary())
+                if args.show_log and not quiet:
+                    print(orchestrator.get_conversation_summary(result['conversation_log']))
 
-                print("\n" + "-"*60 + "\n")
-                # Reset log para próxima imagem
-                orchestrator.conversation_log = []
+                if not quiet:
+                    print("\n" + "-"*60 + "\n")
             else:
                 print(f"⚠️  Imagem não encontrada: {img_path}")
 
@@ -48,9 +608,12 @@ def main():
             return
 
         result = orchestrator.classify_galaxy(args.image)
+        if writer is not None:
+            result['image_path'] = args.image
+            writer.write(result)
 
-        if args.show_log:
-            print(orchestrator.get_conversation_summary())
+        if args.show_log and not quiet:
+            print(orchestrator.get_conversation_summary(result['conversation_log']))
 
     else:
         # Modo interativo
@@ -70,8 +633,7 @@ def main():
                 img_path = 'data/samples/spiral_00.png'
                 if os.path.exists(img_path):
                     result = orchestrator.classify_galaxy(img_path)
-                    print(orchestrator.get_conversation_summary())
-                    orchestrator.conversation_log = []
+                    print(orchestrator.get_conversation_summary(result['conversation_log']))
                 else:
                     print("❌ Imagem de exemplo não encontrada!")
 
@@ -79,8 +641,7 @@ def main():
                 img_path = 'data/samples/elliptical_00.png'
                 if os.path.exists(img_path):
                     result = orchestrator.classify_galaxy(img_path)
-                    print(orchestrator.get_conversation_summary())
-                    orchestrator.conversation_log = []
+                    print(orchestrator.get_conversation_summary(result['conversation_log']))
                 else:
                     print("❌ Imagem de exemplo não encontrada!")
 
@@ -88,8 +649,7 @@ def main():
                 img_path = input("Digite o caminho da imagem: ").strip()
                 if os.path.exists(img_path):
                     result = orchestrator.classify_galaxy(img_path)
-                    print(orchestrator.get_conversation_summary())
-                    orchestrator.conversation_log = []
+                    print(orchestrator.get_conversation_summary(result['conversation_log']))
                 else:
                     print(f"❌ Erro: Imagem não encontrada: {img_path}")
 
@@ -102,4 +662,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Manifesto persistente de arquivos já classificados (modo incremental/watch)"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from cache import ResultCache, _to_builtin
+
+
+def content_hash(path):
+    """Hash blake2b dos bytes do arquivo"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Registro em disco (SQLite) de cada arquivo processado: caminho,
+    tamanho, mtime, hash do conteúdo, configuração e resultado
+
+    Um arquivo só volta a ser classificado se for novo, se tamanho/mtime
+    mudarem e o hash confirmar a mudança, ou se a configuração do pipeline
+    mudar. Cada resultado é gravado assim que fica pronto, então uma
+    execução interrompida recomeça apenas do que faltou.
+
+    O índice (caminho -> tamanho, mtime, hash) fica em memória: a cada
+    varredura, arquivos inalterados custam só um stat, sem acesso ao banco.
+    """
+
+    def __init__(self, path, config):
+        self.path = path
+        self.fingerprint = ResultCache.config_fingerprint(config)
+
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT, "
+            "config TEXT, success INTEGER, result TEXT, updated REAL)"
+        )
+        self._conn.commit()
+
+        # Entradas de outra configuração ficam fora do índice: serão reprocessadas
+        self._index = {
+            path: (size, mtime_ns, digest)
+            for path, size, mtime_ns, digest in self._conn.execute(
+                "SELECT path, size, mtime_ns, hash FROM files WHERE config = ?", (self.fingerprint,)
+            )
+        }
+
+    def __len__(self):
+        return len(self._index)
+
+    def scan(self, paths, settle_seconds=1.0):
+        """
+        Seleciona os arquivos que precisam ser classificados
+
+        Args:
+            paths: Caminhos presentes no diretório observado
+            settle_seconds: Arquivos modificados há menos que isso são
+                adiados para a próxima varredura (podem estar sendo escritos)
+
+        Returns:
+            Lista de (caminho, tamanho, mtime_ns, hash) novos ou alterados
+        """
+        now_ns = time.time_ns()
+        settle_ns = int(settle_seconds * 1e9)
+        pending = []
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Removido entre a listagem e o stat
+
+            known = self._index.get(path)
+            if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            if now_ns - stat.st_mtime_ns < settle_ns:
+                continue
+
+            digest = content_hash(path)
+            if known is not None and known[2] == digest:
+                # Só os metadados mudaram (ex.: touch, cópia): nada a reclassificar
+                self._touch(path, stat.st_size, stat.st_mtime_ns)
+                continue
+
+            pending.append((path, stat.st_size, stat.st_mtime_ns, digest))
+
+        return pending
+
+    def record(self, path, size, mtime_ns, digest, result):
+        """Grava o resultado de um arquivo (falhas também, para não repetir até o arquivo mudar)"""
+        payload = json.dumps(result, default=_to_builtin)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash, config, success, result, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, digest, self.fingerprint, int(result.get('success', False)),
+             payload, time.time())
+        )
+        self._conn.commit()
+        self._index[path] = (size, mtime_ns, digest)
+
+    def _touch(self, path, size, mtime_ns):
+        """Atualiza tamanho/mtime de um arquivo com conteúdo inalterado"""
+        self._conn.execute(
+            "UPDATE files SET size = ?, mtime_ns = ?, updated = ? WHERE path = ?",
+            (size, mtime_ns, time.time(), path)
+        )
+        self._conn.commit()
+        self._index[path] = (size, mtime_ns, self._index[path][2])
+
+    def get(self, path):
+        """Último resultado registrado para o caminho (ou None)"""
+        row = self._conn.execute(
+            "SELECT result FROM files WHERE path = ? AND config = ?", (path, self.fingerprint)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self):
+        """Contagem de arquivos registrados (com a configuração atual)"""
+        total, failed = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(1 - success), 0) FROM files WHERE config = ?",
+            (self.fingerprint,)
+        ).fetchone()
+        return {'files': total, 'failed': failed, 'path': self.path}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,214 @@
+"""Instrumentação: tempos por estágio e métricas agregadas (Prometheus/JSON)"""
+import bisect
+import json
+import threading
+import time
+from collections import deque
+
+
+# Limites dos buckets de latência em segundos (convenção Prometheus)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+COUNTERS = (
+    'requests', 'errors', 'preprocessed', 'reprocessed',
+    'reprocess_iterations', 'cache_hits', 'cache_misses', 'duplicates', 'early_exits'
+)
+
+
+class StageTimer:
+    """
+    Cronômetro de uma requisição: acumula o tempo de cada estágio
+
+    lap(stage) atribui ao estágio o tempo desde a marca anterior, então
+    o pipeline só precisa de uma chamada ao fim de cada etapa.
+    """
+
+    __slots__ = ('timings', '_start', '_last')
+
+    def __init__(self):
+        self.timings = {}
+        self._start = self._last = time.perf_counter()
+
+    def mark(self):
+        """Recomeça a contagem (o tempo desde a última marca é descartado)"""
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Soma ao estágio o tempo desde a última marca"""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def add(self, stage, seconds):
+        """Soma ao estágio um tempo medido fora do cronômetro (ex.: etapa de um lote)"""
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def result(self):
+        """
+        Returns:
+            Dict {estágio: milissegundos}, com 'total' desde a criação até agora
+        """
+        timings = {stage: round(seconds * 1000, 4) for stage, seconds in self.timings.items()}
+        timings['total'] = round((time.perf_counter() - self._start) * 1000, 4)
+        return timings
+
+
+class _NullTimer:
+    """Cronômetro desligado: nenhuma leitura de relógio"""
+
+    __slots__ = ()
+
+    def mark(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def add(self, stage, seconds):
+        pass
+
+    def result(self):
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Contadores e histogramas de latência acumulados no processo
+
+    Alimentado pelos dicts de resultado (observe), então também agrega
+    resultados vindos de outros processos (modo --dir). Os histogramas têm
+    buckets fixos para exportação Prometheus; os percentis p50/p95/p99 são
+    calculados sobre uma janela das últimas `window` observações.
+    """
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._buckets = {}  # estágio -> contagem por bucket (+ overflow)
+        self._sums = {}  # estágio -> soma dos segundos
+        self._recent = {}  # estágio -> deque com as últimas latências (s)
+        self._lock = threading.Lock()
+
+    def observe(self, result):
+        """
+        Registra o resultado de uma classificação
+
+        Args:
+            result: Dict retornado por classify_galaxy (com 'timings', se
+                a instrumentação estiver ligada)
+        """
+        with self._lock:
+            counters = self.counters
+            counters['requests'] += 1
+
+            if not result.get('success', False):
+                counters['errors'] += 1
+                return
+
+            counters['preprocessed'] += bool(result.get('preprocessed'))
+            extra_iterations = result.get('iterations', 1) - 1
+            counters['reprocessed'] += extra_iterations > 0
+            counters['reprocess_iterations'] += extra_iterations
+
+            if 'cached' in result:
+                counters['cache_hits' if result['cached'] else 'cache_misses'] += 1
+            counters['duplicates'] += 'duplicate_of' in result
+            counters['early_exits'] += result.get('early_exit', False)
+
+            for stage, milliseconds in (result.get('timings') or {}).items():
+                self._observe_latency(stage, milliseconds / 1000.0)
+
+    def observe_latency(self, stage, seconds):
+        """Registra uma latência avulsa (ex.: espera na fila do modo serve)"""
+        with self._lock:
+            self._observe_latency(stage, seconds)
+
+    def _observe_latency(self, stage, seconds):
+        """Soma uma latência ao histograma do estágio (com o lock adquirido)"""
+        buckets = self._buckets.get(stage)
+        if buckets is None:
+            buckets = self._buckets[stage] = [0] * (len(LATENCY_BUCKETS) + 1)
+            self._sums[stage] = 0.0
+            self._recent[stage] = deque(maxlen=self.window)
+
+        buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self._sums[stage] += seconds
+        self._recent[stage].append(seconds)
+
+    def snapshot(self):
+        """
+        Estado atual das métricas
+
+        Returns:
+            Dict serializável com contadores, taxas e latências por estágio (ms)
+        """
+        import numpy as np
+
+        with self._lock:
+            counters = dict(self.counters)
+            stages = {}
+            for stage, buckets in self._buckets.items():
+                p50, p95, p99 = np.percentile(self._recent[stage], [50, 95, 99]) * 1000
+                stages[stage] = {
+                    'count': sum(buckets),
+                    'sum_ms': round(self._sums[stage] * 1000, 3),
+                    'p50_ms': round(float(p50), 4),
+                    'p95_ms': round(float(p95), 4),
+                    'p99_ms': round(float(p99), 4)
+                }
+
+        classified = counters['requests'] - counters['errors']
+        lookups = counters['cache_hits'] + counters['cache_misses']
+        return {
+            'counters': counters,
+            'reprocess_rate': round(counters['reprocessed'] / classified, 4) if classified else 0.0,
+            'cache_hit_rate': round(counters['cache_hits'] / lookups, 4) if lookups else None,
+            'early_exit_rate': round(counters['early_exits'] / classified, 4) if classified else 0.0,
+            'stages': stages
+        }
+
+    def to_json(self):
+        """Métricas em JSON"""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix='galaxy'):
+        """
+        Métricas no formato de texto do Prometheus
+
+        Contadores viram `<prefix>_<nome>_total`; cada estágio é uma série
+        do histograma `<prefix>_stage_seconds` (label stage).
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {stage: (list(buckets), self._sums[stage])
+                          for stage, buckets in self._buckets.items()}
+
+        lines = []
+        for name, value in counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+        for stage, (buckets, total) in histograms.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            cumulative += buckets[-1]
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Grava as métricas: Prometheus para .prom/.txt, JSON para o resto"""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
@@ -8,41 +8,166 @@ class MockClassifier:
     Usa heurísticas nas imagens para simular classificação
     """
 
-    def __init__(self):
+    def __init__(self, variance_cutoff=0.015, dim_brightness=0.3):
         self.classes = ['spiral', 'elliptical']
+        self.variance_cutoff = variance_cutoff  # Acima: spiral
+        self.dim_brightness = dim_brightness  # Abaixo: confiança reduzida
 
-    def predict(self, image_array):
+    def get_config(self):
+        """Identificação do backend (entra na configuração do pipeline: cache, manifesto)"""
+        return {'backend': 'mock'}
+
+    @staticmethod
+    def _pixel_scale(image_array):
+        """Fator para levar pixels a [0, 1] (imagens uint8 guardam níveis 0-255)"""
+        return 1 / 255.0 if image_array.dtype == np.uint8 else 1.0
+
+    def score(self, variance, mean_brightness):
+        """
+        Aplica a heurística de decisão (escalar ou vetorizada)
+
+        Args:
+            variance: Variância por imagem (escalar ou array [N])
+            mean_brightness: Brilho médio por imagem (escalar ou array [N])
+
+        Returns:
+            (índice da classe, confiança) no mesmo formato da entrada
+        """
+        # Heurística: espirais têm mais variância (braços), elípticas são mais suaves
+        is_spiral = variance > self.variance_cutoff
+        class_idx = np.where(is_spiral, 0, 1)
+        confidence = np.where(
+            is_spiral,
+            np.minimum(0.92, 0.65 + variance * 10),
+            np.minimum(0.92, 0.65 + (self.variance_cutoff - variance) * 10)
+        )
+
+        # Ajustar pela intensidade
+        confidence = np.where(mean_brightness < self.dim_brightness, confidence * 0.85, confidence)
+
+        return class_idx, np.round(confidence, 2)
+
+    def predict(self, image_array, stats=None):
         """
         Prediz classe baseado em características simples da imagem
 
         Args:
-            image_array: Array numpy de imagem [H, W]
+            image_array: Array numpy de imagem [H, W] (float em [0, 1] ou uint8)
+            stats: Estatísticas já calculadas da imagem (utils.ImageStats, opcional)
 
         Returns:
             (classe, confiança)
         """
         # Calcular variância e entropia como features simples
-        variance = np.var(image_array)
-        mean_brightness = np.mean(image_array)
-
-        # Heurística: espirais têm mais variância (braços), elípticas são mais suaves
-        if variance > 0.015:
-            pred_class = 'spiral'
-            confidence = min(0.92, 0.65 + variance * 10)
+        if stats is not None:
+            variance, mean_brightness = stats.var, stats.mean
         else:
-            pred_class = 'elliptical'
-            confidence = min(0.92, 0.65 + (0.015 - variance) * 10)
+            # Acumular em float64 mesmo para imagens float32/uint8
+            scale = self._pixel_scale(image_array)
+            variance = np.var(image_array, dtype=np.float64) * scale * scale
+            mean_brightness = np.mean(image_array, dtype=np.float64) * scale
 
-        # Ajustar pela intensidade
-        if mean_brightness < 0.3:
-            confidence *= 0.85  # Baixa confiança em imagens muito escuras
+        class_idx, confidence = self.score(variance, mean_brightness)
+        return self.classes[int(class_idx)], confidence[()]
 
-        return pred_class, round(confidence, 2)
+    def predict_from_stats(self, stats):
+        """
+        Prediz a classe só com as estatísticas da imagem, sem os pixels (cascata)
+
+        A heurística depende apenas de variância e brilho médio, então o
+        resultado é o mesmo de predict() sobre a imagem.
+
+        Args:
+            stats: ImageStats da imagem que seria classificada
 
-    def get_features(self, image_array):
-        """Extrai features da imagem para análise"""
+        Returns:
+            (classe, confiança), ou None se o backend precisar dos pixels
+        """
+        return self.predict(None, stats)
+
+    def get_features(self, image_array, stats=None):
+        """Extrai features da imagem para análise (reaproveita stats se fornecido)"""
+        if stats is not None:
+            return {
+                'variance': round(stats.var, 4),
+                'mean_brightness': round(stats.mean, 4),
+                'max_intensity': round(stats.max, 4)
+            }
+
+        scale = self._pixel_scale(image_array)
         return {
-            'variance': round(np.var(image_array), 4),
-            'mean_brightness': round(np.mean(image_array), 4),
-            'max_intensity': round(np.max(image_array), 4)
+            'variance': round(np.var(image_array, dtype=np.float64) * scale * scale, 4),
+            'mean_brightness': round(np.mean(image_array, dtype=np.float64) * scale, 4),
+            'max_intensity': round(float(np.max(image_array)) * scale, 4)
         }
+
+    @classmethod
+    def batch_features(cls, images):
+        """
+        Features descritivas de um lote (as mesmas de get_features)
+
+        Args:
+            images: Array numpy empilhado [N, H, W] (float em [0, 1] ou uint8)
+
+        Returns:
+            (variância [N], brilho médio [N], intensidade máxima [N])
+        """
+        images = np.asarray(images)
+        if len(images) == 0:
+            empty = np.zeros(0)
+            return empty, empty, empty
+
+        flat = images.reshape(len(images), -1)
+        scale = cls._pixel_scale(flat)
+
+        mean_brightness = flat.mean(axis=1, dtype=np.float64) * scale
+        variance = flat.var(axis=1, dtype=np.float64) * (scale * scale)
+        max_intensity = flat.max(axis=1) * scale
+        return variance, mean_brightness, max_intensity
+
+    @staticmethod
+    def _feature_dict(variance, mean_brightness, max_intensity):
+        """Dict de features com arrays [N] arredondados"""
+        return {
+            'variance': np.round(variance, 4),
+            'mean_brightness': np.round(mean_brightness, 4),
+            'max_intensity': np.round(max_intensity, 4)
+        }
+
+    def predict_batch(self, images):
+        """
+        Prediz classes de um lote de imagens em uma única passada vetorizada
+
+        Args:
+            images: Array numpy empilhado [N, H, W] (float em [0, 1] ou uint8)
+
+        Returns:
+            (classes [N], confianças [N], dict de features com arrays [N])
+        """
+        variance, mean_brightness, max_intensity = self.batch_features(images)
+
+        class_idx, confidences = self.score(variance, mean_brightness)
+        classes = np.array(self.classes)[class_idx]
+
+        return classes, confidences, self._feature_dict(variance, mean_brightness, max_intensity)
+
+
+def load_classifier(backend='mock', weights=None):
+    """
+    Cria o classificador de um backend
+
+    Args:
+        backend: 'mock' (heurística de variância) ou 'cnn' (cnn.NumpyCNN)
+        weights: Arquivo .npz de pesos (obrigatório para 'cnn')
+
+    Returns:
+        Classificador com predict/get_features/predict_batch
+    """
+    if backend == 'mock':
+        return MockClassifier()
+    if backend == 'cnn':
+        if weights is None:
+            raise ValueError("O backend 'cnn' precisa de um arquivo de pesos (.npz)")
+        from cnn import NumpyCNN
+        return NumpyCNN(weights)
+    raise ValueError(f"Backend desconhecido: {backend}")
@@ -0,0 +1,164 @@
+"""Classificação de mosaicos grandes em janelas deslizantes (memória limitada)"""
+import os
+
+import numpy as np
+
+
+def open_mosaic(path, shape=None, max_pixels=None):
+    """
+    Abre um mosaico para leitura em faixas
+
+    Só .npy e binário cru são lidos em faixas. Os demais formatos passam
+    pelo PIL, que não decodifica faixas de PNG/TIFF/JPEG comprimidos: a
+    imagem inteira vai para a memória (tons de cinza, 1 byte/pixel), então
+    eles são recusados acima de max_pixels. Para mosaicos maiores,
+    converta antes para .npy.
+
+    Args:
+        path: .npy 2D (memory-mapped), binário cru uint8 (com shape) ou
+            qualquer formato do PIL (decodificado inteiro)
+        shape: (altura, largura) de um arquivo binário cru
+        max_pixels: Máximo de pixels de um mosaico decodificado pelo PIL
+            (None = limite anti-"decompression bomb" do PIL,
+            Image.MAX_IMAGE_PIXELS); o limite global não é alterado
+
+    Returns:
+        Array 2D (memmap quando possível); uint8 ou float em [0, 1]
+    """
+    if shape is not None:
+        return np.memmap(path, dtype=np.uint8, mode='r', shape=tuple(shape))
+
+    if path.endswith('.npy'):
+        mosaic = np.load(path, mmap_mode='r')
+        if mosaic.ndim != 2:
+            raise ValueError(f"Mosaico deve ser 2D, recebido shape {mosaic.shape}")
+        return mosaic
+
+    from PIL import Image
+
+    limit = Image.MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+
+    # A verificação do PIL só acontece no open(); ela é trocada pela de `limit`
+    # apenas enquanto o cabeçalho é lido e a decodificação já roda com o limite restaurado
+    saved = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        img = Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = saved
+
+    with img:
+        width, height = img.size
+        if limit is not None and width * height > limit:
+            raise ValueError(
+                f"Mosaico {width}x{height} passa de {limit} pixels e seria decodificado inteiro; "
+                f"converta para .npy (lido em faixas) ou aumente o limite (--mosaic-max-pixels)"
+            )
+        return np.asarray(img.convert('L'))
+
+
+def window_positions(length, tile, stride):
+    """Inícios das janelas ao longo de um eixo (a última encosta na borda)"""
+    if length < tile:
+        raise ValueError(f"Mosaico menor que a janela ({length} < {tile})")
+    positions = list(range(0, length - tile + 1, stride))
+    if positions[-1] != length - tile:
+        positions.append(length - tile)
+    return positions
+
+
+def window_moments(strip, tile, xs):
+    """
+    Média e desvio padrão de cada janela tile x tile de uma faixa
+
+    Somas acumuladas das colunas dão as somas de todas as janelas em O(W),
+    sem materializar nenhuma janela.
+
+    Returns:
+        (médias, desvios) das janelas que começam em xs
+    """
+    columns = strip.sum(axis=0, dtype=np.float64)
+    columns_sq = np.einsum('ij,ij->j', strip, strip, dtype=np.float64)
+
+    cumulative = np.concatenate(([0.0], np.cumsum(columns)))
+    cumulative_sq = np.concatenate(([0.0], np.cumsum(columns_sq)))
+
+    xs = np.asarray(xs)
+    n = tile * tile
+    mean = (cumulative[xs + tile] - cumulative[xs]) / n
+    var = (cumulative_sq[xs + tile] - cumulative_sq[xs]) / n - mean ** 2
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+def classify_mosaic(orchestrator, mosaic, tile=128, stride=64, batch_size=256,
+                    empty_threshold=0.05, name='mosaic', keep_log=False):
+    """
+    Classifica um mosaico em janelas deslizantes
+
+    O mosaico é lido em faixas de `tile` linhas; só as janelas não vazias
+    de cada faixa são copiadas, e são classificadas em lotes pelo
+    pipeline completo dos agentes (classify_batch). A memória fica
+    limitada a algumas faixas mais o lote, qualquer que seja o tamanho do
+    mosaico.
+
+    Args:
+        orchestrator: GalaxyClassificationOrchestrator
+        mosaic: Array 2D (ver open_mosaic)
+        tile: Lado das janelas em pixels
+        stride: Passo entre janelas
+        batch_size: Janelas por chamada de classify_batch
+        empty_threshold: Janelas com média + 3 desvios abaixo disso (em
+            [0, 1]) são céu vazio e não são classificadas
+        name: Prefixo do image_path de cada janela
+        keep_log: Manter o conversation_log em cada resultado
+
+    Yields:
+        Dict de resultado por janela classificada, com 'x', 'y' e 'quality'
+        (ordem: linha a linha, da esquerda para a direita)
+    """
+    height, width = mosaic.shape
+    scale = 255.0 if mosaic.dtype == np.uint8 else 1.0
+    xs = window_positions(width, tile, stride)
+
+    batch = []
+    for y in window_positions(height, tile, stride):
+        strip = np.array(mosaic[y:y + tile])  # Única leitura do disco para esta faixa
+
+        # Céu vazio descartado antes de qualquer análise por janela
+        mean, std = window_moments(strip, tile, xs)
+        occupied = (mean + 3 * std) / scale >= empty_threshold
+
+        for x in np.asarray(xs)[occupied]:
+            batch.append((x, y, strip[:, x:x + tile]))
+
+            if len(batch) >= batch_size:
+                yield from _classify_windows(orchestrator, batch, name, keep_log)
+                batch = []
+
+    if batch:
+        yield from _classify_windows(orchestrator, batch, name, keep_log)
+
+
+def _classify_windows(orchestrator, batch, name, keep_log):
+    """Classifica um lote de janelas e anota coordenadas e qualidade"""
+    items = [(f"{name}@{x},{y}", np.ascontiguousarray(window)) for x, y, window in batch]
+    results = orchestrator.classify_batch(items)
+
+    for (x, y, _), result in zip(batch, results):
+        result['x'] = int(x)
+        result['y'] = int(y)
+        log = result['conversation_log'] if keep_log else result.pop('conversation_log', None)
+        if log and log[0].get('kind') == 'quality':
+            result['quality'] = log[0]['data']['quality']
+        yield result
+
+
+def count_windows(mosaic, tile=128, stride=64):
+    """Total de janelas (classificadas ou não) do mosaico"""
+    height, width = mosaic.shape
+    return len(window_positions(height, tile, stride)) * len(window_positions(width, tile, stride))
+
+
+def mosaic_name(path):
+    """Nome curto do mosaico para os image_path das janelas"""
+    return os.path.splitext(os.path.basename(path))[0]
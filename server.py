@@ -0,0 +1,275 @@
+"""Modo serve: orchestrator residente com micro-lotes via HTTP (TCP ou socket Unix)"""
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from cache import _to_builtin
+from metrics import Metrics
+from utils import load_image
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em micro-lotes para classify_batch
+
+    Uma thread consome a fila: o lote fecha ao atingir max_batch_size ou
+    quando max_wait_ms se passam desde a chegada da primeira requisição,
+    então uma requisição isolada espera no máximo max_wait_ms a mais.
+    """
+
+    def __init__(self, orchestrator, max_batch_size=32, max_wait_ms=5.0):
+        self.orchestrator = orchestrator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, image_path, image_tensor=None):
+        """
+        Enfileira uma imagem
+
+        Returns:
+            concurrent.futures.Future com o dict de resultado
+        """
+        future = Future()
+        self._queue.put((image_path, image_tensor, future, time.perf_counter()))
+        return future
+
+    def close(self):
+        """Processa o que já está na fila e encerra a thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch):
+        """Classifica um lote e entrega cada resultado ao seu future"""
+        started = time.perf_counter()
+        self.batches += 1
+        self.batched_requests += len(batch)
+
+        try:
+            results = self.orchestrator.classify_batch([(path, tensor) for path, tensor, _, _ in batch])
+        except Exception as exc:
+            for _, _, future, _ in batch:
+                future.set_exception(exc)
+            return
+
+        metrics = self.orchestrator.metrics
+        for (_, _, future, enqueued), result in zip(batch, results):
+            if 'timings' in result:
+                result['timings']['queue'] = round((started - enqueued) * 1000, 4)
+                if metrics is not None:
+                    metrics.observe_latency('queue', started - enqueued)
+            result['batch_size'] = len(batch)
+            future.set_result(result)
+
+
+class ClassificationHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /classify   corpo JSON {"path": ...} ou {"paths": [...]}, ou
+                         bytes de uma imagem (Content-Type image/*)
+        GET  /metrics    métricas no formato Prometheus (?format=json para JSON)
+        GET  /health     estado do servidor e dos micro-lotes
+
+    Query ?log=1 inclui o conversation_log em cada resultado.
+    """
+
+    protocol_version = 'HTTP/1.1'  # Conexões keep-alive para clientes de alta vazão
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        metrics = self.server.metrics
+
+        if url.path == '/health':
+            batcher = self.server.batcher
+            self._send_json(200, {
+                'status': 'ok',
+                'batches': batcher.batches,
+                'requests': batcher.batched_requests,
+                'max_batch_size': batcher.max_batch_size,
+                'max_wait_ms': batcher.max_wait * 1000
+            })
+        elif url.path == '/metrics':
+            if parse_qs(url.query).get('format') == ['json']:
+                self._send_json(200, metrics.snapshot())
+            else:
+                self._send(200, metrics.to_prometheus().encode(), 'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': f'Endpoint não encontrado: {url.path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/classify':
+            self._send_json(404, {'error': f'Endpoint não encontrado: {url.path}'})
+            return
+
+        started = time.perf_counter()
+        length = self.headers.get('Content-Length', '0')
+        content_type = self.headers.get('Content-Type', '')
+
+        try:
+            if not length.strip().isdigit():
+                # Corpo de tamanho desconhecido: a conexão não pode ser reaproveitada
+                self.close_connection = True
+                raise ValueError(f"Content-Length inválido: {length!r}")
+            body = self.rfile.read(int(length))
+
+            if content_type.startswith('image/'):
+                # Decodificação na thread da requisição: em paralelo com o lote em andamento
+                requests = [(self.headers.get('X-Image-Name', 'upload'),
+                             load_image(io.BytesIO(body), dtype=np.uint8))]
+                single = True
+            else:
+                payload = json.loads(body or b'{}')
+                if not isinstance(payload, dict):
+                    raise TypeError("o corpo JSON deve ser um objeto")
+                single = 'paths' not in payload
+                paths = [payload['path']] if single else payload['paths']
+                if single and not isinstance(paths[0], str):
+                    raise TypeError("'path' deve ser uma string")
+                if not single and not (isinstance(paths, list)
+                                       and all(isinstance(path, str) for path in paths)):
+                    raise TypeError("'paths' deve ser uma lista de strings")
+                requests = [(path, None) for path in paths]
+        except (ValueError, KeyError, TypeError, OSError) as exc:
+            self._send_json(400, {'error': f'Requisição inválida: {exc}'})
+            return
+
+        futures = [self.server.batcher.submit(path, tensor) for path, tensor in requests]
+        try:
+            results = [future.result() for future in futures]
+        except Exception as exc:
+            self._send_json(500, {'error': str(exc)})
+            return
+
+        keep_log = parse_qs(url.query).get('log') == ['1']
+        latency = time.perf_counter() - started
+        latency_ms = round(latency * 1000, 4)
+        self.server.metrics.observe_latency('request', latency)
+        for result in results:
+            if not keep_log:
+                result.pop('conversation_log', None)
+            result['latency_ms'] = latency_ms
+
+        self._send_json(200, results[0] if single else {'results': results, 'latency_ms': latency_ms})
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, default=_to_builtin).encode(), 'application/json')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clientes de socket Unix não têm endereço (client_address vazio)
+        return self.client_address[0] if self.client_address else self.server.server_address
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    """Servidor HTTP em TCP, uma thread por conexão"""
+
+    request_queue_size = 128  # Backlog de listen(): rajadas de clientes concorrentes
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor HTTP em socket Unix, uma thread por conexão"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(orchestrator, host='127.0.0.1', port=8765, socket_path=None,
+                  max_batch_size=32, max_wait_ms=5.0, verbose=False):
+    """
+    Cria o servidor HTTP com micro-lotes
+
+    Args:
+        orchestrator: GalaxyClassificationOrchestrator residente (recebe
+            um Metrics, exposto em /metrics, se ainda não tiver)
+        host, port: Endereço TCP (ignorados se socket_path for informado)
+        socket_path: Caminho de um socket Unix (opcional)
+        max_batch_size: Máximo de imagens por micro-lote
+        max_wait_ms: Espera máxima para completar um micro-lote
+        verbose: Registrar cada requisição no stderr
+
+    Returns:
+        Servidor pronto para serve_forever() (server.batcher é o MicroBatcher)
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, ClassificationHandler)
+    else:
+        server = TCPHTTPServer((host, port), ClassificationHandler)
+
+    if orchestrator.metrics is None:
+        orchestrator.metrics = Metrics()
+
+    server.batcher = MicroBatcher(orchestrator, max_batch_size, max_wait_ms)
+    server.metrics = orchestrator.metrics
+    server.verbose = verbose
+    return server
+
+
+def serve(orchestrator, host='127.0.0.1', port=8765, socket_path=None,
+          max_batch_size=32, max_wait_ms=5.0, verbose=False):
+    """Executa o servidor até Ctrl+C"""
+    server = create_server(orchestrator, host, port, socket_path, max_batch_size, max_wait_ms, verbose)
+    address = socket_path or f"http://{host}:{server.server_address[1]}"
+    print(f"🚀 Servidor de classificação em {address} "
+          f"(lote máx. {max_batch_size}, espera máx. {max_wait_ms} ms)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Encerrando servidor...")
+    finally:
+        server.server_close()
+        server.batcher.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,205 @@
+"""Shards empacotados de imagens: memmap .npy uint8 [N, 128, 128] + índice JSON"""
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from utils import load_images
+
+
+INDEX_FORMAT = 1
+
+
+def _shard_files(path):
+    """Retorna (arquivo .npy, arquivo de índice) de um shard"""
+    base = path[:-4] if path.endswith('.npy') else path
+    return base + '.npy', base + '.index.json'
+
+
+def label_from_name(name):
+    """Infere o rótulo pelo prefixo do nome (spiral_00 -> spiral)"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return stem.rsplit('_', 1)[0] if '_' in stem else ''
+
+
+class ShardWriter:
+    """
+    Escreve imagens uint8 direto em um memmap .npy pré-alocado
+
+    Se menos de `capacity` imagens forem adicionadas, o arquivo é truncado
+    no close(). O índice (nomes, rótulos e offsets em bytes de cada imagem
+    dentro do .npy) é gravado ao lado do arquivo de dados.
+    """
+
+    def __init__(self, path, capacity, size=128):
+        self.npy_path, self.index_path = _shard_files(path)
+        self.size = size
+        self.count = 0
+        self.names = []
+        self.labels = []
+
+        os.makedirs(os.path.dirname(self.npy_path) or '.', exist_ok=True)
+        self.images = np.lib.format.open_memmap(
+            self.npy_path, mode='w+', dtype=np.uint8, shape=(capacity, size, size)
+        )
+        self.data_offset = self.images.offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def reserve(self, n):
+        """
+        Reserva as próximas n posições e retorna a fatia do memmap para
+        escrita direta (ex.: out= de load_images)
+        """
+        if self.count + n > len(self.images):
+            raise ValueError(f"Shard cheio: capacidade {len(self.images)}")
+        block = self.images[self.count:self.count + n]
+        self.count += n
+        return block
+
+    def add(self, name, image, label=''):
+        """Adiciona uma imagem uint8 [size, size]"""
+        self.reserve(1)[0] = image
+        self.names.append(name)
+        self.labels.append(label)
+
+    def close(self):
+        """Grava os dados, ajusta o tamanho do arquivo e escreve o índice"""
+        if self.images is None:
+            return
+
+        self.images.flush()
+        capacity = len(self.images)
+        self.images = None
+
+        if self.count < capacity:
+            self._truncate()
+
+        image_bytes = self.size * self.size
+        index = {
+            'format': INDEX_FORMAT,
+            'shape': [self.count, self.size, self.size],
+            'dtype': 'uint8',
+            'data_offset': self.data_offset,
+            'names': self.names,
+            'labels': self.labels,
+            'offsets': [self.data_offset + i * image_bytes for i in range(self.count)]
+        }
+        with open(self.index_path, 'w') as f:
+            json.dump(index, f)
+
+    def _truncate(self):
+        """Reescreve o cabeçalho .npy com o número real de imagens e corta o excesso"""
+        header = {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+            'fortran_order': False,
+            'shape': (self.count, self.size, self.size)
+        }
+        with open(self.npy_path, 'r+b') as f:
+            np.lib.format.write_array_header_1_0(f, header)
+            # O numpy reserva espaço no cabeçalho para o shape crescer, então o offset não muda
+            if f.tell() != self.data_offset:
+                raise RuntimeError("Cabeçalho .npy mudou de tamanho ao truncar o shard")
+            f.truncate(self.data_offset + self.count * self.size * self.size)
+
+
+class ShardReader:
+    """
+    Lê um shard via memmap: as imagens são views do arquivo, sem cópia
+    """
+
+    def __init__(self, path):
+        self.npy_path, self.index_path = _shard_files(path)
+
+        with open(self.index_path) as f:
+            index = json.load(f)
+
+        self.images = np.load(self.npy_path, mmap_mode='r')
+        self.names = index['names']
+        self.labels = index['labels']
+        self.offsets = index['offsets']
+
+        if len(self.names) != len(self.images):
+            raise ValueError(f"Índice inconsistente com os dados: {self.index_path}")
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        """Retorna (nome, rótulo, imagem uint8 [128, 128] como view do memmap)"""
+        return self.names[i], self.labels[i], self.images[i]
+
+    def iter_batches(self, batch_size=1024, start=0, stop=None):
+        """
+        Percorre o shard em lotes contíguos
+
+        Yields:
+            (nomes, rótulos, imagens [B, 128, 128] como view do memmap)
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop, batch_size):
+            j = min(i + batch_size, stop)
+            yield self.names[i:j], self.labels[i:j], self.images[i:j]
+
+
+def pack_png_directory(directory, path, pattern='*.png', batch_size=1024, workers=None):
+    """
+    Converte um diretório de PNGs em um shard empacotado
+
+    Args:
+        directory: Diretório com as imagens
+        path: Caminho base do shard (gera .npy e .index.json)
+        pattern: Padrão glob das imagens
+        batch_size: Imagens decodificadas por lote (memória limitada)
+        workers: Threads de decodificação
+
+    Returns:
+        (número de imagens gravadas, dict {caminho: erro} dos arquivos ignorados)
+    """
+    image_paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    skipped = {}
+
+    with ShardWriter(path, len(image_paths)) as writer:
+        buffer = np.empty((batch_size, 128, 128), dtype=np.uint8)
+
+        for i in range(0, len(image_paths), batch_size):
+            batch = image_paths[i:i + batch_size]
+            # Mesmo resize de load_image (fast=False) para resultados idênticos aos PNGs
+            images, errors = load_images(batch, workers=workers, fast=False, out=buffer[:len(batch)])
+
+            for j, image_path in enumerate(batch):
+                if j in errors:
+                    skipped[image_path] = errors[j]
+                    continue
+                name = os.path.basename(image_path)
+                writer.add(name, images[j], label_from_name(name))
+
+        count = writer.count
+
+    return count, skipped
+
+
+def main():
+    """Converte diretório de PNGs em shard"""
+    parser = argparse.ArgumentParser(description='Empacota imagens PNG em shard memmap')
+    parser.add_argument('directory', type=str, help='Diretório com as imagens')
+    parser.add_argument('output', type=str, help='Caminho base do shard (ex: data/shards/samples)')
+    parser.add_argument('--glob', type=str, default='*.png', help='Padrão das imagens')
+    parser.add_argument('--workers', type=int, default=None, help='Threads de decodificação')
+    args = parser.parse_args()
+
+    count, skipped = pack_png_directory(args.directory, args.output, args.glob, workers=args.workers)
+
+    for image_path, error in skipped.items():
+        print(f"⚠️  Ignorada: {image_path} ({error})")
+    print(f"✓ Shard criado: {count} imagens em {_shard_files(args.output)[0]}")
+
+
+if __name__ == "__main__":
+    main()
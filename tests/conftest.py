@@ -0,0 +1,44 @@
+"""Fixtures compartilhadas: corpus sintético que passa por todos os ramos do pipeline"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Módulos planos na raiz do repositório (ver agents/__init__.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_dataset import generate_dataset  # noqa: E402
+
+
+def corpus_images(seed=0):
+    """
+    Imagens uint8 128x128 com brilho e contraste variados
+
+    Ruído gaussiano em uma grade de médias/desvios (pré-processamento,
+    reprocessamento em 2 iterações) e imagens constantes (elliptical após
+    3 iterações).
+
+    Returns:
+        Lista de (nome, imagem uint8)
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for mean in (0.1, 0.25, 0.5, 0.85):
+        for std in (0.03, 0.11, 0.2):
+            pixels = np.clip(rng.normal(mean, std, (128, 128)), 0, 1)
+            images.append((f'noise_{mean}_{std}', (pixels * 255).astype(np.uint8)))
+    for level in (0, 90, 250):
+        images.append((f'flat_{level}', np.full((128, 128), level, dtype=np.uint8)))
+    return images
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """Caminhos de PNGs: galáxias sintéticas (metade escurecidas) + corpus_images()"""
+    directory = tmp_path_factory.mktemp('corpus')
+    generate_dataset(str(directory), count=12, seed=0, dark_fraction=0.5)
+    for name, image in corpus_images():
+        Image.fromarray(image, mode='L').save(directory / f'{name}.png')
+    return sorted(str(path) for path in directory.glob('*.png'))
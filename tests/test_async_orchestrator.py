@@ -0,0 +1,46 @@
+"""Orchestrator assíncrono: mesmos resultados do síncrono e falhas isoladas por imagem"""
+import asyncio
+
+from agents.async_orchestrator import AsyncGalaxyClassificationOrchestrator
+from agents.orchestrator import GalaxyClassificationOrchestrator
+
+
+FIELDS = ('classification', 'confidence', 'preprocessed', 'iterations')
+
+
+async def collect(paths, **options):
+    async with AsyncGalaxyClassificationOrchestrator(**options) as orchestrator:
+        return [result async for result in orchestrator.classify_many(paths)]
+
+
+def test_classify_many_matches_sync(corpus):
+    serial = GalaxyClassificationOrchestrator(verbose=False)
+    results = asyncio.run(collect(corpus, max_in_flight=4))
+
+    assert [result['image_path'] for result in results] == corpus
+    for path, result in zip(corpus, results):
+        expected = serial.classify_galaxy(path)
+        assert {field: result[field] for field in FIELDS} == {field: expected[field] for field in FIELDS}
+
+
+def test_failing_image_yields_error_result(corpus, tmp_path):
+    missing = str(tmp_path / 'missing.png')
+    paths = [corpus[0], missing, corpus[1]] * 3
+    results = asyncio.run(collect(paths, max_in_flight=2))
+
+    assert [result['image_path'] for result in results] == paths
+    assert [result['success'] for result in results] == [path != missing for path in paths]
+
+
+def test_early_exit_leaves_no_pending_tasks(corpus):
+    async def consume_one():
+        async with AsyncGalaxyClassificationOrchestrator(max_in_flight=2) as orchestrator:
+            tasks_before = len(asyncio.all_tasks())
+            results = orchestrator.classify_many(corpus * 4)
+            async for _ in results:
+                break
+            await results.aclose()
+            return tasks_before, len(asyncio.all_tasks())
+
+    before, after = asyncio.run(consume_one())
+    assert after == before
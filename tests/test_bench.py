@@ -0,0 +1,31 @@
+"""Benchmark: detecção de regressões contra um resultado de referência"""
+from bench import BENCH_FORMAT, compare
+
+
+def report(p50_us, wall_ms, rate, format=BENCH_FORMAT):
+    return {
+        'format': format,
+        'stages': {'classify_galaxy': {'p50_us': p50_us}},
+        'startup': {'help': {'wall_ms': wall_ms}},
+        'batch_throughput': {'64': rate}
+    }
+
+
+def test_compare_flags_only_changes_beyond_tolerance():
+    baseline = report(100.0, 50.0, 1000.0)
+
+    assert compare(report(109.0, 54.0, 910.0), baseline, tolerance=0.10) == []
+    regressions = compare(report(120.0, 60.0, 800.0), baseline, tolerance=0.10)
+    assert [name for name, *_ in regressions] == [
+        'stages.classify_galaxy.p50_us', 'startup.help.wall_ms', 'batch_throughput.64'
+    ]
+    assert regressions[2][3] < 0  # Vazão: queda relatada como variação negativa
+
+    # Melhorias nunca são regressão
+    assert compare(report(50.0, 10.0, 5000.0), baseline) == []
+
+
+def test_compare_skips_stages_of_other_formats():
+    baseline = report(100.0, 50.0, 1000.0, format=BENCH_FORMAT - 1)
+    regressions = compare(report(200.0, 50.0, 1000.0), baseline)
+    assert regressions == []
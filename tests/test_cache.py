@@ -0,0 +1,81 @@
+"""ResultCache: chave pelo conteúdo do arquivo e configuração, remoção LRU"""
+import os
+import shutil
+
+import numpy as np
+from PIL import Image
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from cache import ResultCache
+
+
+def classify(cache, path, **options):
+    orchestrator = GalaxyClassificationOrchestrator(cache=cache, verbose=False, **options)
+    return orchestrator.classify_galaxy(path)
+
+
+def test_entry_follows_file_content(corpus, tmp_path):
+    path = str(tmp_path / 'galaxy.png')
+    shutil.copy(corpus[0], path)
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+
+    assert classify(cache, path)['cached'] is False
+    assert classify(cache, path)['cached'] is True
+
+    # Mesmos bytes com mtime novo: a chave é o conteúdo, o resultado continua válido
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime + 60, stat.st_mtime + 60))
+    assert classify(cache, path)['cached'] is True
+
+    # Tamanho diferente
+    shutil.copy(corpus[-1], path)
+    assert os.path.getsize(path) != os.path.getsize(corpus[0])
+    assert classify(cache, path)['cached'] is False
+
+    # Mesmo tamanho, pixels diferentes (PNG sem compressão: tamanho fixo por imagem)
+    image = np.zeros((128, 128), dtype=np.uint8)
+    Image.fromarray(image).save(path, compress_level=0)
+    size = os.path.getsize(path)
+    assert classify(cache, path)['cached'] is False
+    image[0, 0] = 255
+    Image.fromarray(image).save(path, compress_level=0)
+    assert os.path.getsize(path) == size
+    assert classify(cache, path)['cached'] is False
+    assert classify(cache, path)['cached'] is True
+
+
+def test_config_change_misses(corpus, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+    classify(cache, corpus[0])
+
+    orchestrator = GalaxyClassificationOrchestrator(cache=cache, verbose=False)
+    orchestrator.agent_b.confidence_threshold = 0.9
+    assert orchestrator.classify_galaxy(corpus[0])['cached'] is False
+    assert classify(cache, corpus[0], speculative=True)['cached'] is False
+    assert classify(cache, corpus[0], dtype=np.float32)['cached'] is False
+    assert classify(cache, corpus[0])['cached'] is True
+
+
+def test_cached_result_matches_fresh(corpus, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+    for path in corpus:
+        fresh = classify(cache, path)
+        cached = classify(cache, path)
+        for field in ('classification', 'confidence', 'preprocessed', 'iterations'):
+            assert cached[field] == fresh[field]
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.db'), max_entries=10)
+    for i in range(10):
+        cache.put(f'key{i}', 'config', {'value': i})
+
+    assert cache.get('key0') == {'value': 0}  # Passa a ser o mais recente
+    cache.put('key10', 'config', {'value': 10})
+
+    # Acima do máximo: fica com 90% (9 entradas), removendo as menos usadas
+    assert cache.stats()['entries'] == 9
+    assert cache.get('key0') == {'value': 0}
+    assert cache.get('key10') == {'value': 10}
+    assert cache.get('key1') is None and cache.get('key2') is None
+    assert all(cache.get(f'key{i}') == {'value': i} for i in range(3, 10))
@@ -0,0 +1,88 @@
+"""Backend CNN: lote igual à predição por imagem e camadas iguais a uma convolução de referência"""
+import numpy as np
+import pytest
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from cnn import NumpyCNN, fit_head, init_weights
+from model import MockClassifier
+from utils import load_image
+
+
+@pytest.fixture(scope='module')
+def images(corpus):
+    return np.stack([load_image(path, dtype=np.uint8) for path in corpus])
+
+
+@pytest.fixture(scope='module')
+def weights_path(images, tmp_path_factory):
+    """Filtros aleatórios com bias não nulo; camada densa ajustada aos rótulos do MockClassifier"""
+    rng = np.random.default_rng(1)
+    weights = init_weights(seed=1)
+    for name in list(weights):
+        if name.startswith('conv') and name.endswith('_b'):
+            weights[name] = rng.normal(0, 0.1, weights[name].shape).astype(np.float32)
+    mock = MockClassifier()
+    labels = np.array([mock.classes.index(mock.predict(image)[0]) for image in images])
+    fit_head(weights, images, labels)
+
+    path = str(tmp_path_factory.mktemp('cnn') / 'weights.npz')
+    np.savez(path, **weights)
+    return path
+
+
+def reference_embed(weights_path, image):
+    """Convolução 'same' direta em float64, bias, ReLU e max-pool 2x2, na ordem do livro"""
+    with np.load(weights_path) as weights:
+        x = image[None].astype(np.float64) / 255.0  # [C, H, W]
+        i = 0
+        while f'conv{i}_w' in weights:
+            kernel, bias = weights[f'conv{i}_w'].astype(np.float64), weights[f'conv{i}_b']
+            k = kernel.shape[2]
+            padded = np.pad(x, ((0, 0), (k // 2, k // 2), (k // 2, k // 2)))
+            height, width = x.shape[1:]
+            conv = np.zeros((kernel.shape[0], height, width))
+            for dy in range(k):
+                for dx in range(k):
+                    conv += np.einsum('oc,chw->ohw', kernel[:, :, dy, dx],
+                                      padded[:, dy:dy + height, dx:dx + width])
+            activation = np.maximum(conv + bias[:, None, None], 0)
+            h, w = height // 2, width // 2
+            x = activation[:, :2 * h, :2 * w].reshape(-1, h, 2, w, 2).max(axis=(2, 4))
+            i += 1
+    return x.mean(axis=(1, 2))
+
+
+def test_pool_before_bias_matches_reference(weights_path, images):
+    cnn = NumpyCNN(weights_path)
+    embedded = cnn.embed(images[:4])
+    for image, features in zip(images[:4], embedded):
+        np.testing.assert_allclose(features, reference_embed(weights_path, image), rtol=1e-4, atol=1e-5)
+
+
+def test_predict_batch_matches_predict(weights_path, images):
+    cnn = NumpyCNN(weights_path, max_batch_size=4)  # Lote em várias fatias
+    classes, confidences, features = cnn.predict_batch(images)
+    probabilities = cnn.predict_proba(images)
+
+    assert len(set(classes)) == 2
+    for i, image in enumerate(images):
+        np.testing.assert_allclose(probabilities[i], cnn.predict_proba(image[None])[0], rtol=0, atol=1e-6)
+        pred_class, confidence = cnn.predict(image)
+        assert classes[i] == pred_class
+        assert confidences[i] == pytest.approx(confidence, abs=0.01)
+        assert {name: values[i] for name, values in features.items()} == cnn.get_features(image)
+
+    classes, confidences, _ = cnn.predict_batch(images[:0])
+    assert len(classes) == len(confidences) == 0
+
+
+def test_cascade_is_disabled(weights_path, corpus):
+    cnn = NumpyCNN(weights_path)
+    full = GalaxyClassificationOrchestrator(verbose=False, classifier=cnn)
+    cascade = GalaxyClassificationOrchestrator(verbose=False, classifier=cnn, cascade=True)
+
+    for path in corpus:
+        expected, result = full.classify_galaxy(path), cascade.classify_galaxy(path)
+        assert 'early_exit' not in result
+        for field in ('classification', 'confidence', 'preprocessed', 'iterations'):
+            assert result[field] == expected[field]
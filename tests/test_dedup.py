@@ -0,0 +1,65 @@
+"""Quase-duplicatas: dHash, busca por distância de Hamming e reaproveitamento no orchestrator"""
+import random
+
+import numpy as np
+from PIL import Image
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from dedup import DedupIndex, MultiIndexHash, dhash
+from utils import load_image
+
+
+def test_dhash_tolerates_noise_and_brightness(corpus):
+    image = load_image(corpus[0], dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    noisy = np.clip(image + rng.normal(0, 2, image.shape), 0, 255).astype(np.uint8)
+    brighter = np.clip(image.astype(np.int16) + 10, 0, 255).astype(np.uint8)
+
+    reference = dhash(image)
+    assert (reference ^ dhash(noisy)).bit_count() <= 4
+    assert (reference ^ dhash(brighter)).bit_count() <= 4
+    assert (reference ^ dhash(np.fliplr(image))).bit_count() > 4
+
+
+def test_multi_index_matches_linear_scan():
+    rng = random.Random(0)
+    index = MultiIndexHash(max_distance=4)
+    items = [rng.getrandbits(64) for _ in range(500)]
+    for i, item in enumerate(items):
+        index.add(item, i)
+
+    for _ in range(300):
+        query = rng.choice(items)
+        for bit in rng.sample(range(64), rng.randint(0, 6)):
+            query ^= 1 << bit
+
+        distances = [(item ^ query).bit_count() for item in items]
+        best = min(distances)
+        match = index.nearest(query)
+        if best > 4:
+            assert match is None
+        else:
+            assert match is not None and match[0] == best
+
+
+def test_near_duplicate_reuses_result(corpus, tmp_path):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    orchestrator.dedup = DedupIndex(str(tmp_path / 'dedup.db'), orchestrator.get_config())
+
+    original = orchestrator.classify_galaxy(corpus[0])
+    assert 'duplicate_of' not in original
+
+    image = load_image(corpus[0], dtype=np.uint8).copy()
+    image[0, :4] ^= 1  # Poucos pixels: mesmo dHash
+    copy_path = str(tmp_path / 'copy.png')
+    Image.fromarray(image).save(copy_path)
+
+    duplicate = orchestrator.classify_galaxy(copy_path)
+    assert duplicate['duplicate_of'] == corpus[0]
+    assert duplicate['hash_distance'] == 0
+    for field in ('classification', 'confidence', 'preprocessed', 'iterations'):
+        assert duplicate[field] == original[field]
+
+    # Outra configuração do pipeline não enxerga os hashes gravados
+    other = DedupIndex(str(tmp_path / 'dedup.db'), dict(orchestrator.get_config(), speculative=True))
+    assert other.lookup(dhash(image)) is None
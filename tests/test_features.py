@@ -0,0 +1,48 @@
+"""Store de features: extração, gravação junto com a classificação e re-score"""
+import numpy as np
+import pytest
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from features import FeatureStore, FeatureStoreWriter, build_store
+
+
+@pytest.fixture(scope='module')
+def store_path(corpus, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('store'))
+    config = GalaxyClassificationOrchestrator(verbose=False).get_config()
+    build_store(corpus, path, config=config)
+    return path
+
+
+def test_rescore_defaults_match_pipeline(corpus, store_path):
+    store = FeatureStore(store_path)
+    scores = store.rescore()
+    classes = ['spiral', 'elliptical']
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+
+    for i, path in enumerate(corpus):
+        result = orchestrator.classify_galaxy(path)
+        assert classes[scores['class_idx'][i]] == result['classification']
+        assert scores['confidence'][i] == result['confidence']
+        assert scores['preprocessed'][i] == result['preprocessed']
+        assert scores['iterations'][i] == result['iterations']
+
+
+def test_collected_features_match_extraction(corpus, store_path, tmp_path):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False, collect_features=True, cascade=True)
+    with FeatureStoreWriter(str(tmp_path), len(corpus), orchestrator.get_config()) as writer:
+        for path in corpus:
+            writer.add(path, orchestrator.classify_galaxy(path)['features'])
+
+    extracted, collected = FeatureStore(store_path), FeatureStore(str(tmp_path))
+    assert collected.paths == extracted.paths
+    for name, column in extracted.columns.items():
+        np.testing.assert_array_equal(collected.columns[name], column)
+    assert collected.config_warnings() == []  # A cascata dá os mesmos resultados
+
+
+def test_rescore_refuses_other_backends(store_path, tmp_path):
+    store = FeatureStore(store_path)
+    store.index['config']['classifier'] = {'backend': 'cnn', 'weights': 'abc'}
+    with pytest.raises(ValueError, match='cnn'):
+        store.rescore()
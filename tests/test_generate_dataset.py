@@ -0,0 +1,26 @@
+"""Dataset sintético: mesma semente, mesmas imagens com qualquer número de processos"""
+import numpy as np
+from PIL import Image
+
+from generate_dataset import generate_dataset
+
+
+def read_dataset(directory):
+    return {path.name: np.asarray(Image.open(path)) for path in sorted(directory.glob('*.png'))}
+
+
+def test_seed_is_deterministic_across_workers(tmp_path):
+    datasets = {}
+    for workers in (1, 3):
+        directory = tmp_path / f'workers_{workers}'
+        assert generate_dataset(str(directory), count=10, seed=7, workers=workers, dark_fraction=0.5) == 10
+        datasets[workers] = read_dataset(directory)
+
+    assert len(datasets[1]) == 10
+    assert datasets[3].keys() == datasets[1].keys()
+    for name, image in datasets[1].items():
+        np.testing.assert_array_equal(datasets[3][name], image)
+
+    generate_dataset(str(tmp_path / 'other'), count=10, seed=8, dark_fraction=0.5)
+    other = read_dataset(tmp_path / 'other')
+    assert any(not np.array_equal(other[name], image) for name, image in datasets[1].items())
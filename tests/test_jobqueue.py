@@ -0,0 +1,136 @@
+"""Fila compartilhada: leases, retomada de jobs de workers mortos e limite de tentativas"""
+import json
+import sys
+import threading
+import time
+
+import main
+from jobqueue import DONE, FAILED, LEASED, PENDING, JobQueue
+
+
+def ok(job_id, path):
+    return job_id, [{'success': True, 'image_path': path}]
+
+
+def test_expired_lease_is_reclaimed_exactly_once(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    queue = JobQueue(path)
+    queue.add_paths([f'img_{i}.png' for i in range(5)])
+
+    # Worker A pega tudo e "morre": lease já vencido
+    dead = queue.claim('A', 10, lease_seconds=-1)
+    assert len(dead) == 5
+    assert queue.stats()['expired'] == 5
+
+    # Vários workers disputam os jobs vencidos: cada um vai para exatamente um
+    claimed = {}
+    barrier = threading.Barrier(4)
+
+    def worker(owner):
+        own = JobQueue(path)
+        barrier.wait()
+        claimed[owner] = own.claim(owner, 10)
+        own.close()
+
+    threads = [threading.Thread(target=worker, args=(f'W{i}',)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [job[0] for jobs in claimed.values() for job in jobs]
+    assert sorted(ids) == sorted(job[0] for job in dead)
+    assert queue.claim('late', 10) == []  # Leases novos ainda valem
+
+    # Resultado do worker morto é descartado; o do novo dono vale
+    assert queue.complete('A', [ok(job_id, p) for job_id, p, _, _ in dead]) == []
+    for owner, jobs in claimed.items():
+        assert queue.renew(owner, [job[0] for job in jobs]) == len(jobs)
+        assert queue.complete(owner, [ok(job_id, p) for job_id, p, _, _ in jobs]) == [job[0] for job in jobs]
+
+    stats = queue.stats()
+    assert (stats[DONE], stats[LEASED], stats[PENDING]) == (5, 0, 0)
+    assert sorted(result['image_path'] for result in queue.results()) == [f'img_{i}.png' for i in range(5)]
+
+
+def test_lost_lease_cannot_be_renewed(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.db'))
+    queue.add_paths(['a.png'])
+    queue.claim('A', 1, lease_seconds=-1)
+    queue.claim('B', 1)
+
+    assert queue.renew('A', [1]) == 0
+    assert queue.renew('B', [1]) == 1
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    queue.add_paths(['crash.png'])
+
+    assert len(queue.claim('A', 1, lease_seconds=-1)) == 1
+    assert len(queue.claim('B', 1, lease_seconds=-1)) == 1  # Segunda tentativa do mesmo job
+    queue.add_paths(['fine.png'])
+    jobs = queue.claim('C', 10)
+
+    # crash.png derrubou 2 workers: falha em vez de voltar para a fila
+    assert [job[1] for job in jobs] == ['fine.png']
+    assert queue.stats()[FAILED] == 1
+    failed = [result for result in queue.results() if not result['success']]
+    assert failed[0]['image_path'] == 'crash.png'
+
+    assert queue.reset_failed() == 1
+    assert [job[1] for job in queue.claim('D', 10)] == ['crash.png']
+
+
+def test_add_is_idempotent(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.db'))
+    assert queue.add_paths(['a.png', 'b.png']) == 2
+    assert queue.add_paths(['b.png', 'c.png']) == 1
+    assert queue.stats()['total'] == 3
+
+
+def run_worker(monkeypatch, queue_path, output, run_job):
+    """Worker do main.py (--queue) com lease de 0.3 s e jobs executados por run_job"""
+    monkeypatch.setattr(main, '_run_job_in_worker', run_job)
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--queue', queue_path, '--lease', '0.3',
+                                      '--workers', '1', '--quiet', '--output', output])
+    main.main()
+    with open(output) as f:
+        return [json.loads(line)['image_path'] for line in f]
+
+
+def test_worker_renews_whole_batch(corpus, tmp_path, monkeypatch):
+    path = str(tmp_path / 'queue.db')
+    JobQueue(path).add_paths(corpus[:4])
+    thief = JobQueue(path)
+    stolen = []
+
+    def slow_job(job):
+        time.sleep(0.4)  # Mais que o lease: só a renovação segura os jobs do lote
+        stolen.extend(thief.claim('thief', 10))
+        return [main._classify_in_worker(job[1])]
+
+    emitted = run_worker(monkeypatch, path, str(tmp_path / 'out.jsonl'), slow_job)
+    assert stolen == []
+    assert emitted == corpus[:4]
+    assert thief.stats()[DONE] == 4
+
+
+def test_worker_drops_jobs_whose_lease_was_lost(corpus, tmp_path, monkeypatch):
+    path = str(tmp_path / 'queue.db')
+    JobQueue(path).add_paths(corpus[:4])
+    thief = JobQueue(path)
+    stolen = []
+
+    def job_lost_midway(job):
+        if job[1] == corpus[2]:
+            # Lease de um job já classificado do lote vence e outro worker o pega
+            thief._conn.execute("UPDATE jobs SET lease_expires = 0 WHERE path = ?", (corpus[0],))
+            stolen.extend(thief.claim('thief', 10))
+            thief.complete('thief', [ok(job_id, 'thief') for job_id, _, _, _ in stolen])
+        return [main._classify_in_worker(job[1])]
+
+    emitted = run_worker(monkeypatch, path, str(tmp_path / 'out.jsonl'), job_lost_midway)
+    assert [job[1] for job in stolen] == [corpus[0]]
+    assert emitted == corpus[1:4]  # O resultado descartado não vai para a saída
+    assert [result['image_path'] for result in thief.results()] == ['thief'] + corpus[1:4]
@@ -0,0 +1,109 @@
+"""Linha de comando: modos --dir e --watch, --quiet e --output"""
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import main
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['main.py', *argv])
+    main.main()
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def copy_images(paths, directory):
+    """Copia as imagens com mtime antigo (fora da janela de arquivos ainda em escrita)"""
+    os.makedirs(directory, exist_ok=True)
+    copies = []
+    for path in paths:
+        copy = os.path.join(directory, os.path.basename(path))
+        shutil.copy(path, copy)
+        os.utime(copy, (time.time() - 60, time.time() - 60))
+        copies.append(copy)
+    return copies
+
+
+def without_timings(results):
+    return [{key: value for key, value in result.items() if key != 'timings'} for result in results]
+
+
+def test_dir_workers_match_serial(corpus, tmp_path, monkeypatch):
+    directory = os.path.dirname(corpus[0])
+    outputs = {}
+    for workers in ('1', '2'):
+        outputs[workers] = str(tmp_path / f'workers_{workers}.jsonl')
+        run_main(monkeypatch, '--dir', directory, '--workers', workers, '--quiet', '--output', outputs[workers])
+
+    serial = read_jsonl(outputs['1'])
+    assert [result['image_path'] for result in serial] == corpus
+    assert without_timings(read_jsonl(outputs['2'])) == without_timings(serial)
+
+
+def test_quiet_prints_nothing(corpus, tmp_path, monkeypatch, capsys):
+    directory = os.path.dirname(corpus[0])
+    output = str(tmp_path / 'out.csv')
+    run_main(monkeypatch, '--dir', directory, '--workers', '1', '--quiet', '--output', output)
+    assert capsys.readouterr().out == ''
+
+    # --output - implica --quiet: stdout só com as linhas JSONL
+    run_main(monkeypatch, '--dir', directory, '--workers', '1', '--output', '-')
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)['image_path'] for line in lines] == corpus
+
+
+def test_watch_skips_unchanged_and_reprocesses_modified(corpus, tmp_path, monkeypatch):
+    directory = str(tmp_path / 'watch')
+    images = copy_images(corpus[:3], directory)
+
+    def scan(name):
+        output = str(tmp_path / name)
+        run_main(monkeypatch, '--watch', directory, '--once', '--workers', '1', '--quiet', '--output', output)
+        return [result['image_path'] for result in read_jsonl(output)]
+
+    assert scan('first.jsonl') == images
+    assert scan('unchanged.jsonl') == []
+
+    os.utime(images[0])  # Só o mtime muda: o hash confirma que não há o que reclassificar
+    assert scan('touched.jsonl') == []
+
+    Image.fromarray(np.full((128, 128), 40, dtype=np.uint8)).save(images[1])
+    os.utime(images[1], (time.time() - 30, time.time() - 30))
+    assert scan('modified.jsonl') == [images[1]]
+
+
+def test_watch_opens_orchestrator_once(corpus, tmp_path, monkeypatch):
+    directory = str(tmp_path / 'watch')
+    copy_images(corpus[:2], directory)
+    output = str(tmp_path / 'out.jsonl')
+
+    init_calls = []
+    init_worker = main._init_worker
+    monkeypatch.setattr(main, '_init_worker', lambda *args: init_calls.append(args) or init_worker(*args))
+
+    scans = []
+
+    def sleep(seconds):
+        # Entre varreduras: chega uma imagem nova; na terceira, Ctrl+C
+        scans.append(seconds)
+        if len(scans) == 1:
+            copy_images(corpus[2:3], directory)
+        elif len(scans) == 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    run_main(monkeypatch, '--watch', directory, '--interval', '0', '--workers', '1', '--quiet',
+             '--cache', str(tmp_path / 'cache.db'), '--output', output)
+
+    assert len(scans) == 3 and len(init_calls) == 1
+    assert [os.path.basename(result['image_path']) for result in read_jsonl(output)] == \
+        [os.path.basename(path) for path in corpus[:3]]
@@ -0,0 +1,53 @@
+"""Manifesto do modo watch: o que é reclassificado entre varreduras e execuções"""
+import os
+import time
+
+from manifest import Manifest
+
+CONFIG = {'classifier': {'backend': 'mock'}, 'confidence_threshold': 0.75}
+
+
+def write(path, data, age=60):
+    path.write_bytes(data)
+    os.utime(path, (time.time() - age, time.time() - age))
+    return str(path)
+
+
+def record_all(manifest, pending):
+    for path, size, mtime_ns, digest in pending:
+        manifest.record(path, size, mtime_ns, digest, {'success': True, 'image_path': path})
+
+
+def test_scan_selects_new_and_changed_files(tmp_path):
+    a = write(tmp_path / 'a.png', b'aaa')
+    b = write(tmp_path / 'b.png', b'bbb')
+    fresh = write(tmp_path / 'fresh.png', b'ccc', age=0)  # Ainda pode estar sendo escrito
+    manifest = Manifest(str(tmp_path / 'manifest.db'), CONFIG)
+
+    pending = manifest.scan([a, b, fresh, str(tmp_path / 'gone.png')])
+    assert [entry[0] for entry in pending] == [a, b]
+    record_all(manifest, pending)
+    assert manifest.scan([a, b]) == []
+
+    write(tmp_path / 'a.png', b'aaa', age=30)  # Só o mtime muda
+    write(tmp_path / 'b.png', b'bbbb', age=30)  # Conteúdo novo
+    assert [entry[0] for entry in manifest.scan([a, b])] == [b]
+    assert manifest.scan([a]) == []  # mtime novo de a já registrado: nem o hash é refeito
+    assert manifest.get(a) == {'success': True, 'image_path': a}
+
+
+def test_resume_and_config_change(tmp_path):
+    a = write(tmp_path / 'a.png', b'aaa')
+    path = str(tmp_path / 'manifest.db')
+    manifest = Manifest(path, CONFIG)
+    record_all(manifest, manifest.scan([a]))
+    manifest.close()
+
+    # Nova execução: o que já foi gravado não volta
+    assert Manifest(path, CONFIG).scan([a]) == []
+
+    # Outra configuração do pipeline: tudo é reclassificado
+    other = Manifest(path, dict(CONFIG, confidence_threshold=0.9))
+    assert len(other) == 0
+    assert [entry[0] for entry in other.scan([a])] == [a]
+    assert other.stats()['files'] == 0
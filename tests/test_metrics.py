@@ -0,0 +1,52 @@
+"""Instrumentação: tempos por estágio nos resultados e métricas agregadas"""
+import json
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from metrics import LATENCY_BUCKETS, Metrics
+
+
+def test_metrics_count_results(corpus, tmp_path):
+    metrics = Metrics()
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False, metrics=metrics)
+    results = [orchestrator.classify_galaxy(path) for path in corpus]
+    metrics.observe({'success': False, 'image_path': 'missing.png', 'error': 'FileNotFoundError'})
+
+    counters = metrics.snapshot()['counters']
+    assert counters['requests'] == len(corpus) + 1
+    assert counters['errors'] == 1
+    assert counters['preprocessed'] == sum(result['preprocessed'] for result in results)
+    assert counters['reprocessed'] == sum(result['iterations'] > 1 for result in results)
+    assert counters['reprocess_iterations'] == sum(result['iterations'] - 1 for result in results)
+
+    for result in results:
+        timings = result['timings']
+        assert {'decode', 'quality', 'classify', 'total'} <= timings.keys()
+        assert sum(ms for stage, ms in timings.items() if stage != 'total') <= timings['total'] + 1e-6
+
+    stages = metrics.snapshot()['stages']
+    assert stages['total']['count'] == len(corpus)
+
+    path = str(tmp_path / 'metrics.json')
+    metrics.write(path)
+    with open(path) as f:
+        assert json.load(f)['counters'] == counters
+
+
+def test_prometheus_histogram_is_cumulative():
+    metrics = Metrics()
+    latencies = [0.00005, 0.0003, 0.0003, 0.02, 30.0]
+    for seconds in latencies:
+        metrics.observe_latency('queue_wait', seconds)
+
+    lines = metrics.to_prometheus().splitlines()
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+               if line.startswith('galaxy_stage_seconds_bucket{stage="queue_wait"')]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert buckets == sorted(buckets) and buckets[-1] == len(latencies)
+    assert buckets[0] == 1 and buckets[-2] == 4  # 30 s só no bucket +Inf
+    assert 'galaxy_requests_total 0' in lines
+
+
+def test_no_timings_without_instrumentation(corpus):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False, instrument=False)
+    assert 'timings' not in orchestrator.classify_galaxy(corpus[0])
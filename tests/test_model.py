@@ -0,0 +1,40 @@
+"""MockClassifier: lote vetorizado igual à predição imagem a imagem"""
+import numpy as np
+import pytest
+
+from agents.agent_b import ClassifierAgent
+from model import MockClassifier
+from utils import load_image
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32, np.uint8])
+def test_predict_batch_matches_predict(corpus, dtype):
+    classifier = MockClassifier()
+    images = np.stack([load_image(path, dtype=dtype) for path in corpus])
+
+    classes, confidences, features = classifier.predict_batch(images)
+
+    for i, image in enumerate(images):
+        pred_class, confidence = classifier.predict(image)
+        assert classes[i] == pred_class
+        assert confidences[i] == confidence
+        assert {name: values[i] for name, values in features.items()} == classifier.get_features(image)
+
+
+def test_classify_batch_matches_classify(corpus):
+    agent = ClassifierAgent()
+    images = np.stack([load_image(path) for path in corpus])
+
+    for image, batched in zip(images, agent.classify_batch(images)):
+        single = agent.classify(image)
+        assert batched['class'] == single['class']
+        assert batched['confidence'] == single['confidence']
+        assert batched['needs_reprocessing'] == single['needs_reprocessing']
+        assert batched['features'] == single['features']
+
+
+def test_empty_batch():
+    classes, confidences, features = MockClassifier().predict_batch(np.zeros((0, 128, 128), dtype=np.uint8))
+    assert len(classes) == len(confidences) == 0
+    assert all(len(values) == 0 for values in features.values())
+    assert ClassifierAgent().classify_batch(np.zeros((0, 128, 128))) == []
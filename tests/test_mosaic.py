@@ -0,0 +1,72 @@
+"""Mosaicos: janelas lidas em faixas iguais à classificação direta de cada janela"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from mosaic import classify_mosaic, open_mosaic, window_moments, window_positions
+from utils import load_image
+
+
+FIELDS = ('classification', 'confidence', 'preprocessed', 'iterations')
+
+
+@pytest.fixture(scope='module')
+def mosaic_path(corpus, tmp_path_factory):
+    """Mosaico 256x448: 2x2 imagens do corpus + uma faixa de céu vazio à direita"""
+    mosaic = np.zeros((256, 448), dtype=np.uint8)
+    for k, path in enumerate(corpus[:4]):
+        y, x = divmod(k, 2)
+        mosaic[128 * y:128 * (y + 1), 128 * x:128 * (x + 1)] = load_image(path, dtype=np.uint8)
+    path = str(tmp_path_factory.mktemp('mosaic') / 'mosaic.npy')
+    np.save(path, mosaic)
+    return path
+
+
+def test_window_moments_match_numpy(mosaic_path):
+    mosaic = open_mosaic(mosaic_path)
+    xs = window_positions(mosaic.shape[1], 128, 48)
+    for y in window_positions(mosaic.shape[0], 128, 48):
+        strip = np.array(mosaic[y:y + 128])
+        mean, std = window_moments(strip, 128, xs)
+        windows = [strip[:, x:x + 128].astype(np.float64) for x in xs]
+        np.testing.assert_allclose(mean, [window.mean() for window in windows], rtol=0, atol=1e-9)
+        np.testing.assert_allclose(std, [window.std() for window in windows], rtol=0, atol=1e-6)
+
+
+def test_strip_tiling_matches_direct_classification(mosaic_path):
+    mosaic = open_mosaic(mosaic_path)
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    tiled = list(classify_mosaic(orchestrator, mosaic, stride=64, batch_size=5))
+
+    expected = []
+    for y in window_positions(256, 128, 64):
+        for x in window_positions(448, 128, 64):
+            window = np.array(mosaic[y:y + 128, x:x + 128])
+            if (window.mean() + 3 * window.std()) / 255 < 0.05:
+                continue  # Céu vazio
+            expected.append(((x, y), orchestrator.classify_galaxy(f'w@{x},{y}', window)))
+
+    assert [(result['x'], result['y']) for result in tiled] == [position for position, _ in expected]
+    assert len(tiled) < len(window_positions(256, 128, 64)) * len(window_positions(448, 128, 64))
+    for result, (_, direct) in zip(tiled, expected):
+        assert {field: result[field] for field in FIELDS} == {field: direct[field] for field in FIELDS}
+
+
+def test_pil_limit_is_restored(tmp_path, monkeypatch):
+    path = str(tmp_path / 'mosaic.png')
+    Image.fromarray(np.zeros((200, 300), dtype=np.uint8)).save(path)
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100000)
+
+    with pytest.raises(ValueError, match='--mosaic-max-pixels'):
+        open_mosaic(path, max_pixels=1000)
+    assert Image.MAX_IMAGE_PIXELS == 100000
+
+    assert open_mosaic(path, max_pixels=60000).shape == (200, 300)
+    assert Image.MAX_IMAGE_PIXELS == 100000
+
+    # Sem max_pixels vale o limite global do PIL
+    Image.MAX_IMAGE_PIXELS = 1000
+    with pytest.raises(ValueError):
+        open_mosaic(path)
+    assert Image.MAX_IMAGE_PIXELS == 1000
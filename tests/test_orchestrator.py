@@ -0,0 +1,111 @@
+"""Orchestrator: modos em lote e concorrentes iguais ao classify_galaxy serial"""
+import pytest
+
+from agents.orchestrator import GalaxyClassificationOrchestrator, render_message
+
+
+FIELDS = ('success', 'classification', 'confidence', 'preprocessed', 'iterations')
+
+
+def outcome(result):
+    """Campos de decisão e texto da conversa de um resultado"""
+    return ({field: result[field] for field in FIELDS},
+            [render_message(entry) for entry in result['conversation_log']])
+
+
+@pytest.fixture(scope='module')
+def serial(corpus):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    return [orchestrator.classify_galaxy(path) for path in corpus]
+
+
+def test_corpus_covers_pipeline_branches(serial):
+    assert {result['classification'] for result in serial} == {'spiral', 'elliptical'}
+    assert {result['preprocessed'] for result in serial} == {True, False}
+    assert {result['iterations'] for result in serial} == {1, 2, 3}
+
+
+def test_classify_batch_matches_classify_galaxy(corpus, serial):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    batched = orchestrator.classify_batch([(path, None) for path in corpus])
+
+    for path, single, result in zip(corpus, serial, batched):
+        assert result['image_path'] == path
+        assert outcome(result) == outcome(single)
+
+
+def test_classify_stream_keeps_order_and_bounds_readahead(corpus, serial, tmp_path):
+    import time
+
+    missing = str(tmp_path / 'missing.png')
+    paths = corpus[:4] + [missing] + corpus[4:]
+    consumed = []
+
+    def lazy_paths():
+        for path in paths:
+            consumed.append(path)
+            yield path
+
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    stream = orchestrator.classify_stream(lazy_paths(), readahead=2)
+    results = [next(stream)]
+    time.sleep(0.2)  # Tempo para a thread de leitura encher o buffer
+    # Buffer cheio + a imagem que a thread segura esperando vaga
+    assert len(consumed) <= len(results) + 2 + 1
+    results.extend(stream)
+
+    assert [result['image_path'] for result in results] == paths
+    assert not results[4]['success']
+    for result, single in zip(results[:4] + results[5:], serial):
+        assert outcome(result) == outcome(single)
+
+
+def test_speculative_matches_serial(corpus, serial):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False, speculative=True)
+    for path, single in zip(corpus, serial):
+        assert outcome(orchestrator.classify_galaxy(path))[0] == outcome(single)[0]
+
+    batched = orchestrator.classify_batch([(path, None) for path in corpus])
+    assert [outcome(result)[0] for result in batched] == [outcome(result)[0] for result in serial]
+
+
+def test_shared_orchestrator_is_reentrant(corpus, serial):
+    """Uma instância atendendo várias threads: cada imagem com seu próprio RequestContext"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    work = list(range(len(corpus))) * 8
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda i: (i, orchestrator.classify_galaxy(corpus[i])), work))
+
+    for i, result in results:
+        assert outcome(result) == outcome(serial[i])
+
+
+def test_classify_batch_is_silent(corpus, capsys):
+    orchestrator = GalaxyClassificationOrchestrator(speculative=True)  # verbose=True por padrão
+    orchestrator.classify_batch([(path, None) for path in corpus])
+    assert capsys.readouterr().out == ''
+
+
+def test_cascade_matches_full_pipeline(corpus, serial):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False, cascade=True)
+    results = [orchestrator.classify_galaxy(path) for path in corpus]
+
+    exits = [result.get('early_exit', False) for result in results]
+    assert any(exits) and not all(exits)  # Imagens que reprocessam seguem para o pipeline
+    for result, single in zip(results, serial):
+        assert outcome(result) == outcome(single)
+        assert result.get('early_exit', False) == (single['iterations'] == 1)
+
+    batched = orchestrator.classify_batch([(path, None) for path in corpus])
+    assert [result.get('early_exit', False) for result in batched] == exits
+    assert [outcome(result) for result in batched] == [outcome(result) for result in serial]
+
+
+def test_cascade_off_never_exits_early(corpus, serial):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False, cascade=False)
+    for path, single in zip(corpus, serial):
+        result = orchestrator.classify_galaxy(path)
+        assert 'early_exit' not in result
+        assert outcome(result) == outcome(single)
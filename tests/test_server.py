@@ -0,0 +1,56 @@
+"""Modo serve: validação das requisições JSON"""
+import http.client
+import json
+import threading
+
+import pytest
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from server import create_server
+
+
+@pytest.fixture(scope='module')
+def port():
+    server = create_server(GalaxyClassificationOrchestrator(verbose=False), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.batcher.close()
+
+
+def post(port, body):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('POST', '/classify', body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.mark.parametrize('body', ['[1]', '"x"', '{"paths": "abc"}', '{"paths": [1]}', '{"path": 3}',
+                                  '{}', 'not json'])
+def test_invalid_payload_is_rejected(port, body):
+    status, payload = post(port, body)
+    assert status == 400
+    assert 'error' in payload
+
+
+def test_valid_payloads(port, corpus):
+    status, single = post(port, json.dumps({'path': corpus[0]}))
+    assert status == 200 and single['success']
+
+    status, batch = post(port, json.dumps({'paths': corpus[:3]}))
+    assert status == 200
+    assert [result['image_path'] for result in batch['results']] == corpus[:3]
+
+
+@pytest.mark.parametrize('length', ['abc', '-1', '1.5'])
+def test_invalid_content_length_is_rejected(port, length):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.putrequest('POST', '/classify')
+    connection.putheader('Content-Type', 'application/json')
+    connection.putheader('Content-Length', length)
+    connection.endheaders()
+    response = connection.getresponse()
+
+    assert response.status == 400
+    assert 'Content-Length' in json.loads(response.read())['error']
@@ -0,0 +1,59 @@
+"""Shards empacotados: ida e volta, truncamento no close() e shards corrompidos"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from shards import ShardReader, ShardWriter, pack_png_directory
+from utils import load_image
+
+
+def test_pack_roundtrip(corpus, tmp_path):
+    count, skipped = pack_png_directory(os.path.dirname(corpus[0]), str(tmp_path / 'shard'))
+    reader = ShardReader(str(tmp_path / 'shard'))
+
+    assert (count, skipped, len(reader)) == (len(corpus), {}, len(corpus))
+    for path, (name, _, image) in zip(corpus, reader.iter_batches(batch_size=1)):
+        assert name == [os.path.basename(path)]
+        np.testing.assert_array_equal(image[0], load_image(path, dtype=np.uint8))
+
+
+def test_writer_truncates_unused_capacity(tmp_path):
+    with ShardWriter(str(tmp_path / 'shard'), capacity=8, size=16) as writer:
+        for i in range(3):
+            writer.add(f'img_{i}', np.full((16, 16), i, dtype=np.uint8))
+
+    reader = ShardReader(str(tmp_path / 'shard'))
+    assert reader.images.shape == (3, 16, 16)
+    assert os.path.getsize(reader.npy_path) == writer.data_offset + 3 * 16 * 16
+    assert [int(reader[i][2][0, 0]) for i in range(3)] == [0, 1, 2]
+
+
+@pytest.fixture
+def shard(tmp_path):
+    with ShardWriter(str(tmp_path / 'shard'), capacity=4, size=16) as writer:
+        for i in range(4):
+            writer.add(f'img_{i}', np.full((16, 16), i, dtype=np.uint8))
+    return str(tmp_path / 'shard')
+
+
+def test_truncated_data_is_rejected(shard):
+    npy_path = shard + '.npy'
+    with open(npy_path, 'r+b') as f:
+        f.truncate(os.path.getsize(npy_path) - 16 * 16)  # Última imagem cortada
+
+    with pytest.raises(ValueError):
+        ShardReader(shard)
+
+
+def test_index_inconsistent_with_data_is_rejected(shard):
+    index_path = shard + '.index.json'
+    with open(index_path) as f:
+        index = json.load(f)
+    index['names'] = index['names'][:-1]
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+
+    with pytest.raises(ValueError, match='inconsistente'):
+        ShardReader(shard)
@@ -0,0 +1,35 @@
+"""Inicialização: --help e `import agents` não carregam numpy/PIL"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import runpy, sys
+{setup}
+print()
+print('loaded:', ' '.join(sorted(m for m in ('numpy', 'PIL', 'agents.orchestrator') if m in sys.modules)))
+"""
+
+
+def loaded_modules(setup):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(setup=setup)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return output.stdout.rsplit('loaded:', 1)[1].split()
+
+
+def test_help_skips_heavy_imports():
+    setup = ("sys.argv = ['main.py', '--help']\n"
+             "try:\n"
+             "    runpy.run_path('main.py', run_name='__main__')\n"
+             "except SystemExit:\n"
+             "    pass")
+    assert loaded_modules(setup) == []
+
+
+def test_agents_package_is_lazy():
+    assert loaded_modules("import agents") == []
+    # PIL só quando alguma imagem for decodificada
+    assert loaded_modules("from agents import GalaxyClassificationOrchestrator") == \
+        ['agents.orchestrator', 'numpy']
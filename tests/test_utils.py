@@ -0,0 +1,102 @@
+"""utils: estatísticas, caminho uint8 (histograma + LUT) contra o float de referência e carga em lote"""
+import numpy as np
+import pytest
+
+from utils import (
+    ImageStats, UINT8_LEVELS, build_preprocess_lut, histogram_percentile, load_image, load_images,
+    preprocess_image
+)
+
+
+@pytest.fixture(scope='module')
+def codes(corpus):
+    return [load_image(path, dtype=np.uint8) for path in corpus]
+
+
+def test_histogram_percentile_matches_numpy(codes):
+    for image in codes:
+        histogram = np.bincount(image.ravel(), minlength=256)
+        for q in (0, 2, 50, 98, 100):
+            assert histogram_percentile(histogram, q) == pytest.approx(
+                np.percentile(UINT8_LEVELS[image], q), abs=1e-12
+            )
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_stats_match_numpy(codes, dtype):
+    for image in codes:
+        pixels = (image / 255.0).astype(dtype)
+        stats = ImageStats(pixels)
+        assert stats.mean == pytest.approx(np.mean(pixels, dtype=np.float64), abs=1e-12)
+        assert stats.var == pytest.approx(np.var(pixels, dtype=np.float64), abs=1e-12)
+        # Cancelamento em E[x²] - E[x]² (~1e-15) vira ~1e-7 no desvio de imagens constantes
+        assert stats.std == pytest.approx(np.std(pixels, dtype=np.float64), abs=1e-6)
+        assert (stats.min, stats.max) == (pixels.min(), pixels.max())
+        np.testing.assert_array_equal(
+            stats.histogram, np.bincount(np.clip(pixels * 255 + 0.5, 0, 255).astype(np.intp).ravel(), minlength=256)
+        )
+
+
+def test_stats_from_histogram_match_pixels(codes):
+    for image in codes:
+        reference = ImageStats(image / 255.0)
+        stats = ImageStats.from_histogram(np.bincount(image.ravel(), minlength=256))
+        assert stats.mean == pytest.approx(reference.mean, abs=1e-12)
+        assert stats.var == pytest.approx(reference.var, abs=1e-12)
+        assert (stats.min, stats.max) == (reference.min, reference.max)
+
+
+@pytest.mark.parametrize('enhance_contrast, adjust_brightness',
+                         [(True, True), (True, False), (False, True)])
+def test_lut_preprocess_matches_float(codes, enhance_contrast, adjust_brightness):
+    options = {'enhance_contrast': enhance_contrast, 'adjust_brightness': adjust_brightness}
+    for image in codes:
+        reference = preprocess_image(image / 255.0, **options)
+        lut = preprocess_image(image, stats=ImageStats(image), **options)
+        np.testing.assert_allclose(lut, reference, rtol=0, atol=1e-9)
+
+
+def test_chained_luts_match_repeated_preprocess(codes):
+    """Reprocessamentos do Agente A compõem LUTs em vez de reprocessar os pixels"""
+    for image in codes:
+        histogram = np.bincount(image.ravel(), minlength=256)
+        levels = UINT8_LEVELS
+        reference = image / 255.0
+        for _ in range(3):
+            levels = build_preprocess_lut(histogram, levels)
+            reference = preprocess_image(reference)
+            np.testing.assert_allclose(levels[image], reference, rtol=0, atol=1e-9)
+
+
+def test_lut_preprocess_float32(codes):
+    for image in codes:
+        result = preprocess_image(image, dtype=np.float32)
+        assert result.dtype == np.float32
+        np.testing.assert_allclose(result, preprocess_image(image / 255.0), rtol=0, atol=1e-6)
+
+
+def test_preprocess_in_place(codes):
+    for image in codes:
+        pixels = image / 255.0
+        reference = preprocess_image(pixels)
+        assert preprocess_image(pixels, out=pixels) is pixels
+        np.testing.assert_array_equal(pixels, reference)
+
+    # Saída em [0, 1]: um buffer inteiro truncaria os níveis
+    with pytest.raises(ValueError, match='ponto flutuante'):
+        preprocess_image(codes[0], out=codes[0].copy())
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.float32])
+def test_load_images_reports_errors_per_file(corpus, tmp_path, dtype):
+    corrupt = tmp_path / 'corrupt.png'
+    corrupt.write_bytes(b'not a png')
+    paths = [corpus[0], str(tmp_path / 'missing.png'), corpus[1], str(corrupt), corpus[2]]
+
+    images, errors = load_images(paths, dtype=dtype, workers=2, fast=False)
+
+    assert sorted(errors) == [1, 3]
+    assert 'FileNotFoundError' in errors[1]
+    assert not images[1].any() and not images[3].any()
+    for i in (0, 2, 4):
+        np.testing.assert_array_equal(images[i], load_image(paths[i], dtype=dtype))
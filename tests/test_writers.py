@@ -0,0 +1,63 @@
+"""Saída em streaming: JSONL e CSV relidos batem com os resultados gravados"""
+import csv
+import json
+
+import pytest
+
+from agents.orchestrator import GalaxyClassificationOrchestrator
+from writers import CSV_FIELDS, ResultWriter
+
+
+@pytest.fixture(scope='module')
+def results(corpus, tmp_path_factory):
+    orchestrator = GalaxyClassificationOrchestrator(verbose=False)
+    missing = str(tmp_path_factory.mktemp('writers') / 'missing.png')
+    failure = {'success': False, 'image_path': missing, 'error': 'FileNotFoundError: missing.png'}
+    return list(orchestrator.classify_stream(corpus[:4])) + [failure]
+
+
+@pytest.mark.parametrize('keep_log', [False, True])
+def test_jsonl_round_trip(results, tmp_path, keep_log):
+    path = str(tmp_path / 'out.jsonl')
+    with ResultWriter(path, keep_log=keep_log) as writer:
+        for result in results:
+            writer.write(result)
+    assert writer.count == len(results)
+
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    for row, result in zip(rows, results):
+        expected = {key: value for key, value in result.items() if keep_log or key != 'conversation_log'}
+        assert row.keys() == expected.keys()
+        for key in ('success', 'image_path', 'classification', 'confidence', 'preprocessed', 'iterations'):
+            assert row.get(key) == expected.get(key)
+        if keep_log and 'conversation_log' in row:
+            assert [entry['kind'] for entry in row['conversation_log']] == \
+                [entry['kind'] for entry in result['conversation_log']]
+
+
+def test_csv_round_trip(results, tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with ResultWriter(path) as writer:
+        for result in results:
+            writer.write(result)
+
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(results)
+    for row, result in zip(rows, results):
+        assert tuple(row) == CSV_FIELDS
+        assert row['image_path'] == result['image_path']
+        assert row['success'] == str(result['success'])
+        if result['success']:
+            assert row['classification'] == result['classification']
+            assert float(row['confidence']) == result['confidence']
+            assert int(row['iterations']) == result['iterations']
+            assert float(row['total_ms']) == result['timings']['total']
+        else:
+            assert row['error'] == result['error'] and row['classification'] == ''
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match='xml'):
+        ResultWriter(str(tmp_path / 'out.xml'), 'xml')
@@ -1,52 +1,282 @@
 """Funções auxiliares para processamento de imagens"""
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 
-def load_image(image_path):
+# Valor normalizado [0, 1] de cada nível de uma imagem de 8 bits
+UINT8_LEVELS = np.arange(256) / 255.0
+
+# Limiares de analyze_image_quality (features.py re-avalia com outros valores)
+MIN_BRIGHTNESS = 0.2
+MAX_BRIGHTNESS = 0.8
+MIN_CONTRAST = 0.1
+
+
+def _open_resized(image_path, size=128, fast=False):
+    """
+    Abre imagem em tons de cinza redimensionada para size x size
+
+    Com fast=True usa Image.draft (JPEG decodificado já em escala reduzida)
+    e reducing_gap no resize (Image.reduce inteiro antes do filtro final):
+    bem mais rápido para imagens grandes, com diferença de poucos níveis
+    de cinza em relação ao resize direto.
+    """
+    from PIL import Image  # Só quem decodifica imagens paga o import do PIL
+
+    img = Image.open(image_path)
+    if fast:
+        img.draft('L', (size * 2, size * 2))
+    img = img.convert('L')  # Grayscale
+    return img.resize((size, size), reducing_gap=2.0 if fast else None)
+
+
+def load_image(image_path, dtype=np.float64):
     """
     Carrega imagem e converte para array numpy
 
     Args:
         image_path: Caminho da imagem
+        dtype: np.uint8 (níveis originais, 1 byte/pixel), np.float32 ou
+            np.float64 (normalizados em [0, 1])
 
     Returns:
-        Array numpy normalizado [H, W]
+        Array numpy [H, W] no dtype pedido
     """
-    img = Image.open(image_path).convert('L')  # Grayscale
-    img = img.resize((128, 128))
-    img_array = np.array(img) / 255.0  # Normalizar [0, 1]
+    img = _open_resized(image_path)
+    if dtype == np.uint8:
+        return np.asarray(img, dtype=np.uint8)
+    img_array = np.asarray(img).astype(dtype)
+    img_array /= 255.0  # Normalizar [0, 1] (in-place, sem temporário)
     return img_array
 
 
-def analyze_image_quality(image_array):
+def load_images(image_paths, dtype=np.uint8, workers=None, fast=True, out=None):
     """
-    Analisa qualidade da imagem
+    Carrega várias imagens em paralelo direto em um array pré-alocado
+
+    A decodificação roda em um pool de threads (o PIL libera o GIL durante
+    decode e resize) e cada imagem é escrita na sua fatia de `out`.
 
     Args:
-        image_array: Array numpy da imagem
+        image_paths: Lista de caminhos
+        dtype: Tipo do array (np.uint8, np.float32 ou np.float64, como em load_image)
+        workers: Número de threads (None = padrão do ThreadPoolExecutor)
+        fast: Usar draft/reduce antes do resize final (ver _open_resized)
+        out: Array [N, 128, 128] pré-alocado (opcional)
 
     Returns:
-        Dict com métricas de qualidade
+        (array [N, 128, 128], dict {índice: mensagem de erro}); posições com
+        erro ficam zeradas
     """
-    brightness = np.mean(image_array)
-    contrast = np.std(image_array)
+    if out is None:
+        out = np.empty((len(image_paths), 128, 128), dtype=dtype)
 
-    # Determinar qualidade
-    quality_score = 0
-    issues = []
+    def decode(index):
+        try:
+            img = _open_resized(image_paths[index], fast=fast)
+            out[index] = np.asarray(img)
+            if out.dtype != np.uint8:
+                out[index] /= 255.0
+            return None
+        except Exception as exc:
+            out[index] = 0
+            return f"{type(exc).__name__}: {exc}"
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        messages = list(executor.map(decode, range(len(image_paths))))
+
+    errors = {i: message for i, message in enumerate(messages) if message is not None}
+    return out, errors
+
+
+class ImageStats:
+    """
+    Estatísticas de uma imagem calculadas uma única vez e compartilhadas
+    entre utils, agentes e classificador
+
+    Momentos (média, variância, desvio), mínimo, máximo e histograma de
+    256 bins em [0, 1]. Deve ser recalculado sempre que os pixels mudarem.
+    Imagens uint8 são tratadas como níveis de 8 bits (estatísticas em [0, 1]).
+    """
+
+    def __init__(self, image_array):
+        flat = np.asarray(image_array).ravel()
+        self._flat = None
+        self._histogram = None
+
+        if flat.dtype == np.uint8:
+            self._set_from_histogram(np.bincount(flat, minlength=256), UINT8_LEVELS)
+            return
+
+        self.size = flat.size
+        self.mean = flat.sum(dtype=np.float64) / self.size
+        # E[x²] - E[x]² a partir de um produto escalar (evita o temporário de np.var);
+        # float32 é acumulado em float64 sem converter a imagem inteira
+        if flat.dtype == np.float64:
+            sum_sq = np.dot(flat, flat)
+        else:
+            sum_sq = np.einsum('i,i->', flat, flat, dtype=np.float64)
+        self.var = max(sum_sq / self.size - self.mean * self.mean, 0.0)
+        self.std = np.sqrt(self.var)
+        self.min = float(flat.min())
+        self.max = float(flat.max())
+
+        self._flat = flat
+
+    @classmethod
+    def from_histogram(cls, histogram, levels=UINT8_LEVELS):
+        """
+        Calcula estatísticas em O(256) a partir de um histograma de níveis
+
+        Args:
+            histogram: Contagem de pixels por nível [256]
+            levels: Valor em [0, 1] de cada nível (padrão: k/255)
+
+        Returns:
+            ImageStats equivalente ao da imagem levels[códigos]
+        """
+        stats = cls.__new__(cls)
+        stats._flat = None
+        stats._histogram = None
+        stats._set_from_histogram(histogram, levels)
+        return stats
+
+    def _set_from_histogram(self, histogram, levels):
+        """Preenche momentos e extremos a partir de histograma + níveis"""
+        self.size = int(histogram.sum())
+        self.mean = np.dot(histogram, levels) / self.size
+        self.var = max(np.dot(histogram, levels * levels) / self.size - self.mean * self.mean, 0.0)
+        self.std = np.sqrt(self.var)
+
+        used = np.flatnonzero(histogram)
+        self.min = levels[used].min()
+        self.max = levels[used].max()
+
+        # Histograma em bins de [0, 1] só montado se for pedido
+        self._levels_histogram = (histogram, levels)
+
+    @property
+    def histogram(self):
+        """Histograma de 256 bins dos pixels em [0, 1]"""
+        if self._histogram is None:
+            if self._flat is None:
+                histogram, levels = self._levels_histogram
+                bins = np.clip(levels * 255 + 0.5, 0, 255).astype(np.intp)
+                self._histogram = np.bincount(bins, weights=histogram, minlength=256).astype(np.int64)
+            else:
+                bins = np.clip(self._flat * 255 + 0.5, 0, 255).astype(np.intp)
+                self._histogram = np.bincount(bins, minlength=256)
+        return self._histogram
+
+
+def histogram_percentile(histogram, q, levels=UINT8_LEVELS):
+    """
+    Percentil em O(256) a partir de um histograma (sem ordenar os pixels)
+
+    Usa a mesma interpolação linear de np.percentile, então o resultado é
+    igual ao de np.percentile(levels[códigos], q) a menos de arredondamento.
+
+    Args:
+        histogram: Contagem de pixels por nível [256]
+        q: Percentil desejado (0-100)
+        levels: Valor de cada nível, em ordem não decrescente
+
+    Returns:
+        Valor do percentil
+    """
+    cumulative = np.cumsum(histogram)
+    position = q / 100 * (cumulative[-1] - 1)
+    lower = int(np.floor(position))
+    fraction = position - lower
+
+    # Nível do k-ésimo pixel ordenado = primeiro nível cuja contagem acumulada passa de k
+    low_value = levels[np.searchsorted(cumulative, lower, side='right')]
+    if fraction == 0:
+        return low_value
+    high_value = levels[np.searchsorted(cumulative, lower + 1, side='right')]
+    return low_value + fraction * (high_value - low_value)
+
+
+def build_preprocess_lut(histogram, levels=UINT8_LEVELS, enhance_contrast=True, adjust_brightness=True):
+    """
+    Monta a tabela de consulta (LUT) equivalente a preprocess_image
 
-    if brightness < 0.2:
+    Para uma imagem cujos pixels são levels[códigos], preprocess_image
+    equivale a lut[códigos]: ajuste de brilho, esticamento entre os
+    percentis 2 e 98 e clip são aplicados aos 256 níveis em vez de aos pixels.
+    Como as três operações são monótonas, a LUT resultante também é
+    e pode servir de `levels` para um novo pré-processamento.
+
+    Args:
+        histogram: Contagem de pixels por código [256]
+        levels: Valor atual de cada código (padrão: k/255)
+        enhance_contrast: Aplicar equalização de contraste
+        adjust_brightness: Ajustar brilho
+
+    Returns:
+        LUT float64 [256]
+    """
+    lut = levels
+
+    # Ajustar brilho
+    if adjust_brightness:
+        mean_brightness = np.dot(histogram, levels) / histogram.sum()
+        if mean_brightness < 0.3:
+            lut = lut * 1.5  # Clarear
+        elif mean_brightness > 0.7:
+            lut = lut * 0.7  # Escurecer
+
+    # Melhorar contraste (histogram equalization simplificado)
+    if enhance_contrast:
+        pmin = histogram_percentile(histogram, 2, lut)
+        pmax = histogram_percentile(histogram, 98, lut)
+        lut = (lut - pmin) / (pmax - pmin + 1e-8)
+
+    # Garantir range [0, 1]
+    return np.clip(lut, 0, 1)
+
+
+def quality_issues(brightness, contrast):
+    """
+    Problemas de qualidade apontados pelos limiares de brilho e contraste
+
+    Args:
+        brightness: Brilho médio em [0, 1]
+        contrast: Desvio padrão dos pixels em [0, 1]
+
+    Returns:
+        Lista de problemas (vazia = qualidade boa)
+    """
+    issues = []
+    if brightness < MIN_BRIGHTNESS:
         issues.append("muito escura")
-    elif brightness > 0.8:
+    elif brightness > MAX_BRIGHTNESS:
         issues.append("muito clara")
-    else:
-        quality_score += 1
-
-    if contrast < 0.1:
+    if contrast < MIN_CONTRAST:
         issues.append("baixo contraste")
-    else:
-        quality_score += 1
+    return issues
+
+
+def analyze_image_quality(image_array, stats=None):
+    """
+    Analisa qualidade da imagem
+
+    Args:
+        image_array: Array numpy da imagem
+        stats: ImageStats já calculado para esta imagem (opcional)
+
+    Returns:
+        Dict com métricas de qualidade
+    """
+    if stats is None:
+        stats = ImageStats(image_array)
+
+    brightness = stats.mean
+    contrast = stats.std
+
+    # Determinar qualidade (um ponto por critério atendido)
+    issues = quality_issues(brightness, contrast)
+    quality_score = 2 - len(issues)
 
     quality = "boa" if quality_score == 2 else "aceitável" if quality_score == 1 else "ruim"
 
@@ -59,7 +289,8 @@ def analyze_image_quality(image_array):
     }
 
 
-def preprocess_image(image_array, enhance_contrast=True, adjust_brightness=True):
+def preprocess_image(image_array, enhance_contrast=True, adjust_brightness=True, stats=None,
+                     out=None, dtype=np.float64):
     """
     Pré-processa imagem para melhorar qualidade
 
@@ -67,27 +298,52 @@ def preprocess_image(image_array, enhance_contrast=True, adjust_brightness=True)
         image_array: Array numpy da imagem
         enhance_contrast: Aplicar equalização de contraste
         adjust_brightness: Ajustar brilho
+        stats: ImageStats da imagem de entrada (opcional, evita recalcular a média)
+        out: Array de saída pré-alocado, de ponto flutuante (pode ser o
+            próprio image_array, se for float, para processar in-place sem
+            cópias; outros tipos geram ValueError)
+        dtype: Tipo da saída quando out não é informado e a entrada é uint8
+            (entradas float mantêm seu próprio tipo)
 
     Returns:
-        Array numpy processado
+        Array numpy processado (o próprio out, se informado)
+
+    Imagens uint8 usam o caminho rápido por histograma + LUT
+    (build_preprocess_lut): o resultado difere do caminho float aplicado a
+    image_array / 255 em no máximo 1e-9 por pixel (float64).
     """
-    processed = image_array.copy()
+    if out is not None and not np.issubdtype(out.dtype, np.floating):
+        raise ValueError(f"out deve ser de ponto flutuante, não {out.dtype}")
+
+    if image_array.dtype == np.uint8:
+        histogram = np.bincount(image_array.ravel(), minlength=256)
+        lut = build_preprocess_lut(histogram, UINT8_LEVELS, enhance_contrast, adjust_brightness)
+        if out is None:
+            out = np.empty(image_array.shape, dtype=dtype)
+        return np.take(lut.astype(out.dtype, copy=False), image_array, out=out)
+
+    if out is None:
+        out = np.empty_like(image_array)
 
     # Ajustar brilho
+    scale = 1.0
     if adjust_brightness:
-        mean_brightness = np.mean(processed)
+        mean_brightness = stats.mean if stats is not None else np.mean(image_array)
         if mean_brightness < 0.3:
-            processed = processed * 1.5  # Clarear
+            scale = 1.5  # Clarear
         elif mean_brightness > 0.7:
-            processed = processed * 0.7  # Escurecer
+            scale = 0.7  # Escurecer
+
+    if scale != 1.0:
+        np.multiply(image_array, scale, out=out)
+    elif out is not image_array:
+        np.copyto(out, image_array)
 
     # Melhorar contraste (histogram equalization simplificado)
     if enhance_contrast:
-        pmin = np.percentile(processed, 2)
-        pmax = np.percentile(processed, 98)
-        processed = (processed - pmin) / (pmax - pmin + 1e-8)
+        pmin, pmax = np.percentile(out, [2, 98])  # Uma única partição para os dois
+        np.subtract(out, pmin, out=out)
+        np.divide(out, pmax - pmin + 1e-8, out=out)
 
     # Garantir range [0, 1]
-    processed = np.clip(processed, 0, 1)
-
-    return processed
+    return np.clip(out, 0, 1, out=out)
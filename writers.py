@@ -0,0 +1,77 @@
+"""Saída dos resultados em streaming (JSONL ou CSV)"""
+import csv
+import json
+import sys
+
+from cache import _to_builtin
+
+
+# Colunas do CSV (resultados com erro preenchem só image_path, success e error)
+CSV_FIELDS = (
+    'image_path', 'success', 'classification', 'confidence', 'preprocessed',
+    'iterations', 'variant', 'cached', 'duplicate_of', 'early_exit', 'total_ms', 'error'
+)
+
+
+class ResultWriter:
+    """
+    Grava resultados de classificação à medida que ficam prontos
+
+    Uma linha por imagem, em JSONL (dict completo) ou CSV (CSV_FIELDS),
+    com escrita bufferizada: nada é formatado para o terminal.
+
+    Args:
+        path: Arquivo de saída ('-' = stdout)
+        output_format: 'jsonl' ou 'csv' (padrão: pela extensão, JSONL se não for .csv)
+        keep_log: Incluir o conversation_log (registros estruturados) no JSONL
+        buffer_size: Tamanho do buffer de escrita em bytes
+    """
+
+    def __init__(self, path, output_format=None, keep_log=False, buffer_size=1 << 20):
+        if output_format is None:
+            output_format = 'csv' if path.endswith('.csv') else 'jsonl'
+        if output_format not in ('jsonl', 'csv'):
+            raise ValueError(f"Formato de saída desconhecido: {output_format}")
+
+        self.path = path
+        self.output_format = output_format
+        self.keep_log = keep_log
+        self.count = 0
+
+        if path == '-':
+            self._file = sys.stdout
+            self._owns_file = False
+        else:
+            self._file = open(path, 'w', buffering=buffer_size, newline='')
+            self._owns_file = True
+
+        if output_format == 'csv':
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(CSV_FIELDS)
+
+    def write(self, result):
+        """Grava um resultado (dict de classify_galaxy ou de erro)"""
+        if self.output_format == 'csv':
+            timings = result.get('timings') or {}
+            row = dict(result, total_ms=timings.get('total'))
+            self._csv.writerow(['' if row.get(field) is None else row[field] for field in CSV_FIELDS])
+        else:
+            if not self.keep_log and 'conversation_log' in result:
+                result = {key: value for key, value in result.items() if key != 'conversation_log'}
+            self._file.write(json.dumps(result, default=_to_builtin))
+            self._file.write('\n')
+
+        self.count += 1
+
+    def close(self):
+        """Descarrega o buffer e fecha o arquivo"""
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()